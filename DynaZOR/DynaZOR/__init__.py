@@ -2,13 +2,16 @@
 The flask application package.
 """
 
+import os
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
-from .api import AdminInitialize, Analytics, Profile, Register, Login, Schedule, TimeSlot, User, UserByID, Appointment, AdminAuth, AdminInitialize, AdminReset, AdminView, AdminBackup, AdminModify
+from . import db, metrics, responses
+from .api import AdminInitialize, Analytics, AnalyticsWindow, FreeBusy, MeetingSolver, SlotTemplate, ScheduleEvents, ScheduleChanges, Profile, Register, Login, Schedule, TimeSlot, User, UserByID, Appointment, AdminAuth, AdminInitialize, AdminReset, AdminView, AdminBackup, AdminRestore, AdminModify, AdminRebuildAnalytics, AdminCacheStats, Metrics
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = "04KMGIRO4SF4fsrf"
+# Signs the access tokens issued by Login and AdminAuth
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', "04KMGIRO4SF4fsrf")
 
 # Allow frontend origin and preflight across all API routes
 app.config["CORS_HEADERS"] = "Content-Type"
@@ -23,22 +26,49 @@ CORS(
 	methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
 )
 
-# Initialize Flask-RESTful API
-api = Api(app)
+# Check a pooled DB connection out lazily per request and always hand it back
+@app.before_request
+def open_db_scope():
+    db.openRequestScope()
+
+@app.teardown_request
+def close_db_scope(exc):
+    db.closeRequestScope()
+
+# Per-endpoint latency and per-query DB metrics, served at /api/metrics
+metrics.instrument(app)
+
+# ETags for the endpoints that opt in with responses.etag, and gzip/brotli for large bodies
+responses.instrument(app)
+
+# Initialize Flask-RESTful API; password checks shed load with a 503 when their pool is saturated
+api = Api(app, errors={
+    'HasherBusy': {'message': "Too many login attempts in progress, try again shortly", 'status': 503},
+})
 
 # Register API endpoints
 api.add_resource(Register, '/api/auth/register')
 api.add_resource(Login, '/api/auth/login')
 api.add_resource(Schedule, '/api/user/schedule/<int:user_id>')
+api.add_resource(ScheduleEvents, '/api/user/schedule/<int:user_id>/events')
+api.add_resource(ScheduleChanges, '/api/user/schedule/<int:user_id>/changes')
 api.add_resource(TimeSlot, '/api/user/timeslot/<int:user_id>')
 api.add_resource(User, '/api/user/search/<string:username>')
 api.add_resource(UserByID, '/api/user/id/<int:user_id>')
+api.add_resource(FreeBusy, '/api/user/freebusy')
 api.add_resource(Appointment, '/api/user/appointment/<int:user_id>')
+api.add_resource(MeetingSolver, '/api/user/solve/<int:user_id>')
 api.add_resource(Profile, '/api/user/profile/<int:user_id>')
+api.add_resource(SlotTemplate, '/api/user/template/<int:user_id>')
 api.add_resource(AdminAuth, '/api/admin/auth')
 api.add_resource(AdminInitialize, '/api/admin/init')
 api.add_resource(AdminReset, '/api/admin/reset')
 api.add_resource(AdminView, '/api/admin/view')
 api.add_resource(AdminBackup, '/api/admin/backup')
+api.add_resource(AdminRestore, '/api/admin/restore')
 api.add_resource(AdminModify, '/api/admin/modify')
+api.add_resource(AdminRebuildAnalytics, '/api/admin/analytics/rebuild')
+api.add_resource(AdminCacheStats, '/api/admin/cache')
+api.add_resource(Metrics, '/api/metrics')
 api.add_resource(Analytics, '/api/analytics/<int:user_id>')
+api.add_resource(AnalyticsWindow, '/api/analytics/<int:user_id>/window')
@@ -3,15 +3,31 @@ REST API resources for DynaZOR.
 Defines all endpoints for user authentication, registration, and schedule management.
 """
 
-from flask_restful import Resource, reqparse, abort
-from flask import request, session, current_app
-from . import db
+from flask_restful import Resource, reqparse, abort, inputs
+from flask import request, session, current_app, Response, stream_with_context
+from werkzeug.datastructures import FileStorage
+from . import auth, backup, db, metrics, passwords, responses, solver
 from datetime import datetime, timedelta, date
+import json
 import os
-import boto3
+import time
 
-TOPIC_ARN = os.getenv('SNS_TOPIC_ARN')
-sns_client = boto3.client("sns",region_name=os.getenv("AWS_REGION"))
+MAX_SCHEDULE_RANGE_DAYS = 31
+# Timeslots a viewer may submit in one appointment request
+MAX_SELECTIONS = int(os.getenv('MAX_APPOINTMENT_SELECTIONS', 3))
+# Rows per AdminView section page
+ADMIN_PAGE_SIZE = 100
+ADMIN_PAGE_MAX = 1000
+# Keep-alive comment interval of a live schedule stream, and how long a stream lasts
+# before the client's EventSource reconnects (which also frees the worker thread)
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = int(os.getenv('SCHEDULE_STREAM_MAX_SECONDS', 300))
+# Users one free/busy request may ask about
+MAX_FREEBUSY_USERS = int(os.getenv('MAX_FREEBUSY_USERS', 100))
+# Candidates one solver request may ask for
+MAX_SOLVER_CANDIDATES = 50
+# Longest look-back the windowed analytics accept
+MAX_ANALYTICS_WINDOW_DAYS = 366
 
 class Register(Resource):
     """Handle user registration"""
@@ -32,14 +48,17 @@ class Register(Resource):
         try:
             full_name = f"{args['name']} {args['surname']}"
             db.createUser(full_name, args['username'], args['email'], args['password'])
-            sns_client.subscribe(TopicArn=TOPIC_ARN, Protocol="email", Endpoint=args['email'], Attributes={'FilterPolicy': f'{{"target_email": ["{args["email"]}"]}}'}) # subscribing to SNS
+            db.enqueueNotifications([('subscribe', args['email'], None, None)]) # subscribing to SNS, done by the outbox worker
             # Get the newly created user's ID
             userID = db.getUserID(args['username'])
             
             return {
                 'message': 'User registered successfully',
-                'userID': userID
+                'userID': userID,
+                'token': auth.userToken(userID, args['username'])
             }, 201
+        except passwords.HasherBusy:
+            raise
         except Exception as e:
             abort(500, message=str(e))
 
@@ -57,31 +76,62 @@ class Login(Resource):
         if user is None:
           abort(401, message="Invalid email or password")
 
+        # users row: userID, name, username, email, password
         return {
           'userID': user[0],
+          'username': user[2],
+          'token': auth.userToken(user[0], user[2]),
           'message': 'Login successful'
         }, 200
 
 
+def schedule_version(user_id):
+    """Version of the days Schedule.get returns for the request's arguments"""
+    start, days = request.args.get('start'), request.args.get('days', 1, type=int)
+    try:
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else datetime.now().date()
+    except ValueError:
+        return None
+    if not request.args.get('start'):
+        days = 1
+    if not 1 <= days <= MAX_SCHEDULE_RANGE_DAYS:
+        return None
+    version = db.getScheduleVersion(user_id, start, start + timedelta(days=days - 1))
+    return None if version is None else f"{start}.{days}.{version}"
+
+
 class Schedule(Resource):
     """Get or create user schedule"""
+    method_decorators = {'get': [responses.etag(schedule_version), auth.authenticated], 'post': [auth.ownerRequired]}
+
     def get(self, user_id):
+        """
+        Return today's schedule, or several days when ?start=YYYY-MM-DD&days=N is given.
+        Days are normally pre-generated by the scheduler; today's is created here as a fallback.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('start', type=str, location='args')
+        parser.add_argument('days', type=int, default=1, location='args')
+        args = parser.parse_args()
+
+        if args['start']:
+            try:
+                start = datetime.strptime(args['start'], '%Y-%m-%d').date()
+            except ValueError:
+                abort(400, message="start must be in format YYYY-MM-DD")
+            if not 1 <= args['days'] <= MAX_SCHEDULE_RANGE_DAYS:
+                abort(400, message=f"days must be between 1 and {MAX_SCHEDULE_RANGE_DAYS}")
+
         try:
-            from datetime import datetime
+            if args['start']:
+                end = start + timedelta(days=args['days'] - 1)
+                return {'schedule': db.getScheduleRange(user_id, start, end)}, 200
+
             today = datetime.now().date()
-            
-            # Check if user has a schedule for today
-            db.cursor.execute("""
-                SELECT scheduleID FROM userSchedule
-                WHERE userID=? AND scheduleDate=?
-            """, (user_id, today))
-            existing = db.cursor.fetchone()
-            
-            # Create if doesn't exist
-            if not existing:
+            schedule = db.getSchedule(user_id, today)
+            if not schedule:
                 db.createSchedule(user_id, today)
-            
-            schedule = db.getSchedule(user_id)
+                schedule = db.getSchedule(user_id, today)
             return {'schedule': schedule}, 200
         except Exception as e:
             abort(500, message=str(e))
@@ -110,11 +160,106 @@ class Schedule(Resource):
         except Exception as e:
             abort(500, message=str(e))
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def changed_slots(previous, current):
+    """
+    The timeslots of the one-day schedule current that differ from previous;
+    None when the day's set of slots changed, which calls for a full snapshot.
+    """
+    before = previous[0]['timeslots'] if previous else []
+    after = current[0]['timeslots'] if current else []
+    if [(s['hour'], s['minute']) for s in before] != [(s['hour'], s['minute']) for s in after]:
+        return None
+    return [slot for old, slot in zip(before, after) if old != slot]
+
+
+class ScheduleEvents(Resource):
+    """Live changes to one day of a user's schedule as Server-Sent Events"""
+    method_decorators = [auth.authenticated, auth.queryToken]
+
+    def get(self, user_id):
+        """
+        ?date=YYYY-MM-DD (default today). Sends a 'snapshot' event with the day as Schedule.get
+        returns it, then a 'slots' event listing only the changed timeslots after every write.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('date', type=str, location='args')
+        args = parser.parse_args()
+        try:
+            day = datetime.strptime(args['date'], '%Y-%m-%d').date() if args['date'] else datetime.now().date()
+        except ValueError:
+            abort(400, message="date must be in format YYYY-MM-DD")
+
+        # Subscribed before the first read, so a write in between is not missed
+        subscription = db.changes.subscribe(user_id, day)
+        return Response(self.stream(subscription, user_id, day), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @staticmethod
+    def stream(subscription, user_id, day):
+        """
+        Runs after the request has handed its DB connection back; each read checks one out
+        briefly and is usually served by the schedule cache another viewer already filled.
+        """
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            current = db.getSchedule(user_id, day)
+            yield "retry: 3000\n" + sse('snapshot', {'schedule': current})
+            while time.monotonic() < deadline:
+                if not subscription.wait(min(STREAM_KEEPALIVE_SECONDS, max(0, deadline - time.monotonic()))):
+                    yield ": keepalive\n\n"
+                    continue
+                latest = db.getSchedule(user_id, day)
+                slots = changed_slots(current, latest)
+                if slots is None:
+                    yield sse('snapshot', {'schedule': latest})
+                elif slots:
+                    yield sse('slots', {'date': str(day), 'timeslots': slots})
+                current = latest
+        except Exception as e:
+            yield sse('error', {'message': str(e)})
+        finally:
+            subscription.close()
+
+
+class ScheduleChanges(Resource):
+    """Incremental sync of a user's schedule"""
+    method_decorators = [auth.authenticated]
+
+    def get(self, user_id):
+        """
+        ?since=<token from the previous call> (omit for a full sync) and optional ?start=YYYY-MM-DD
+        (default today). Returns only the days and slots changed since the token, and the next token.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('since', type=int, default=0, location='args')
+        parser.add_argument('start', type=str, location='args')
+        args = parser.parse_args()
+        if args['since'] < 0:
+            abort(400, message="since must be a token returned by this endpoint")
+        try:
+            start = datetime.strptime(args['start'], '%Y-%m-%d').date() if args['start'] else None
+        except ValueError:
+            abort(400, message="start must be in format YYYY-MM-DD")
+
+        try:
+            days, token = db.getScheduleChanges(user_id, args['since'], start)
+            return {'token': token, 'days': days}, 200
+        except Exception as e:
+            abort(500, message=str(e))
+
+
 class TimeSlot(Resource):
     """Toggle a timeslot between available/unavailable"""
+    method_decorators = [auth.ownerRequired]
+
     def post(self, user_id):
         parser = reqparse.RequestParser()
-        username = db.getUsernameByID(user_id)
+        # The owner's token carries the username; only the admin acting for them needs the lookup
+        username = auth.usernameFor(user_id) or db.getUsernameByID(user_id)
         parser.add_argument('date', type=str, required=True, help='Date is required (YYYY-MM-DD)')
         parser.add_argument('hour', type=int, required=True, help='Hour is required')
         parser.add_argument('minute', type=int, required=True, help='Minute is required')
@@ -122,64 +267,35 @@ class TimeSlot(Resource):
         args = parser.parse_args()
 
         try:
-            db.toggleSlotDB(user_id, args['date'], args['hour'], args['minute'])
-
-            chosenTimeslotID = db.getTimeslotID(user_id, args['date'], args['hour'], args['minute'])
-            cancelled_booker_id = db.isBooked(chosenTimeslotID)
-            if (cancelled_booker_id):
-                cancelled_booker_email = db.getEmailByUserID(cancelled_booker_id)
-                sns_client.publish(
-                    TopicArn=TOPIC_ARN, 
-                    Message=f"Your appointment with {username} on {args['date']} at {args['hour']:02d}:{args['minute']:02d} has been cancelled.",
-                    Subject="Appointment Cancelled",
-                    MessageAttributes={
-                        'target_email': {
-                        'DataType': 'String',
-                        'StringValue': cancelled_booker_email
-                        }
-                    }
-                )
-
-                cancelled_waitlist = db.getWaitList(chosenTimeslotID)
-                if cancelled_waitlist:
-                    for i in cancelled_waitlist:
-                        db.removeFromWaitlist(chosenTimeslotID,i['user_id'])
-                        sns_client.publish(
-                            TopicArn=TOPIC_ARN, 
-                            Message=f"You are no longer waiting in the queue for appointment with {username} on {args['date']} at {args['hour']:02d}:{args['minute']:02d}, appointment slot has been removed by the owner.",
-                            Subject="Appointment Queue Cancelled",
-                            MessageAttributes={
-                                'target_email': {
-                                'DataType': 'String',
-                                'StringValue': i['email']
-                                }
-                            }
-                        )                    
-
-                    db.freeSlotDB(chosenTimeslotID)
+            # The toggle, the cancellation and the waitlist changes commit together
+            outcome = db.toggleOwnerSlot(user_id, args['date'], args['hour'], args['minute'])
+        except Exception as e:
+            abort(500, message=str(e))
+        if outcome is None:
+            abort(404, message="Timeslot not found")
 
-                else:
-                    tempTimeslotID = db.getTimeslotID(cancelled_booker_id, args['date'], args['hour'], args['minute'])
-                    db.freeSlotDB(tempTimeslotID)
-                    waitingUserEmail = db.reSchedulerAlgorithm(cancelled_booker_id, args['date'], args['hour'], args['minute'])
-                    if (waitingUserEmail):
-                        sns_client.publish(
-                            TopicArn=TOPIC_ARN, 
-                            Message=f"A spot for the appointment with {username} opened up on {args['date']} at {args['hour']:02d}:{args['minute']:02d}!",
-                            Subject="Appointment Rescheduled",
-                            MessageAttributes={
-                                'target_email': {
-                                    'DataType': 'String',
-                                    'StringValue': waitingUserEmail
-                                }
-                            }
-                        )
+        try:
+            cancelled_booker_id, dropped, waitingUserEmail = outcome
+            if cancelled_booker_id:
+                when = f"{args['date']} at {args['hour']:02d}:{args['minute']:02d}"
+                # Delivered by the outbox worker once the request is done
+                notifications = [('publish', db.getEmailByUserID(cancelled_booker_id), "Appointment Cancelled",
+                                  f"Your appointment with {username} on {when} has been cancelled.")]
+                notifications += [('publish', email, "Appointment Queue Cancelled",
+                                   f"You are no longer waiting in the queue for appointment with {username} on {when}, appointment slot has been removed by the owner.")
+                                  for _, email in dropped]
+                if waitingUserEmail:
+                    notifications.append(('publish', waitingUserEmail, "Appointment Rescheduled",
+                                          f"A spot for the appointment with {username} opened up on {when}!"))
+                db.enqueueNotifications(notifications)
 
             return {'message': 'Timeslot toggled successfully'}, 200
         except Exception as e:
             abort(500, message=str(e))
 
 class User(Resource):
+    method_decorators = [auth.authenticated]
+
     def get(self, username):
         try:
           user_id = db.getUserID(username)
@@ -192,11 +308,11 @@ class User(Resource):
 
 class UserByID(Resource):
     """Get user details by user ID"""
+    method_decorators = [responses.etag(lambda user_id: db.getUserVersion(user_id)), auth.authenticated]
+
     def get(self, user_id):
         try:
-            cursor = db.cursor
-            cursor.execute("SELECT userID, name, username, email FROM users WHERE userID = ?", (user_id,))
-            row = cursor.fetchone()
+            row = db.getUserInfo(user_id)
             if row is None:
                 abort(404, message="User not found")
             return {
@@ -209,114 +325,388 @@ class UserByID(Resource):
             abort(500, message=str(e))
 
 
+class FreeBusy(Resource):
+    """Availability bitmaps of several users over a date range, for finding a common slot"""
+    method_decorators = [auth.authenticated]
+
+    def get(self):
+        """
+        ?users=1,2,3&start=YYYY-MM-DD&days=N. Each user gets one bitmap per day (null when the
+        day has no schedule) whose bit i is set when the user has an open, unbooked slot starting
+        at slots[i]. slots lists every start time free for anyone, across their slot templates.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('users', type=str, required=True, location='args', help='users is required (comma-separated user IDs)')
+        parser.add_argument('start', type=str, location='args')
+        parser.add_argument('days', type=int, default=7, location='args')
+        args = parser.parse_args()
+
+        try:
+            user_ids = list(dict.fromkeys(int(value) for value in args['users'].split(',') if value.strip()))
+        except ValueError:
+            abort(400, message="users must be comma-separated user IDs")
+        if not 1 <= len(user_ids) <= MAX_FREEBUSY_USERS:
+            abort(400, message=f"users must list between 1 and {MAX_FREEBUSY_USERS} user IDs")
+        if not 1 <= args['days'] <= MAX_SCHEDULE_RANGE_DAYS:
+            abort(400, message=f"days must be between 1 and {MAX_SCHEDULE_RANGE_DAYS}")
+        try:
+            start = datetime.strptime(args['start'], '%Y-%m-%d').date() if args['start'] else datetime.now().date()
+        except ValueError:
+            abort(400, message="start must be in format YYYY-MM-DD")
+
+        try:
+            free_busy = db.getFreeBusy(user_ids, start, args['days'])
+            # Bitmaps come back keyed by minute of day; renumber them over the start times in use
+            union = 0
+            for bitmaps in free_busy.values():
+                for bitmap in bitmaps:
+                    union |= bitmap or 0
+            slots = db.freeSlots(union)
+            bits = {h * 60 + m: 1 << i for i, (h, m) in enumerate(slots)}
+            return {
+                'start': start.isoformat(),
+                'days': args['days'],
+                'slots': [f"{h:02d}:{m:02d}" for h, m in slots],
+                'users': {str(user_id): [None if bitmap is None else sum(bits[h * 60 + m] for h, m in db.freeSlots(bitmap))
+                                         for bitmap in bitmaps]
+                          for user_id, bitmaps in free_busy.items()}
+            }, 200
+        except Exception as e:
+            abort(500, message=str(e))
+
+
+def parse_selections(selections):
+    """Validate [{date, hour, minute}, ...] into (date, hour, minute) tuples"""
+    parsed = []
+    for sel in selections:
+        try:
+            date = sel.get('date')
+            datetime.strptime(date, '%Y-%m-%d')
+            hour = int(sel.get('hour'))
+            minute = int(sel.get('minute'))
+        except Exception:
+            abort(400, message="Each selection must include date (YYYY-MM-DD), hour, minute")
+        parsed.append((date, hour, minute))
+    return parsed
+
+
+BOOKING_ERRORS = {
+    'busy': "Your schedule is not available for timeslot {time}",
+    'queued': "You're already on queue for timeslot {time}",
+    'closed': "Timeslot {time} is not available",
+    'missing': "Timeslot {time} on {date} not found",
+    'notbooked': "You have no appointment at timeslot {time} on {date}",
+}
+
+
 class Appointment(Resource):
-    """Submit up to 3 timeslot selections for a user (viewer)"""
+    """Submit up to MAX_SELECTIONS timeslot selections for a user (viewer)"""
+    method_decorators = [auth.authenticated]
+
     def post(self, user_id):
         payload = request.get_json(force=True) or {}
         selections = payload.get('selections', [])
-        booker_id = payload.get("bookerID")
+        booker_id = payload.get("bookerID") or auth.currentClaims()['userID']
 
         if not booker_id:
             abort(400, message="bookerID is required")
+        if not auth.canActFor(booker_id):
+            abort(403, message="Not allowed to book for this user")
         if not isinstance(selections, list) or not selections:
             abort(400, message="selections must be a non-empty array")
-        if len(selections) > 3:
-            abort(400, message="You can select at most 3 timeslots")
+        if len(selections) > MAX_SELECTIONS:
+            abort(400, message=f"You can select at most {MAX_SELECTIONS} timeslots")
 
-        booked = []
-        for sel in selections:
-            try:
-                date = sel.get('date')
-                hour = int(sel.get('hour'))
-                minute = int(sel.get('minute'))
-            except Exception:
-                abort(400, message="Each selection must include date (YYYY-MM-DD), hour, minute")
-
-            # Ensure the booker's own schedule is free for the requested slot
-            is_available = db.checkOwnAvailability(booker_id, hour, minute, date)
-            selectedTimeslotID = db.getTimeslotID(user_id, date, hour, minute)
-            if not is_available:
-                abort(400, message=f"Your schedule is not available for timeslot {hour:02d}:{minute:02d}")
-            
-            # Check if already in waitlist before trying to book
-            if db.isInWaitlist(booker_id, selectedTimeslotID):
-                abort(400, message=f"You're already on queue for timeslot {hour:02d}:{minute:02d}")
-            
-            try:
-                db.schedulerAlgorithm(user_id, date, hour, minute, booker_id)
-                booked.append({'date': date, 'hour': hour, 'minute': minute})
-            except Exception as e:
-                abort(500, message=str(e))
-        return { 'message': 'Appointment submitted', 'booked': booked }, 200
+        parsed = parse_selections(selections)
+        try:
+            # The whole batch is checked, then booked or queued, in one transaction
+            statuses = db.bookSlots(user_id, booker_id, parsed)
+        except Exception as e:
+            abort(500, message=str(e))
+
+        results = [
+            {'date': date, 'hour': hour, 'minute': minute, 'status': status}
+            for (date, hour, minute), status in zip(parsed, statuses)
+        ]
+        for result in results:
+            if result['status'] in BOOKING_ERRORS:
+                abort(400, message=BOOKING_ERRORS[result['status']].format(
+                    time=f"{result['hour']:02d}:{result['minute']:02d}", date=result['date']), results=results)
+        return { 'message': 'Appointment submitted', 'booked': results }, 200
 
     def delete(self, user_id):
-        username = db.getUsernameByID(user_id)
         payload = request.get_json(force=True) or {}
         selections = payload.get('selections', [])
-        booker_id = payload.get("bookerID")
+        booker_id = payload.get("bookerID") or auth.currentClaims()['userID']
 
         if not booker_id:
             abort(400, message="bookerID is required")
+        if not auth.canActFor(booker_id) and not auth.canActFor(user_id):
+            abort(403, message="Not allowed to cancel for this user")
         if not isinstance(selections, list) or not selections:
             abort(400, message="selections must be a non-empty array")
 
-        canceled = []
-        for sel in selections:
-            try:
-                date = sel.get('date')
-                hour = int(sel.get('hour'))
-                minute = int(sel.get('minute'))
-            except Exception:
-                abort(400, message="Each selection must include date (YYYY-MM-DD), hour, minute")
+        parsed = parse_selections(selections)
+        try:
+            # Every selection is canceled and its waitlist head promoted in one transaction
+            outcomes = db.cancelSlots(user_id, booker_id, parsed)
+        except Exception as e:
+            abort(500, message=str(e))
 
-            try:
-                db.reopenSlotForBooker(booker_id,date,hour,minute)
-                waitingUserEmail = db.reSchedulerAlgorithm(user_id,date,hour,minute)
-                canceled.append({'date': date, 'hour': hour, 'minute': minute})
-                if (waitingUserEmail):
-                    sns_client.publish(
-                        TopicArn=TOPIC_ARN, 
-                        Message=f"A spot for the appointment with {username} opened up on {date} at {hour:02d}:{minute:02d}!",
-                        Subject="Appointment Rescheduled",
-                        MessageAttributes={
-                            'target_email': {
-                                'DataType': 'String',
-                                'StringValue': waitingUserEmail
-                            }
-                        }
-                    )
-            except Exception as e:
-                abort(500, message=str(e))
-
-        return { 'message': 'Appointment canceled', 'canceled': canceled }, 200
+        results = [
+            {'date': date, 'hour': hour, 'minute': minute, 'status': status}
+            for (date, hour, minute), (status, _) in zip(parsed, outcomes)
+        ]
+        for result in results:
+            if result['status'] in BOOKING_ERRORS:
+                abort(400, message=BOOKING_ERRORS[result['status']].format(
+                    time=f"{result['hour']:02d}:{result['minute']:02d}", date=result['date']), results=results)
+
+        promoted = [(selection, waitingUserEmail) for selection, (_, waitingUserEmail) in zip(parsed, outcomes) if waitingUserEmail]
+        if not promoted:
+            return { 'message': 'Appointment canceled', 'canceled': results }, 200
+
+        try:
+            # The caller is usually the booker, so the owner's name is only looked up when someone gets notified
+            username = auth.usernameFor(user_id) or db.getUsernameByID(user_id)
+            db.enqueueNotifications([
+                ('publish', waitingUserEmail, "Appointment Rescheduled",
+                 f"A spot for the appointment with {username} opened up on {date} at {hour:02d}:{minute:02d}!")
+                for (date, hour, minute), waitingUserEmail in promoted
+            ])
+        except Exception as e:
+            abort(500, message=str(e))
+
+        return { 'message': 'Appointment canceled', 'canceled': results }, 200
     
 
+def parse_time(value, name):
+    """'HH:MM' into (hour, minute); None passes through"""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.strptime(value, '%H:%M')
+    except (TypeError, ValueError):
+        abort(400, message=f"{name} must be in format HH:MM")
+    return (parsed.hour, parsed.minute)
+
+
+class MeetingSolver(Resource):
+    """Find, and optionally book, the owner's best slots that every participant is free for"""
+    method_decorators = [auth.authenticated]
+
+    def post(self, user_id):
+        """
+        Expects: { "participants": [userID, ...], "start": "YYYY-MM-DD", "days": N,
+                   "earliest": "HH:MM", "latest": "HH:MM", "weekdays": [0-6], "limit": N,
+                   "book": false, "bookerID": userID }
+        With book set, the best candidate still free is booked for bookerID (default: the caller).
+        """
+        payload = request.get_json(force=True) or {}
+        participants = payload.get('participants', [])
+        days = payload.get('days', 7)
+        limit = payload.get('limit', 5)
+        weekdays = payload.get('weekdays')
+
+        if not isinstance(participants, list) or not all(isinstance(p, int) for p in participants):
+            abort(400, message="participants must be an array of user IDs")
+        if len(participants) + 1 > MAX_FREEBUSY_USERS:
+            abort(400, message=f"At most {MAX_FREEBUSY_USERS - 1} participants are allowed")
+        if not isinstance(days, int) or not 1 <= days <= MAX_SCHEDULE_RANGE_DAYS:
+            abort(400, message=f"days must be between 1 and {MAX_SCHEDULE_RANGE_DAYS}")
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_SOLVER_CANDIDATES:
+            abort(400, message=f"limit must be between 1 and {MAX_SOLVER_CANDIDATES}")
+        if weekdays is not None and (not isinstance(weekdays, list) or not all(d in range(7) for d in weekdays)):
+            abort(400, message="weekdays must be an array of 0 (Monday) to 6 (Sunday)")
+        try:
+            start = datetime.strptime(payload['start'], '%Y-%m-%d').date() if payload.get('start') else datetime.now().date()
+        except (TypeError, ValueError):
+            abort(400, message="start must be in format YYYY-MM-DD")
+        earliest = parse_time(payload.get('earliest'), 'earliest')
+        latest = parse_time(payload.get('latest'), 'latest')
+
+        booker_id = None
+        if payload.get('book'):
+            booker_id = payload.get('bookerID') or auth.currentClaims()['userID']
+            if not booker_id:
+                abort(400, message="bookerID is required")
+            if not auth.canActFor(booker_id):
+                abort(403, message="Not allowed to book for this user")
+            # The booker has to be free as well
+            participants = participants + [booker_id]
+
+        try:
+            candidates = solver.solve(user_id, participants, start, days, earliest=earliest, latest=latest,
+                                      weekdays=set(weekdays) if weekdays is not None else None, limit=limit)
+            if booker_id is None:
+                return {'candidates': candidates}, 200
+            booked = solver.book(user_id, booker_id, candidates)
+        except Exception as e:
+            abort(500, message=str(e))
+
+        if booked is None:
+            abort(409, message="No common timeslot could be booked", candidates=candidates)
+        return {'message': 'Appointment submitted', 'booked': booked, 'candidates': candidates}, 200
+
+
 class Analytics(Resource):
+    method_decorators = [responses.etag(lambda user_id: db.getAnalyticsVersion(user_id)), auth.ownerRequired]
+
     def get(self, user_id):
         try:
-            frequent_slot = db.getMostFrequentSlotOfUser(user_id)
+            # One keyed read of the rollups that every confirmed booking keeps current
+            analytics = db.getAnalytics(user_id)
             formatted_slot = ""
-            if frequent_slot:
-                h,m = frequent_slot[0], frequent_slot[1]
+            if analytics['slot']:
+                h,m = analytics['slot']
                 formatted_slot = f"{h:02d}:{m:02d}"
 
-            top_bookers = db.getTopBookers(user_id)
-            bookers_list = []
-            if top_bookers:
-                for i in top_bookers:
-                    bookers_list.append({"name": i[0], "count": i[1]})
+            # Grouped by booker ID, so two bookers sharing a name are listed separately
+            bookers_list = [
+                {"userID": booker_id, "name": name, "count": count}
+                for booker_id, name, count in analytics['bookers']
+            ]
 
             return {
                 "frequent_hour": formatted_slot,
-                "top_bookers": bookers_list
+                "top_bookers": bookers_list,
+                "total_bookings": analytics['total']
             },200
 
         except Exception as e:
             abort(500, message=str(e))
 
 
+class AnalyticsWindow(Resource):
+    """Windowed analytics from the day/week event buckets the aggregation job maintains"""
+    method_decorators = [auth.ownerRequired]
+
+    def get(self, user_id):
+        parser = reqparse.RequestParser()
+        parser.add_argument('days', type=int, default=30, location='args')
+        parser.add_argument('grain', type=str, default='day', choices=('day', 'week'), location='args')
+        parser.add_argument('top', type=int, default=3, location='args')
+        args = parser.parse_args()
+        if not 1 <= args['days'] <= MAX_ANALYTICS_WINDOW_DAYS:
+            abort(400, message=f"days must be between 1 and {MAX_ANALYTICS_WINDOW_DAYS}")
+
+        # Buckets are keyed by the UTC day the events happened on
+        since = datetime.utcnow().date() - timedelta(days=args['days'] - 1)
+        if args['grain'] == 'week':
+            since -= timedelta(days=since.weekday())
+
+        try:
+            buckets, as_of = db.getBookingEventBuckets(user_id, since, args['grain'])
+        except Exception as e:
+            abort(500, message=str(e))
+
+        totals = dict.fromkeys(db.BOOKING_EVENT_KINDS, 0)
+        slots = {}
+        trend = {}
+        for bucket_start, kind, hour, minute, count in buckets:
+            totals[kind] += count
+            if kind in ('booked', 'promoted'):
+                slots[(hour, minute)] = slots.get((hour, minute), 0) + count
+            trend.setdefault(bucket_start, dict.fromkeys(db.BOOKING_EVENT_KINDS, 0))[kind] += count
+
+        confirmed = totals['booked'] + totals['promoted']
+        cancelled = totals['canceled'] + totals['ownerCanceled']
+        top_slots = sorted(slots.items(), key=lambda item: (-item[1], item[0]))[:args['top']]
+        return {
+            "since": since.isoformat(),
+            "grain": args['grain'],
+            "as_of": as_of.isoformat() if as_of else None,
+            "totals": totals,
+            "top_slots": [{"time": f"{h:02d}:{m:02d}", "count": count} for (h, m), count in top_slots],
+            "cancellation_rate": round(cancelled / confirmed, 4) if confirmed else None,
+            "waitlist_conversion": round(totals['promoted'] / totals['waitlisted'], 4) if totals['waitlisted'] else None,
+            "trend": [{"start": start.isoformat(), **counts} for start, counts in sorted(trend.items())]
+        }, 200
+
+
+def format_minute(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def template_payload(template, rebuilt=None):
+    """A stored slot template (None = the default slots) as returned by SlotTemplate"""
+    if template is None:
+        slots = db.DEFAULT_TIMESLOTS
+        payload = {'default': True}
+    else:
+        slots = db.templateSlots(template['startMinute'], template['endMinute'], template['slotMinutes'], template['breaks'])
+        payload = {
+            'default': False,
+            'start': format_minute(template['startMinute']),
+            'end': format_minute(template['endMinute']),
+            'duration': template['slotMinutes'],
+            'breaks': [{'start': format_minute(start), 'end': format_minute(end)} for start, end in template['breaks']],
+        }
+    payload['slots'] = [f"{h:02d}:{m:02d}" for h, m in slots]
+    if rebuilt is not None:
+        payload['rebuiltDays'] = rebuilt
+    return payload
+
+
+class SlotTemplate(Resource):
+    """Get, set or reset the owner's working hours and slot length"""
+    method_decorators = [auth.ownerRequired]
+
+    def get(self, user_id):
+        try:
+            return template_payload(db.getSlotTemplate(user_id)), 200
+        except Exception as e:
+            abort(500, message=str(e))
+
+    def put(self, user_id):
+        """
+        Expects: { "start": "HH:MM", "end": "HH:MM", "duration": minutes,
+                   "breaks": [{"start": "HH:MM", "end": "HH:MM"}, ...] }
+        Days created from now on use the template, as do existing untouched days from today on.
+        """
+        payload = request.get_json(force=True) or {}
+        start = parse_time(payload.get('start'), 'start')
+        end = parse_time(payload.get('end'), 'end')
+        duration = payload.get('duration')
+        breaks = payload.get('breaks') or []
+        if start is None or end is None:
+            abort(400, message="start and end are required (HH:MM)")
+        if not isinstance(duration, int):
+            abort(400, message="duration must be a number of minutes")
+        if not isinstance(breaks, list) or not all(isinstance(b, dict) for b in breaks):
+            abort(400, message="breaks must be an array of {start, end}")
+
+        parsed_breaks = []
+        for b in breaks:
+            break_start = parse_time(b.get('start'), 'break start')
+            break_end = parse_time(b.get('end'), 'break end')
+            if break_start is None or break_end is None or break_start >= break_end:
+                abort(400, message="Each break needs a start before its end (HH:MM)")
+            parsed_breaks.append((break_start[0] * 60 + break_start[1], break_end[0] * 60 + break_end[1]))
+
+        template = {'startMinute': start[0] * 60 + start[1], 'endMinute': end[0] * 60 + end[1],
+                    'slotMinutes': duration, 'breaks': parsed_breaks}
+        try:
+            rebuilt = db.setSlotTemplate(user_id, template)
+        except ValueError as e:
+            abort(400, message=str(e))
+        except Exception as e:
+            abort(500, message=str(e))
+        return template_payload(db.getSlotTemplate(user_id), rebuilt), 200
+
+    def delete(self, user_id):
+        """Go back to the default slots"""
+        try:
+            rebuilt = db.setSlotTemplate(user_id, None)
+        except Exception as e:
+            abort(500, message=str(e))
+        return template_payload(None, rebuilt), 200
+
+
 class Profile(Resource):
     """Update basic profile fields for the current user"""
+    method_decorators = [auth.ownerRequired]
+
     def put(self, user_id):
         payload = request.get_json(force=True) or {}
         name = payload.get("name")
@@ -330,7 +720,11 @@ class Profile(Resource):
             success = db.updateUser(user_id, name=name, username=username, email=email)
             if not success:
                 abort(500, message="Failed to update profile")
-            return {"message": "Profile updated"}, 200
+            result = {"message": "Profile updated"}
+            if username and auth.usernameFor(user_id):
+                # The old token still names the old username
+                result["token"] = auth.userToken(user_id, username)
+            return result, 200
         except Exception as e:
             abort(500, message=str(e))
 
@@ -341,27 +735,20 @@ class AdminAuth(Resource):
         parser.add_argument('password', type=str, required=True, help='Password is required')
         args = parser.parse_args()
         
-        # Check admin credentials in database
+        # Check admin credentials in database, once; later admin calls send the token
         admin = db.checkAdminLogin('admin', args['password'])
         
         if admin:
-            return {'message': 'Admin authenticated successfully'}, 200
+            return {'message': 'Admin authenticated successfully', 'token': auth.adminToken()}, 200
         else:
             abort(401, message="Invalid admin password")
 
 
 class AdminInitialize(Resource):
     """Initialize or reset the database with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
     def post(self):
-        parser = reqparse.RequestParser()
-        parser.add_argument('password', type=str, required=True, help='Password is required')
-        args = parser.parse_args()
-        
-        # Verify admin credentials
-        admin = db.checkAdminLogin('admin', args['password'])
-        if not admin:
-            abort(401, message="Invalid admin password")
-        
         try:
             db.createTables()
             return {'message': 'Database initialized successfully'}, 200
@@ -371,16 +758,9 @@ class AdminInitialize(Resource):
 
 class AdminReset(Resource):
     """Reset the database with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
     def post(self):
-        parser = reqparse.RequestParser()
-        parser.add_argument('password', type=str, required=True, help='Password is required')
-        args = parser.parse_args()
-        
-        # Verify admin credentials
-        admin = db.checkAdminLogin('admin', args['password'])
-        if not admin:
-            abort(401, message="Invalid admin password")
-        
         try:
             db.createTables()
             return {'message': 'Database reset successfully'}, 200
@@ -388,143 +768,202 @@ class AdminReset(Resource):
             abort(500, message=f"Reset failed: {str(e)}")
 
 
+def admin_users_page(args, after, limit):
+    rows, next_key = db.getUsersPage(after, limit, userID=args['userID'], search=args['search'])
+    # One query for the bookings of the whole page instead of one per user
+    bookings = db.getBookingsForUsers([row[4] for row in rows])
+    users = []
+    for name, username, email, password, user_id in rows:
+        bookings_list = [
+            {
+                'date': str(booking[0]),
+                'hour': booking[1],
+                'minute': booking[2],
+                'owner_name': booking[3]
+            } for booking in bookings[user_id]
+        ]
+        users.append({
+            'userID': user_id,
+            'name': name,
+            'username': username,
+            'email': email,
+            'password': password,
+            'bookings': bookings_list,
+            'booking_count': len(bookings_list)
+        })
+    return users, next_key
+
+def admin_schedules_page(args, after, limit):
+    rows, next_key = db.getSchedulesPage(after, limit, userID=args['userID'], dateFrom=args['dateFrom'], dateTo=args['dateTo'])
+    return [
+        {
+            'scheduleID': sched[3],
+            'userID': sched[0],
+            'username': sched[1] if sched[1] else 'Unknown',
+            'date': str(sched[2])
+        } for sched in rows
+    ], next_key
+
+def admin_timeslots_page(args, after, limit):
+    rows, next_key = db.getTimeslotsPage(after, limit, userID=args['userID'], dateFrom=args['dateFrom'], dateTo=args['dateTo'], bookedByUserID=args['bookedByUserID'])
+    return [
+        {
+            'timeSlotID': ts[0],
+            'scheduleID': ts[3],
+            'hour': ts[4],
+            'minute': ts[5],
+            'available': int(ts[1]),
+            'bookedByUserID': ts[2]
+        } for ts in rows
+    ], next_key
+
+def admin_stats_page(args, after, limit):
+    rows, next_key = db.getAppointmentStatsPage(after, limit, ownerUserID=args['userID'])
+    return [
+        {
+            'ownerUserID': s[1],
+            'bookerUserID': s[2],
+            'hour': s[3],
+            'minute': s[4],
+            'bookingCount': s[0]
+        } for s in rows
+    ], next_key
+
+# section -> (key length of its cursor, page function)
+ADMIN_SECTIONS = {
+    'users': (1, admin_users_page),
+    'schedules': (1, admin_schedules_page),
+    'timeslots': (3, admin_timeslots_page),
+    'appointment_stats': (4, admin_stats_page),
+}
+
+def encode_cursor(key):
+    return ':'.join(str(part) for part in key) if key else None
+
+def decode_cursor(section, cursor):
+    if not cursor:
+        return None
+    try:
+        key = tuple(int(part) for part in cursor.split(':'))
+    except ValueError:
+        key = ()
+    if len(key) != ADMIN_SECTIONS[section][0]:
+        abort(400, message=f"Invalid cursor for {section}")
+    return key
+
+
 class AdminView(Resource):
-    """View all users and their information with admin authentication"""
+    """
+    View the database with admin authentication, one keyset page per section.
+    Pass section + after (the cursor from 'next') to page through a single section,
+    filters (userID, search, dateFrom, dateTo, bookedByUserID) to narrow it, and
+    format=ndjson to stream every matching row instead.
+    """
+    method_decorators = [auth.adminRequired]
+
     def post(self):
         parser = reqparse.RequestParser()
-        parser.add_argument('password', type=str, required=True, help='Password is required')
+        parser.add_argument('section', type=str, choices=list(ADMIN_SECTIONS), help='Unknown section')
+        parser.add_argument('after', type=str)
+        parser.add_argument('limit', type=int, default=ADMIN_PAGE_SIZE)
+        parser.add_argument('userID', type=int)
+        parser.add_argument('search', type=str)
+        parser.add_argument('dateFrom', type=str)
+        parser.add_argument('dateTo', type=str)
+        parser.add_argument('bookedByUserID', type=int)
+        parser.add_argument('format', type=str, default='json', choices=['json', 'ndjson'], help='format must be json or ndjson')
         args = parser.parse_args()
-        
-        # Verify admin credentials
-        admin = db.checkAdminLogin('admin', args['password'])
-        if not admin:
-            abort(401, message="Invalid admin password")
-        
-        try:
-            rows = db.getAllUsersInfo()
-            user_list = []
-            for row in rows:
-                user_id = row[0]
-                user_bookings = db.getUserBookings(user_id)
-                # Convert booking rows to serializable format
-                bookings_list = [
-                    {
-                        'date': str(booking[0]),
-                        'hour': booking[1],
-                        'minute': booking[2],
-                        'owner_name': booking[3]
-                    } for booking in user_bookings
-                ]
-                user_list.append({
-                    'userID': row[0],
-                    'name': row[1],
-                    'username': row[2],
-                    'email': row[3],
-                    'password': row[4],
-                    'bookings': bookings_list,
-                    'booking_count': len(bookings_list)
-                })
-            
-            # Get schedules
-            db.cursor.execute("SELECT scheduleID, userID, scheduleDate FROM userSchedule ORDER BY scheduleDate DESC")
-            schedule_rows = db.cursor.fetchall()
-            schedules_list = []
-            for sched in schedule_rows:
-                # Get username for display
-                db.cursor.execute("SELECT username FROM users WHERE userID = ?", (sched[1],))
-                username_row = db.cursor.fetchone()
-                schedules_list.append({
-                    'scheduleID': sched[0],
-                    'userID': sched[1],
-                    'username': username_row[0] if username_row else 'Unknown',
-                    'date': str(sched[2])
-                })
-            
-            # Get timeslots ordered to include all schedules chronologically
-            db.cursor.execute("SELECT timeSlotID, scheduleID, hour, minute, available, bookedByUserID FROM timeslots ORDER BY scheduleID ASC, hour ASC, minute ASC")
-            timeslot_rows = db.cursor.fetchall()
-            timeslots_list = [
-                {
-                    'timeSlotID': ts[0],
-                    'scheduleID': ts[1],
-                    'hour': ts[2],
-                    'minute': ts[3],
-                    'available': ts[4],
-                    'bookedByUserID': ts[5]
-                } for ts in timeslot_rows
-            ]
 
-            # appointment stats snapshot
-            db.cursor.execute("SELECT ownerUserID, bookerUserID, hour, minute, bookingCount FROM appointmentStats")
-            stats_rows = db.cursor.fetchall()
-            stats_list = [
-                {
-                    'ownerUserID': s[0],
-                    'bookerUserID': s[1],
-                    'hour': s[2],
-                    'minute': s[3],
-                    'bookingCount': s[4]
-                } for s in stats_rows
-            ]
-            
-            return {
-                'user_count': len(user_list),
-                'users': user_list,
-                'schedules': schedules_list,
-                'timeslots': timeslots_list,
-                'appointment_stats': stats_list,
-                'message': 'Database view retrieved successfully'
-            }, 200
+        if args['after'] and not args['section']:
+            abort(400, message="after requires a section")
+        limit = max(1, min(args['limit'], ADMIN_PAGE_MAX))
+        sections = [args['section']] if args['section'] else list(ADMIN_SECTIONS)
+        after = decode_cursor(args['section'], args['after']) if args['section'] else None
+
+        if args['format'] == 'ndjson':
+            return Response(stream_with_context(self.stream(args, sections, after, limit)), mimetype='application/x-ndjson')
+
+        try:
+            result = {'next': {}}
+            for section in sections:
+                rows, next_key = ADMIN_SECTIONS[section][1](args, after, limit)
+                result[section] = rows
+                result['next'][section] = encode_cursor(next_key)
+            if 'users' in result:
+                result['user_count'] = len(result['users'])
+            result['message'] = 'Database view retrieved successfully'
+            return result, 200
         except Exception as e:
             abort(500, message=f"View failed: {str(e)}")
 
+    @staticmethod
+    def stream(args, sections, after, limit):
+        """Yield one JSON line per row, fetching page by page so memory stays bounded"""
+        try:
+            for section in sections:
+                page_fn = ADMIN_SECTIONS[section][1]
+                key = after
+                while True:
+                    rows, key = page_fn(args, key, limit)
+                    for row in rows:
+                        yield json.dumps({'section': section, 'row': row}) + '\n'
+                    if key is None:
+                        break
+                after = None
+        except Exception as e:
+            yield json.dumps({'error': f"View failed: {str(e)}"}) + '\n'
+
 
 class AdminBackup(Resource):
-    """Backup the database with admin authentication"""
+    """Stream a gzip-compressed NDJSON backup of the database with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
     def post(self):
         parser = reqparse.RequestParser()
-        parser.add_argument('password', type=str, required=True, help='Password is required')
+        parser.add_argument('incremental', type=inputs.boolean, default=False)
         args = parser.parse_args()
         
-        # Verify admin credentials
-        admin = db.checkAdminLogin('admin', args['password'])
-        if not admin:
-            abort(401, message="Invalid admin password")
-        
         try:
-            backup_data = db.backupDatabase()
-            if backup_data is None:
-                abort(500, message="Backup failed")
-            
-            # Convert Row objects to serializable format, handling date objects
-            def serialize_value(value):
-                """Convert non-JSON-serializable types to strings"""
-                if isinstance(value, date):
-                    return str(value)
-                elif isinstance(value, datetime):
-                    return value.isoformat()
-                else:
-                    return value
-            
-            serializable_backup = {}
-            for table_name, rows in backup_data.items():
-                serializable_backup[table_name] = [
-                    tuple(serialize_value(val) for val in row) for row in rows
-                ]
-            
-            return {
-                'message': 'Database backed up successfully',
-                'backup': serializable_backup
-            }, 200
+            chunks = backup.iterBackup(incremental=args['incremental'])
+        except ValueError as e:
+            abort(400, message=str(e))
         except Exception as e:
             abort(500, message=f"Backup failed: {str(e)}")
 
+        kind = 'incremental' if args['incremental'] else 'full'
+        filename = f"dynazor_backup_{kind}_{date.today()}.ndjson.gz"
+        return Response(
+            stream_with_context(chunks),
+            mimetype='application/gzip',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+
+class AdminRestore(Resource):
+    """Restore the database from an uploaded backup file with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
+    def post(self):
+        parser = reqparse.RequestParser()
+        parser.add_argument('backup', type=FileStorage, required=True, location='files', help='Backup file is required')
+        args = parser.parse_args()
+
+        try:
+            counts = backup.restoreFile(args['backup'].stream)
+        except (ValueError, OSError) as e:
+            abort(400, message=f"Invalid backup: {str(e)}")
+        except Exception as e:
+            abort(500, message=f"Restore failed: {str(e)}")
+
+        return {'message': 'Database restored successfully', 'restored': counts}, 200
+
 
 class AdminModify(Resource):
     """Modify user information or delete users with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
     def post(self):
         parser = reqparse.RequestParser()
-        parser.add_argument('password', type=str, required=True, help='Password is required')
         parser.add_argument('action', type=str, required=True, help='Action is required (update, delete)')
         parser.add_argument('userID', type=int, required=True, help='User ID is required')
         parser.add_argument('name', type=str)
@@ -532,11 +971,6 @@ class AdminModify(Resource):
         parser.add_argument('email', type=str)
         args = parser.parse_args()
         
-        # Verify admin credentials
-        admin = db.checkAdminLogin('admin', args['password'])
-        if not admin:
-            abort(401, message="Invalid admin password")
-        
         try:
             if args['action'] == 'update':
                 success = db.updateUser(
@@ -561,4 +995,43 @@ class AdminModify(Resource):
                 abort(400, message="Invalid action. Use 'update' or 'delete'")
         
         except Exception as e:
-            abort(500, message=f"Modify failed: {str(e)}")
\ No newline at end of file
+            abort(500, message=f"Modify failed: {str(e)}")
+
+class AdminRebuildAnalytics(Resource):
+    """Recompute the analytics rollups from appointmentStats with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
+    def post(self):
+        try:
+            owners = db.rebuildAnalytics()
+            return {'message': 'Analytics rebuilt successfully', 'owners': owners}, 200
+        except Exception as e:
+            abort(500, message=f"Rebuild failed: {str(e)}")
+
+
+class AdminCacheStats(Resource):
+    """Report schedule cache hit/miss counters with admin authentication"""
+    method_decorators = [auth.adminRequired]
+
+    def post(self):
+        stats = {'schedule_cache': db.scheduleCache.stats(), 'freebusy_cache': db.freeBusyCache.stats()}
+        if db.slotIndex is not None:
+            stats['slot_index'] = db.slotIndex.stats()
+        stats['changefeed'] = db.changes.stats()
+        return stats, 200
+
+
+class Metrics(Resource):
+    """Request and query performance metrics in the Prometheus text format"""
+    method_decorators = [auth.metricsRequired]
+
+    def get(self):
+        pool_stats = db.pool.stats()
+        cache_stats = db.scheduleCache.stats()
+        gauges = [
+            ('dynazor_db_pool_connections', 'Open pooled DB connections', pool_stats['size']),
+            ('dynazor_db_pool_in_use', 'Pooled DB connections checked out', pool_stats['inUse']),
+            ('dynazor_schedule_cache_hits', 'Schedule cache hits since start', cache_stats['hits']),
+            ('dynazor_schedule_cache_misses', 'Schedule cache misses since start', cache_stats['misses']),
+        ]
+        return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
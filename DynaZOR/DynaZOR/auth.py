@@ -0,0 +1,148 @@
+"""
+Signed access tokens for DynaZOR.
+Login, Register and AdminAuth issue a token carrying the caller's identity;
+protected endpoints verify it in-process with the app's SECRET_KEY, so
+authenticating a request needs no database round trip. Tokens are stateless:
+they stay valid until they expire, even if the user is deleted meanwhile.
+"""
+
+import hmac
+import os
+import time
+from functools import wraps
+from flask import current_app, g, request
+from flask_restful import abort
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from . import db
+from .cache import TTLCache
+
+TOKEN_TTL = int(os.getenv('AUTH_TOKEN_TTL_SECONDS', 12 * 60 * 60))
+# Verified claims are reused for this long, but never past the token's own expiry
+CLAIMS_CACHE_TTL = int(os.getenv('AUTH_CLAIMS_CACHE_SECONDS', 300))
+
+# Static bearer token for metrics scrapers, which cannot log in; unset allows admin tokens only
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+claimsCache = TTLCache(maxSize=10000, ttl=CLAIMS_CACHE_TTL)
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='dynazor-auth')
+
+
+def userToken(userID, username):
+    return _serializer().dumps({'role': 'user', 'userID': userID, 'username': username})
+
+
+def adminToken():
+    return _serializer().dumps({'role': 'admin', 'userID': None, 'username': 'admin'})
+
+
+def verifyToken(token):
+    """Claims of a valid, unexpired token, otherwise None"""
+    cached = claimsCache.get(token)
+    if cached is not None:
+        claims, expiresAt = cached
+        if expiresAt > time.time():
+            return claims
+        claimsCache.delete(token)
+        return None
+    try:
+        claims, issuedAt = _serializer().loads(token, max_age=TOKEN_TTL, return_timestamp=True)
+    except BadSignature:  # also covers SignatureExpired
+        return None
+    claimsCache.set(token, (claims, issuedAt.timestamp() + TOKEN_TTL))
+    return claims
+
+
+def currentClaims():
+    """Claims of the request's 'Authorization: Bearer <token>' header, or None"""
+    if 'auth_claims' not in g:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        g.auth_claims = verifyToken(token.strip()) if scheme.lower() == 'bearer' and token.strip() else None
+    return g.auth_claims
+
+
+def canActFor(userID):
+    """Whether the caller is the given user or the admin"""
+    claims = currentClaims()
+    if claims is None:
+        return False
+    return claims['role'] == 'admin' or claims['userID'] == userID
+
+
+def usernameFor(userID):
+    """The user's username when the caller's own token carries it, else None"""
+    claims = currentClaims()
+    if claims and claims['role'] == 'user' and claims['userID'] == userID:
+        return claims['username']
+    return None
+
+
+def authenticated(method):
+    """Resource method decorator: any signed-in user or the admin"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if currentClaims() is None:
+            abort(401, message="Authentication required")
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def queryToken(method):
+    """
+    Resource method decorator for EventSource endpoints, which cannot send headers: a token in
+    ?access_token= is used when there is no Authorization header. List it after authenticated.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        token = request.args.get('access_token')
+        if token and 'Authorization' not in request.headers:
+            g.auth_claims = verifyToken(token)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def ownerRequired(method):
+    """Resource method decorator: the user named by the user_id URL parameter, or the admin"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if currentClaims() is None:
+            abort(401, message="Authentication required")
+        if not canActFor(kwargs.get('user_id')):
+            abort(403, message="Not allowed to act for this user")
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def metricsRequired(method):
+    """Resource method decorator: an admin token, or METRICS_TOKEN as the bearer token"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        scraper = (METRICS_TOKEN and scheme.lower() == 'bearer'
+                   and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode()))
+        if not scraper:
+            claims = currentClaims()
+            if claims is None:
+                abort(401, message="Authentication required")
+            if claims['role'] != 'admin':
+                abort(403, message="Admin access required")
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def adminRequired(method):
+    """
+    Resource method decorator: an admin token, or the admin password in the
+    JSON body or form for scripts that do not hold a token.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        claims = currentClaims()
+        if claims is None or claims['role'] != 'admin':
+            password = request.form.get('password') or (request.get_json(silent=True) or {}).get('password')
+            if not password or not db.checkAdminLogin('admin', password):
+                abort(401, message="Invalid admin password")
+        return method(*args, **kwargs)
+    return wrapper
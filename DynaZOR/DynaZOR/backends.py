@@ -0,0 +1,299 @@
+"""
+Storage backends for DynaZOR.
+Each backend knows how to open a connection and how to phrase the few
+statements whose syntax differs between SQL Server and SQLite.
+"""
+
+import os
+import re
+import sqlite3
+import uuid
+from datetime import date, datetime
+
+
+class SQLServerBackend:
+    """Microsoft SQL Server through the ODBC Driver 17 (production)"""
+    name = 'sqlserver'
+    pingQuery = "SELECT 1"
+    identity = "INT IDENTITY(1,1) PRIMARY KEY"
+    # Table hint that keeps the rows read locked against other writers until commit
+    updateLock = "WITH (UPDLOCK, HOLDLOCK)"
+    # Table hint that locks the rows read and skips rows other transactions hold (work queues)
+    skipLocked = "WITH (UPDLOCK, READPAST, ROWLOCK)"
+    # SQL Server accepts at most 2100 parameters per request; keep headroom for the driver
+    maxBatchParams = 2000
+    # Highest row version below every open transaction: all rows up to it are committed
+    versionWatermark = "SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1"
+
+    def __init__(self, host=None, database=None, user=None, password=None):
+        self.host = host or os.getenv('SQLSERVER_HOST')
+        self.database = database or os.getenv('SQLSERVER_DB')
+        self.user = user or os.getenv('SQLSERVER_USER')
+        self.password = password or os.getenv('SQLSERVER_PASS')
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={self.host};"
+            f"DATABASE={self.database};"
+            f"UID={self.user};"
+            f"PWD={self.password}",
+        )
+
+    def dropTable(self, table):
+        return f"IF OBJECT_ID('{table}','U') IS NOT NULL DROP TABLE {table};"
+
+    def createTable(self, table, body):
+        """CREATE TABLE that does nothing when the table already exists"""
+        return f"IF OBJECT_ID('{table}','U') IS NULL CREATE TABLE {table} ({body});"
+
+    def createIndex(self, name, table, columns, unique=False, include=(), where=None):
+        """CREATE INDEX that does nothing when the index already exists; include adds covered columns"""
+        sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+        if include:
+            sql += f" INCLUDE ({', '.join(include)})"
+        if where:
+            sql += f" WHERE {where}"
+        return f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}')) {sql};"
+
+    def limit(self, query, n):
+        """Restrict a SELECT to its first n rows"""
+        return re.sub(r'^\s*SELECT\b', f"SELECT TOP {int(n)}", query, count=1, flags=re.IGNORECASE)
+
+    def insertReturning(self, cursor, table, columns, params, key):
+        """Insert one row and return the generated value of column `key`"""
+        placeholders = ', '.join('?' for _ in columns)
+        cursor.execute(
+            f"INSERT INTO {table}({', '.join(columns)}) OUTPUT INSERTED.{key} VALUES ({placeholders})",
+            params,
+        )
+        return cursor.fetchone()[0]
+
+    def executemany(self, cursor, query, rows):
+        """Send all parameter rows in one round trip"""
+        cursor.fast_executemany = True
+        cursor.executemany(query, rows)
+
+    def begin(self, cursor):
+        """Start a write transaction; pyodbc already opens one implicitly"""
+
+    def identityInsert(self, cursor, table, enabled):
+        """Allow explicit values in the IDENTITY column of `table` (used by restores)"""
+        cursor.execute(f"SET IDENTITY_INSERT {table} {'ON' if enabled else 'OFF'}")
+
+    def executeBatch(self, cursor, statements):
+        """
+        Run [(sql, params), ...] as one batch, i.e. one round trip, or as several batches in the
+        caller's transaction when the parameters would exceed maxBatchParams.
+        """
+        chunk, count = [], 0
+        for query, params in statements:
+            if chunk and count + len(params) > self.maxBatchParams:
+                self._executeChunk(cursor, chunk)
+                chunk, count = [], 0
+            chunk.append((query, params))
+            count += len(params)
+        if chunk:
+            self._executeChunk(cursor, chunk)
+
+    @staticmethod
+    def _executeChunk(cursor, statements):
+        sql = "SET NOCOUNT ON;\n" + ";\n".join(query.strip().rstrip(';') for query, _ in statements) + ";"
+        params = [param for _, queryParams in statements for param in queryParams]
+        cursor.execute(sql, params)
+
+    def upsertIncrement(self, table, keys, counter):
+        """SQL that adds 1 to `counter` of the row matching `keys`, inserting it at 1 if missing"""
+        source = ', '.join(f"? AS {key}" for key in keys)
+        match = ' AND '.join(f"t.{key} = s.{key}" for key in keys)
+        return f"""
+            MERGE {table} WITH (HOLDLOCK) AS t
+            USING (SELECT {source}) AS s
+            ON {match}
+            WHEN MATCHED THEN UPDATE SET {counter} = t.{counter} + 1
+            WHEN NOT MATCHED THEN INSERT ({', '.join(keys)}, {counter}) VALUES ({', '.join('s.' + key for key in keys)}, 1);
+        """
+
+    def upsertAdd(self, table, keys, counter):
+        """SQL that adds the last parameter to `counter` of the row matching `keys`, inserting it if missing"""
+        source = ', '.join(f"? AS {key}" for key in keys)
+        match = ' AND '.join(f"t.{key} = s.{key}" for key in keys)
+        return f"""
+            MERGE {table} WITH (HOLDLOCK) AS t
+            USING (SELECT {source}, ? AS amount) AS s
+            ON {match}
+            WHEN MATCHED THEN UPDATE SET {counter} = t.{counter} + s.amount
+            WHEN NOT MATCHED THEN INSERT ({', '.join(keys)}, {counter}) VALUES ({', '.join('s.' + key for key in keys)}, s.amount);
+        """
+
+    def isMissingTable(self, exc, table):
+        return f"Invalid object name '{table}'" in str(exc)
+
+    def addRowVersion(self, cursor, table, key):
+        """Add a version column that the engine restamps on every insert and update of a row"""
+        cursor.execute(f"IF COL_LENGTH('{table}', 'version') IS NULL ALTER TABLE {table} ADD version rowversion")
+
+    def versionOf(self, column):
+        """A version column as the integer clients hold as a token"""
+        return f"CAST({column} AS BIGINT)"
+
+    def touchOnChange(self, cursor, name, table, events, parent, key, column):
+        """
+        Trigger that restamps the version of the parent rows (matched on key) of every row
+        the events change in table, by assigning the parent's column to itself.
+        """
+        cursor.execute(f"""
+            CREATE OR ALTER TRIGGER {name} ON {table} AFTER {', '.join(events)} AS
+            BEGIN
+                SET NOCOUNT ON;
+                UPDATE {parent} SET {column} = {column}
+                WHERE {key} IN (SELECT {key} FROM inserted UNION SELECT {key} FROM deleted);
+            END
+        """)
+
+
+class SQLiteBackend:
+    """In-process SQLite engine for local runs, profiling and load tests"""
+    name = 'sqlite'
+    pingQuery = "SELECT 1"
+    identity = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    # SQLite locks the whole database instead; see begin()
+    updateLock = ""
+    skipLocked = ""
+    # Writers are serialized, so the counter never runs ahead of a committed row
+    versionWatermark = "SELECT version FROM rowVersion"
+
+    def __init__(self, path=None):
+        path = path or os.getenv('SQLITE_PATH', 'dynazor.sqlite3')
+        if path == ':memory:':
+            # Every pooled connection must see the same in-memory database
+            path = f"file:dynazor-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            uri=self.path.startswith('file:'),
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=30,
+        )
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self.path.startswith('file:'):
+            conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def dropTable(self, table):
+        return f"DROP TABLE IF EXISTS {table};"
+
+    def createTable(self, table, body):
+        """CREATE TABLE that does nothing when the table already exists"""
+        return f"CREATE TABLE IF NOT EXISTS {table} ({body});"
+
+    def createIndex(self, name, table, columns, unique=False, include=(), where=None):
+        """CREATE INDEX that does nothing when the index already exists; SQLite has no INCLUDE columns"""
+        sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        if where:
+            sql += f" WHERE {where}"
+        return sql + ";"
+
+    def limit(self, query, n):
+        """Restrict a SELECT to its first n rows"""
+        return f"{query.rstrip()} LIMIT {int(n)}"
+
+    def insertReturning(self, cursor, table, columns, params, key):
+        """Insert one row and return the generated value of column `key`"""
+        placeholders = ', '.join('?' for _ in columns)
+        cursor.execute(
+            f"INSERT INTO {table}({', '.join(columns)}) VALUES ({placeholders}) RETURNING {key}",
+            params,
+        )
+        return cursor.fetchone()[0]
+
+    def executemany(self, cursor, query, rows):
+        cursor.executemany(query, rows)
+
+    def begin(self, cursor):
+        """Start a write transaction, taking the write lock before the first read"""
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def identityInsert(self, cursor, table, enabled):
+        """SQLite always accepts explicit values in INTEGER PRIMARY KEY columns"""
+
+    def executeBatch(self, cursor, statements):
+        """Run [(sql, params), ...] in order; in-process calls cost no round trips"""
+        for query, params in statements:
+            cursor.execute(query, params)
+
+    def upsertIncrement(self, table, keys, counter):
+        """SQL that adds 1 to `counter` of the row matching `keys`, inserting it at 1 if missing"""
+        return f"""
+            INSERT INTO {table} ({', '.join(keys)}, {counter})
+            VALUES ({', '.join('?' for _ in keys)}, 1)
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {counter} = {counter} + 1
+        """
+
+    def upsertAdd(self, table, keys, counter):
+        """SQL that adds the last parameter to `counter` of the row matching `keys`, inserting it if missing"""
+        return f"""
+            INSERT INTO {table} ({', '.join(keys)}, {counter})
+            VALUES ({', '.join('?' for _ in keys)}, ?)
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {counter} = {counter} + excluded.{counter}
+        """
+
+    def isMissingTable(self, exc, table):
+        return f"no such table: {table}" in str(exc)
+
+    def addRowVersion(self, cursor, table, key):
+        """Add a version column stamped from the rowVersion counter by insert and update triggers"""
+        cursor.execute(self.createTable('rowVersion', "version INTEGER NOT NULL"))
+        cursor.execute("INSERT INTO rowVersion(version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM rowVersion)")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        # The stamping UPDATE does not fire its own trigger again (recursive_triggers is off)
+        for event in ('INSERT', 'UPDATE'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS TR_{table}_version_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE rowVersion SET version = version + 1;
+                    UPDATE {table} SET version = (SELECT version FROM rowVersion) WHERE {key} = NEW.{key};
+                END
+            """)
+
+    def versionOf(self, column):
+        """A version column as the integer clients hold as a token"""
+        return column
+
+    def touchOnChange(self, cursor, name, table, events, parent, key, column):
+        """
+        Triggers that restamp the version of the parent rows (matched on key) of every row
+        the events change in table, by assigning the parent's column to itself.
+        """
+        for event in events:
+            row = 'OLD' if event == 'DELETE' else 'NEW'
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE {parent} SET {column} = {column} WHERE {key} = {row}.{key};
+                END
+            """)
+
+
+# Store and read DATE columns the way pyodbc hands them back
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+BACKENDS = {
+    SQLServerBackend.name: SQLServerBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+
+def getBackend(name=None):
+    """Build the backend named by `name` or the DB_BACKEND environment variable"""
+    name = (name or os.getenv('DB_BACKEND', SQLServerBackend.name)).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND '{name}'. Use one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,300 @@
+"""
+Streaming backup and restore for DynaZOR.
+A backup is gzip-compressed NDJSON: a header line, then for every table a
+{"table", "columns"} line followed by one JSON array per row. Tables are read
+with fetchmany and restored with batched inserts, so neither direction holds a
+whole table in memory.
+
+    python -m DynaZOR.backup backup dynazor.ndjson.gz [--incremental]
+    python -m DynaZOR.backup restore dynazor.ndjson.gz
+"""
+
+import argparse
+import gzip
+import io
+import json
+import zlib
+from datetime import date, datetime
+from . import db
+
+FORMAT = 'dynazor-backup'
+FORMAT_VERSION = 1
+CHUNK_SIZE = 1000
+
+# (table, columns, identity column) in foreign key order
+TABLES = [
+    ('users', ('userID', 'name', 'username', 'email', 'password'), 'userID'),
+    ('slotTemplates', ('userID', 'startMinute', 'endMinute', 'slotMinutes', 'breaks'), None),
+    ('userSchedule', ('scheduleID', 'userID', 'scheduleDate'), 'scheduleID'),
+    ('timeslots', ('timeSlotID', 'scheduleID', 'hour', 'minute', 'available', 'bookedByUserID'), 'timeSlotID'),
+    ('priorityQueue', ('timeSlotID', 'userID', 'priorityNo'), None),
+    ('appointmentStats', ('ownerUserID', 'bookerUserID', 'hour', 'minute', 'bookingCount'), None),
+]
+
+# Schedule days an incremental backup carries: everything on or after the last
+# snapshot's day (bookings only touch current and future days) and every day created since
+_CHANGED_SCHEDULES = "SELECT scheduleID FROM userSchedule WHERE scheduleDate >= ? OR scheduleID > ?"
+INCREMENTAL_FILTERS = {
+    'userSchedule': "WHERE scheduleDate >= ? OR scheduleID > ?",
+    'timeslots': f"WHERE scheduleID IN ({_CHANGED_SCHEDULES})",
+    'priorityQueue': f"WHERE timeSlotID IN (SELECT timeSlotID FROM timeslots WHERE scheduleID IN ({_CHANGED_SCHEDULES}))",
+}
+# Tables an incremental backup carries whole and an incremental restore replaces
+REPLACED_TABLES = ('slotTemplates', 'appointmentStats')
+
+CONVERTERS = {
+    'scheduleDate': date.fromisoformat,
+}
+
+
+def _serialize(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def getLastSnapshot():
+    """(takenOn, maxScheduleID) of the latest completed backup, or None"""
+    with db.getCursor() as cursor:
+        cursor.execute(db.backend.limit(
+            "SELECT takenOn, maxScheduleID FROM backupSnapshots ORDER BY snapshotID DESC", 1))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+
+def _recordSnapshot(kind, takenOn, maxScheduleID, rowCount):
+    with db.getCursor() as cursor:
+        cursor.execute("""
+            INSERT INTO backupSnapshots(kind, takenOn, maxScheduleID, rowCount, createdAt)
+            VALUES (?, ?, ?, ?, ?)
+        """, (kind, takenOn, maxScheduleID, rowCount, datetime.utcnow()))
+        cursor.connection.commit()
+
+
+def iterBackupLines(incremental=False, chunkSize=CHUNK_SIZE):
+    """
+    Return a generator of NDJSON lines for a full or incremental backup.
+    Raises ValueError up front when an incremental backup has no snapshot to start from.
+    The snapshot is recorded once the last line has been produced.
+    """
+    since = getLastSnapshot() if incremental else None
+    if incremental and since is None:
+        raise ValueError("No previous backup to continue from; take a full backup first")
+
+    with db.getCursor() as cursor:
+        cursor.execute("SELECT MAX(scheduleID) FROM userSchedule")
+        maxScheduleID = cursor.fetchone()[0] or 0
+        cursor.execute("SELECT MAX(version) FROM schemaVersion")
+        schemaVersion = cursor.fetchone()[0]
+
+    kind = 'incremental' if incremental else 'full'
+    takenOn = date.today()
+    header = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'kind': kind,
+        'schemaVersion': schemaVersion,
+        'createdAt': datetime.utcnow().isoformat(),
+        'since': {'date': str(since[0]), 'scheduleID': since[1]} if since else None,
+    }
+
+    def lines():
+        yield json.dumps(header) + '\n'
+        counts = {}
+        for table, columns, _ in TABLES:
+            yield json.dumps({'table': table, 'columns': columns}) + '\n'
+            query = f"SELECT {', '.join(columns)} FROM {table}"
+            params = ()
+            if since and table in INCREMENTAL_FILTERS:
+                query += " " + INCREMENTAL_FILTERS[table]
+                params = (since[0], since[1])
+            counts[table] = 0
+            with db.getCursor() as cursor:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunkSize)
+                    if not rows:
+                        break
+                    counts[table] += len(rows)
+                    yield ''.join(json.dumps([_serialize(value) for value in row]) + '\n' for row in rows)
+        yield json.dumps({'end': True, 'rows': counts}) + '\n'
+        _recordSnapshot(kind, takenOn, maxScheduleID, sum(counts.values()))
+
+    return lines()
+
+
+def iterBackup(incremental=False, chunkSize=CHUNK_SIZE, level=6):
+    """iterBackupLines gzip-compressed on the fly, as bytes chunks"""
+    lines = iterBackupLines(incremental, chunkSize)
+
+    def chunks():
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        for line in lines:
+            data = compressor.compress(line.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    return chunks()
+
+
+def writeBackup(path, incremental=False, chunkSize=CHUNK_SIZE):
+    with open(path, 'wb') as out:
+        for data in iterBackup(incremental, chunkSize):
+            out.write(data)
+
+
+def _insertBatch(cursor, table, columns, identity, rows):
+    if identity:
+        db.backend.identityInsert(cursor, table, True)
+    db.backend.executemany(
+        cursor,
+        f"INSERT INTO {table}({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        rows,
+    )
+    if identity:
+        db.backend.identityInsert(cursor, table, False)
+
+
+def _upsertUsers(cursor, columns, rows):
+    """Incremental restores update users that still exist and insert the rest"""
+    cursor.execute(f"SELECT userID FROM users WHERE userID IN ({', '.join('?' for _ in rows)})",
+                   [row[0] for row in rows])
+    existing = {row[0] for row in cursor.fetchall()}
+    updates = [tuple(row[1:]) + (row[0],) for row in rows if row[0] in existing]
+    if updates:
+        db.backend.executemany(
+            cursor, f"UPDATE users SET {', '.join(f'{c} = ?' for c in columns[1:])} WHERE userID = ?", updates)
+    inserts = [row for row in rows if row[0] not in existing]
+    if inserts:
+        _insertBatch(cursor, 'users', columns, 'userID', inserts)
+
+
+def _replaceSchedules(cursor, rows):
+    """
+    Drop the days an incremental restore brings again, together with their slots and queues.
+    A day the target created on its own for the same user and date is replaced as well.
+    """
+    userIDs = sorted({row[1] for row in rows})
+    dates = sorted({row[2] for row in rows})
+    cursor.execute(f"""
+        SELECT scheduleID, userID, scheduleDate FROM userSchedule
+        WHERE userID IN ({', '.join('?' for _ in userIDs)}) AND scheduleDate IN ({', '.join('?' for _ in dates)})
+    """, userIDs + dates)
+    days = {(row[1], str(row[2])) for row in rows}
+    scheduleIDs = {row[0] for row in rows}
+    scheduleIDs.update(row[0] for row in cursor.fetchall() if (row[1], str(row[2])) in days)
+    scheduleIDs = list(scheduleIDs)
+    placeholders = ', '.join('?' for _ in scheduleIDs)
+    cursor.execute(f"""
+        DELETE FROM priorityQueue WHERE timeSlotID IN (
+            SELECT timeSlotID FROM timeslots WHERE scheduleID IN ({placeholders})
+        )
+    """, scheduleIDs)
+    cursor.execute(f"DELETE FROM timeslots WHERE scheduleID IN ({placeholders})", scheduleIDs)
+    cursor.execute(f"DELETE FROM userSchedule WHERE scheduleID IN ({placeholders})", scheduleIDs)
+
+
+def restore(lines, batchSize=CHUNK_SIZE):
+    """
+    Load a backup from an iterable of NDJSON lines in one transaction; returns {table: rows}.
+    A full backup replaces the data tables. An incremental one is applied on top of the
+    previous restore: users are upserted, the days it carries are replaced and
+    the REPLACED_TABLES are rewritten. Rows deleted at the source are not removed.
+    """
+    lines = iter(lines)
+    header = json.loads(next(lines))
+    if header.get('format') != FORMAT or header.get('version') != FORMAT_VERSION:
+        raise ValueError("Not a DynaZOR backup or unsupported backup version")
+    incremental = header['kind'] == 'incremental'
+    known = {table: (columns, identity) for table, columns, identity in TABLES}
+    counts = {}
+
+    with db.getCursor() as cursor:
+        db.backend.begin(cursor)
+        try:
+            if not incremental:
+                for table in db.ANALYTICS_TABLES + tuple(table for table, _, _ in reversed(TABLES)):
+                    cursor.execute(f"DELETE FROM {table}")
+
+            table = None
+            batch = []
+
+            def flush():
+                if not batch:
+                    return
+                columns, identity = known[table]
+                if incremental and table == 'users':
+                    _upsertUsers(cursor, columns, batch)
+                else:
+                    if incremental and table == 'userSchedule':
+                        _replaceSchedules(cursor, batch)
+                    _insertBatch(cursor, table, columns, identity, batch)
+                counts[table] = counts.get(table, 0) + len(batch)
+                batch.clear()
+
+            for line in lines:
+                record = json.loads(line)
+                if isinstance(record, list):
+                    if table is None:
+                        raise ValueError("Backup row before any table header")
+                    batch.append(tuple(
+                        convert(value) if convert and value is not None else value
+                        for convert, value in zip(converters, record)
+                    ))
+                    if len(batch) >= batchSize:
+                        flush()
+                    continue
+                flush()
+                if record.get('end'):
+                    break
+                table = record['table']
+                if table not in known or tuple(record['columns']) != known[table][0]:
+                    raise ValueError(f"Unexpected table or columns in backup: {table}")
+                converters = [CONVERTERS.get(column) for column in record['columns']]
+                counts[table] = 0
+                if incremental and table in REPLACED_TABLES:
+                    cursor.execute(f"DELETE FROM {table}")
+            else:
+                raise ValueError("Backup is truncated")
+
+            # The analytics rollups are derived from appointmentStats, so they are not in the backup
+            db._rebuildAnalytics(cursor)
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    db.clearScheduleCaches()
+    db._slotKeys.clear()
+    return counts
+
+
+def restoreFile(fileobj, batchSize=CHUNK_SIZE):
+    """Restore from a binary file object holding a gzip-compressed backup"""
+    with io.TextIOWrapper(gzip.GzipFile(fileobj=fileobj), encoding='utf-8') as lines:
+        return restore(lines, batchSize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the DynaZOR database")
+    parser.add_argument('action', choices=['backup', 'restore'])
+    parser.add_argument('path')
+    parser.add_argument('--incremental', action='store_true', help='only what changed since the last backup')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db.migrate()
+    if args.action == 'backup':
+        writeBackup(args.path, args.incremental, args.chunk_size)
+        print(f"Backup written to {args.path}")
+    else:
+        with open(args.path, 'rb') as backup:
+            counts = restoreFile(backup, args.chunk_size)
+        print(f"Restored {counts}")
+
+
+if __name__ == '__main__':
+    main()
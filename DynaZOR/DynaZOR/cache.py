@@ -0,0 +1,159 @@
+"""
+Caches for rendered DynaZOR payloads.
+TTLCache lives in the worker process; RedisCache shares entries between workers.
+Read-through loads take a loadToken() before reading the database and store the
+result with setIfCurrent(), which drops it when the key was deleted meanwhile, so
+a load that raced a write cannot cache the pre-write result.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds (None = never)"""
+
+    def __init__(self, maxSize=10000, ttl=30):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expiresAt, value), least recently used first
+        self._loading = {}  # key -> token of the load in flight; delete() drops it
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expiresAt, value = entry
+                if expiresAt is None or expiresAt > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        expiresAt = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (expiresAt, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxSize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def loadToken(self, key):
+        token = object()
+        with self._lock:
+            self._loading[key] = token
+        return token
+
+    def setIfCurrent(self, key, token, value):
+        """Store value unless key was deleted since loadToken(); None only ends the load, as a failed load must"""
+        with self._lock:
+            if self._loading.get(key) is not token:
+                return
+            del self._loading[key]
+            if value is not None:
+                self._store(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._loading.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class RedisCache:
+    """Cache shared by all workers through Redis; values must be JSON-serializable"""
+
+    # Stores ARGV[3] at KEYS[1] only while the epoch (KEYS[3]) and the key's generation (KEYS[2])
+    # still match the load token in ARGV[1], ARGV[2]
+    _SET_IF_CURRENT = """
+        if (redis.call('GET', KEYS[3]) or '0') == ARGV[1] and (redis.call('GET', KEYS[2]) or '0') == ARGV[2] then
+            redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[4])
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, url, prefix, ttl=30):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        # Bumped by clear(); outside the prefix:* pattern clear() deletes
+        self._epoch = f"{prefix}-epoch"
+        self._setIfCurrent = self._redis.register_script(self._SET_IF_CURRENT)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        return ':'.join([self.prefix] + [str(part) for part in parts])
+
+    def _generation(self, key):
+        return ':'.join([self.prefix, '#generation', self._key(key)])
+
+    def get(self, key, default=None):
+        raw = self._redis.get(self._key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self._redis.set(self._key(key), json.dumps(value), ex=self.ttl)
+
+    def loadToken(self, key):
+        epoch, generation = self._redis.mget(self._epoch, self._generation(key))
+        return (epoch or b'0').decode(), (generation or b'0').decode()
+
+    def setIfCurrent(self, key, token, value):
+        """Store value unless key was deleted, in any worker, since loadToken(); None only ends the load"""
+        if value is not None:
+            self._setIfCurrent(keys=[self._key(key), self._generation(key), self._epoch],
+                               args=[token[0], token[1], json.dumps(value), self.ttl])
+
+    def delete(self, key):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key(key))
+        # Outlives any load that could still be in flight
+        pipe.incr(self._generation(key))
+        pipe.expire(self._generation(key), max(self.ttl, 60))
+        pipe.execute()
+
+    def clear(self):
+        self._redis.incr(self._epoch)
+        for name in self._redis.scan_iter(match=f"{self.prefix}:*"):
+            self._redis.delete(name)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+def makeCache(prefix, maxSize=10000, ttl=30, redisUrl=None):
+    """Build a shared RedisCache when redisUrl is set, otherwise an in-process TTLCache"""
+    if redisUrl:
+        return RedisCache(redisUrl, prefix, ttl=ttl)
+    return TTLCache(maxSize=maxSize, ttl=ttl)
@@ -0,0 +1,137 @@
+"""
+Schedule change notifications for DynaZOR's live schedule streams.
+Write paths publish the (userID, 'YYYY-MM-DD') days they changed once their
+transaction has committed (see db.invalidateSchedule); subscribers are woken
+and re-read the day themselves, so bursts of writes coalesce into one read.
+LocalBroker fans out within the worker process; RedisBroker relays through
+Redis pub/sub so subscribers in every worker hear about every write.
+"""
+
+import json
+import threading
+import time
+
+
+class Subscription:
+    """A subscriber's wake-up flag; set by every publish for its day until it is read"""
+
+    def __init__(self, broker, key):
+        self.broker = broker
+        self.key = key
+        self._changed = threading.Event()
+
+    def notify(self):
+        self._changed.set()
+
+    def wait(self, timeout):
+        """Block until the day changes or timeout passes; True when it changed"""
+        changed = self._changed.wait(timeout)
+        # A publish landing after a timeout stays set for the next wait
+        if changed:
+            self._changed.clear()
+        return changed
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Fan-out to the subscribers of this process"""
+
+    def __init__(self):
+        self._subscribers = {}  # (userID, 'YYYY-MM-DD') -> set of Subscription
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, userID, scheduleDate):
+        subscription = Subscription(self, (userID, str(scheduleDate)))
+        with self._lock:
+            self._subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, userID, scheduleDate):
+        self._deliver((userID, str(scheduleDate)))
+
+    def publishAll(self):
+        """Wake every subscriber, after a write that touched many days"""
+        self._deliver(None)
+
+    def _deliver(self, key):
+        with self._lock:
+            self.published += 1
+            if key is None:
+                targets = [s for subscribers in self._subscribers.values() for s in subscribers]
+            else:
+                targets = list(self._subscribers.get(key, ()))
+        for subscription in targets:
+            subscription.notify()
+
+    def stats(self):
+        with self._lock:
+            return {'days': len(self._subscribers),
+                    'subscribers': sum(len(s) for s in self._subscribers.values()),
+                    'published': self.published}
+
+
+class RedisBroker(LocalBroker):
+    """Publishes through a Redis channel; one listener thread per process delivers locally"""
+
+    def __init__(self, url, channel='dynazor:schedule-changes'):
+        import redis
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+        self._listenerLock = threading.Lock()
+
+    def subscribe(self, userID, scheduleDate):
+        self._startListener()
+        return super().subscribe(userID, scheduleDate)
+
+    def publish(self, userID, scheduleDate):
+        self._send([userID, str(scheduleDate)])
+
+    def publishAll(self):
+        self._send(None)
+
+    def _send(self, key):
+        # The write has committed already; a lost notification only delays live viewers
+        try:
+            self._redis.publish(self.channel, json.dumps(key))
+        except Exception as e:
+            print(f"Error publishing schedule change: {e}")
+
+    def _startListener(self):
+        with self._listenerLock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='changefeed-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    key = json.loads(message['data'])
+                    self._deliver(tuple(key) if key is not None else None)
+            except Exception as e:
+                print(f"Change feed lost its Redis subscription: {e}")
+                time.sleep(1)
+                # Changes published while disconnected were missed, so everyone re-reads
+                self._deliver(None)
+
+
+def makeBroker(redisUrl=None):
+    """A RedisBroker when redisUrl is set, otherwise an in-process LocalBroker"""
+    if redisUrl:
+        return RedisBroker(redisUrl)
+    return LocalBroker()
@@ -1,566 +1,1627 @@
 # db.py
 import re
 import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from dotenv import load_dotenv
-import pyodbc
 import os
-from datetime import date
+from datetime import date, datetime, timedelta
+from . import metrics, migrations, passwords
+from .backends import getBackend
+from .cache import TTLCache, makeCache
+from .changefeed import makeBroker
+from .pool import ConnectionPool
+from .slotindex import SlotIndex
 
 load_dotenv()
-conn = pyodbc.connect(
-        f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-        f"SERVER={os.getenv('SQLSERVER_HOST')};"
-        f"DATABASE={os.getenv('SQLSERVER_DB')};"
-        f"UID={os.getenv('SQLSERVER_USER')};"
-        f"PWD={os.getenv('SQLSERVER_PASS')}",
+
+# DB_BACKEND selects SQL Server (default) or the in-process SQLite engine
+backend = getBackend()
+
+pool = ConnectionPool(
+    backend.connect,
+    minSize=int(os.getenv('DB_POOL_MIN', 1)),
+    maxSize=int(os.getenv('DB_POOL_MAX', 10)),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    pingQuery=backend.pingQuery,
+)
+_local = threading.local()
+
+# Rendered getSchedule payloads keyed by (userID, 'YYYY-MM-DD'); every write path below invalidates
+scheduleCache = makeCache(
+    'schedule',
+    maxSize=int(os.getenv('SCHEDULE_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('SCHEDULE_CACHE_TTL', 30)),
+    redisUrl=os.getenv('SCHEDULE_CACHE_REDIS_URL'),
+)
+# Free/busy bitmaps keyed by (userID, 'YYYY-MM-DD'); invalidated together with scheduleCache
+freeBusyCache = makeCache(
+    'freebusy',
+    maxSize=int(os.getenv('FREEBUSY_CACHE_SIZE', 100000)),
+    ttl=float(os.getenv('FREEBUSY_CACHE_TTL', 30)),
+    redisUrl=os.getenv('SCHEDULE_CACHE_REDIS_URL'),
 )
-cursor = conn.cursor()
+# Optional packed index of today's and the next few days, answering the per-slot lookups without SQL
+SLOT_INDEX_ENABLED = os.getenv('SLOT_INDEX_ENABLED', '0').lower() in ('1', 'true', 'yes')
+SLOT_INDEX_DAYS = int(os.getenv('SLOT_INDEX_DAYS', 2))
+# Wakes the live schedule streams of every day the hooks below invalidate
+changes = makeBroker(os.getenv('CHANGEFEED_REDIS_URL'))
+# timeSlotID -> (owner userID, 'YYYY-MM-DD'); a timeslot never moves, so entries never go stale
+_slotKeys = TTLCache(maxSize=200000, ttl=None)
+
+
+def _loadSlotDay(userID, scheduleDate):
+    """Rows of one schedule day for slotIndex, in slot order"""
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT ts.timeSlotID, ts.hour, ts.minute, ts.available, ts.bookedByUserID,
+            (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeSlotID = ts.timeSlotID),
+            u.username
+            FROM userSchedule us
+            JOIN timeslots ts ON ts.scheduleID = us.scheduleID
+            LEFT JOIN users u ON ts.bookedByUserID = u.userID
+            WHERE us.userID = ? AND us.scheduleDate = ?
+            ORDER BY ts.hour, ts.minute
+        """, (userID, scheduleDate))
+        rows = cursor.fetchall()
+    for row in rows:
+        _slotKeys.set(row[0], (userID, scheduleDate))
+    return rows
+
+
+slotIndex = SlotIndex(
+    _loadSlotDay,
+    maxDays=int(os.getenv('SLOT_INDEX_SIZE', 50000)),
+    ttl=float(os.getenv('SLOT_INDEX_TTL', 30)),
+) if SLOT_INDEX_ENABLED else None
+
+
+def _indexedDay(userID, scheduleDate):
+    """The SlotDay of a hot day when the slot index is on, otherwise None (read through SQL)"""
+    if slotIndex is None:
+        return None
+    scheduleDate = str(scheduleDate)
+    today = date.today()
+    if not str(today) <= scheduleDate < str(today + timedelta(days=SLOT_INDEX_DAYS)):
+        return None
+    return slotIndex.day(userID, scheduleDate)
+
+
+def openRequestScope():
+    """Mark the current thread as serving a request; its first DB call checks out a connection"""
+    _local.scoped = True
+
+
+def closeRequestScope():
+    """Return the request's connection (if one was checked out) to the pool"""
+    _local.scoped = False
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        pool.release(conn)
+
+
+@contextmanager
+def getConnection():
+    """
+    Yield the connection bound to the current thread, checking one out if needed.
+    Inside a request scope the connection stays bound until closeRequestScope();
+    otherwise it is returned to the pool when the outermost block exits.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+
+    conn = pool.acquire()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        if not getattr(_local, 'scoped', False):
+            _local.conn = None
+            pool.release(conn)
+
+
+@contextmanager
+def getCursor():
+    with getConnection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield metrics.wrapCursor(cursor)
+        finally:
+            cursor.close()
+
+
+def _slotKey(timeslotID):
+    """Return (owner userID, 'YYYY-MM-DD') of a timeslot"""
+    key = _slotKeys.get(timeslotID)
+    if key is None:
+        with getCursor() as cursor:
+            cursor.execute("""
+                SELECT us.userID, us.scheduleDate
+                FROM timeslots ts
+                JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+                WHERE ts.timeSlotID = ?
+            """, (timeslotID,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        key = (row[0], str(row[1]))
+        _slotKeys.set(timeslotID, key)
+    return key
+
+
+def invalidateSchedule(userID, scheduleDate):
+    """Drop the cached schedule of one user's day after it was written and wake its live viewers"""
+    scheduleCache.delete((userID, str(scheduleDate)))
+    scheduleCache.delete((userID, str(scheduleDate), 'version'))
+    freeBusyCache.delete((userID, str(scheduleDate)))
+    if slotIndex is not None:
+        slotIndex.invalidate(userID, scheduleDate)
+    changes.publish(userID, scheduleDate)
+
+
+def invalidateSlot(timeslotID):
+    """Drop the cached schedule of the day a timeslot belongs to"""
+    key = _slotKey(timeslotID)
+    if key:
+        scheduleCache.delete(key)
+        scheduleCache.delete(key + ('version',))
+        freeBusyCache.delete(key)
+        if slotIndex is not None:
+            slotIndex.invalidate(*key)
+        changes.publish(*key)
+
+
+def clearScheduleCaches():
+    """Drop every cached schedule, free/busy bitmap and indexed day after a write that touches many users"""
+    scheduleCache.clear()
+    freeBusyCache.clear()
+    if slotIndex is not None:
+        slotIndex.clear()
+    changes.publishAll()
+
+
+def migrate(target=None):
+    """Bring the schema up to date (see migrations.MIGRATIONS); safe to call on every start"""
+    with getCursor() as cursor:
+        return migrations.apply(cursor, backend, target=target)
 
 
 def createTables():
-    cursor.execute("IF OBJECT_ID('priorityQueue','U') IS NOT NULL DROP TABLE priorityQueue;")
-    cursor.execute("IF OBJECT_ID('timeslots','U') IS NOT NULL DROP TABLE timeslots;")
-    cursor.execute("IF OBJECT_ID('userSchedule','U') IS NOT NULL DROP TABLE userSchedule;")
-    cursor.execute("IF OBJECT_ID('appointmentStats','U') IS NOT NULL DROP TABLE appointmentStats;")
-    cursor.execute("IF OBJECT_ID('users','U') IS NOT NULL DROP TABLE users;")
-    cursor.execute("IF OBJECT_ID('admin','U') IS NOT NULL DROP TABLE admin;")
-
-    cursor.execute("""
-    CREATE TABLE admin (
-        adminID INT IDENTITY(1,1) PRIMARY KEY,
-        username NVARCHAR(255) UNIQUE,
-        password NVARCHAR(255)
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE users (
-        userID INT IDENTITY(1,1) PRIMARY KEY,
-        name NVARCHAR(255),
-        username NVARCHAR(255) UNIQUE,
-        email NVARCHAR(255) UNIQUE,
-        password NVARCHAR(255)
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE userSchedule (
-        scheduleID INTEGER IDENTITY(1,1) PRIMARY KEY,
-        userID INT FOREIGN KEY REFERENCES users(userID),
-        scheduleDate DATE
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE timeslots (
-        timeSlotID INT IDENTITY(1,1) PRIMARY KEY,
-        scheduleID INT NOT NULL FOREIGN KEY REFERENCES userSchedule(scheduleID),
-        hour INT CHECK (hour BETWEEN 0 AND 23),   
-        minute INT CHECK (minute BETWEEN 0 AND 59), 
-        available BIT DEFAULT 1,
-        bookedByUserID INT FOREIGN KEY REFERENCES users(userID)
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE priorityQueue (
-        timeSlotID INT NOT NULL,
-        userID INT NOT NULL,
-        priorityNo INT NOT NULL, 
-        PRIMARY KEY (timeSlotID, userID),
-        FOREIGN KEY (timeSlotID) REFERENCES timeslots(timeSlotID),
-        FOREIGN KEY (userID) REFERENCES users(userID)
-    );
-    """)
-
-    cursor.execute("""
-    CREATE TABLE appointmentStats (
-        ownerUserID INT,       
-        bookerUserID INT,      
-        hour INT,              
-        minute INT,
-        bookingCount INT DEFAULT 0,
-        PRIMARY KEY (ownerUserID, bookerUserID, hour, minute),
-        FOREIGN KEY (ownerUserID) REFERENCES users(userID),
-        FOREIGN KEY (bookerUserID) REFERENCES users(userID)
-    );
-    """)
-    
-    # Create default admin user
-    cursor.execute("INSERT INTO admin(username, password) VALUES(?, ?)", ('admin', 'admin123'))
-    conn.commit()
+    """Drop every table and rebuild the schema from scratch"""
+    with getCursor() as cursor:
+        for table in ('aggregationWatermarks', 'bookingEventBuckets', 'bookingEvents', 'ownerBookerStats', 'ownerSlotStats', 'ownerStats', 'backupSnapshots', 'notificationOutbox', 'priorityQueue', 'timeslots', 'userSchedule', 'appointmentStats', 'slotTemplates', 'users', 'admin', 'rowVersion', 'schemaVersion'):
+            cursor.execute(backend.dropTable(table))
+        cursor.connection.commit()
+        migrate()
+        clearScheduleCaches()
+        _slotKeys.clear()
 
 
 def getUserID(username):
-    cursor.execute("SELECT userID FROM users WHERE username=?", (username,))
-    row = cursor.fetchone()
-    return row[0] if row else None
+    with getCursor() as cursor:
+        cursor.execute("SELECT userID FROM users WHERE username=?", (username,))
+        row = cursor.fetchone()
+        return row[0] if row else None
 
 
 def getAllUsers():
-    cursor.execute("SELECT userID FROM users")
-    rows = cursor.fetchall()
-    return [row[0] for row in rows]
+    with getCursor() as cursor:
+        cursor.execute("SELECT userID FROM users")
+        rows = cursor.fetchall()
+        return [row[0] for row in rows]
+
+
+def _rehash(table, idColumn, rowID, stored, password):
+    """Upgrade a plaintext or outdated hash after a successful login; a concurrent change wins"""
+    hashed = passwords.hasher.hash(password)
+    with getCursor() as cursor:
+        cursor.execute(f"UPDATE {table} SET password = ? WHERE {idColumn} = ? AND password = ?",
+                       (hashed, rowID, stored))
+        cursor.connection.commit()
 
 
 def checkUserLogin(email,password):
-    cursor.execute("SELECT * FROM users WHERE email=? AND password=?", (email, password))
-    row = cursor.fetchone()
+    """users row for valid credentials, else None; raises passwords.HasherBusy when overloaded"""
+    with getCursor() as cursor:
+        cursor.execute("SELECT * FROM users WHERE email=?", (email,))
+        row = cursor.fetchone()
+    # users row: userID, name, username, email, password
+    if row is None or not passwords.hasher.verify(password, row[4]):
+        return None
+    if passwords.needsRehash(row[4]):
+        _rehash('users', 'userID', row[0], row[4], password)
     return row
 
 def checkUserExist(username,email):
-    cursor.execute("SELECT * FROM users WHERE username=? OR email=?", (username, email))
-    row = cursor.fetchone()
-    return row
+    with getCursor() as cursor:
+        cursor.execute("SELECT * FROM users WHERE username=? OR email=?", (username, email))
+        row = cursor.fetchone()
+        return row
 
 
 def createUser(name,username,email,password):
-    cursor.execute("INSERT INTO users(name,username,email,password) VALUES(?,?,?,?)", (name,username,email,password))
-    conn.commit()
+    hashed = passwords.hasher.hash(password)
+    with getCursor() as cursor:
+        cursor.execute("INSERT INTO users(name,username,email,password) VALUES(?,?,?,?)", (name,username,email,hashed))
+        cursor.connection.commit()
+
+
+# Days of users without a slot template start with these (hour, minute) slots, all available
+DEFAULT_TIMESLOTS = [
+    (8, 0), (8, 45), (9, 30), (10, 15), (11, 0), (11, 45),
+    (12, 30), (13, 15), (14, 0), (14, 45), (15, 30), (16, 15),
+    (17, 0), (17, 45)
+]
+# Bounds on a slot template: slot length in minutes and slots per day
+TEMPLATE_SLOT_MINUTES = (5, 240)
+MAX_TEMPLATE_SLOTS = 96
+
+
+def templateSlots(startMinute, endMinute, slotMinutes, breaks=()):
+    """
+    (hour, minute) starts of a template's slots: back to back from startMinute, each one
+    ending by endMinute. A slot that would overlap a (start, end) break starts after it.
+    """
+    slots = []
+    start = startMinute
+    while start + slotMinutes <= endMinute:
+        clash = next((b for b in breaks if start < b[1] and b[0] < start + slotMinutes), None)
+        if clash:
+            start = clash[1]
+            continue
+        slots.append(divmod(start, 60))
+        start += slotMinutes
+    return slots
+
+
+def _formatBreaks(breaks):
+    return ','.join(f"{start}-{end}" for start, end in breaks)
+
+
+def _parseBreaks(text):
+    return [tuple(int(minute) for minute in part.split('-')) for part in text.split(',') if part]
+
+
+def _timeslotTemplate(slots=DEFAULT_TIMESLOTS):
+    """Slots (default DEFAULT_TIMESLOTS) as a derived table (hour, minute) usable in INSERT ... SELECT"""
+    return " UNION ALL ".join(f"SELECT {hour} AS hour, {minute} AS minute" for hour, minute in slots)
+
+
+def getSlotTemplate(userID):
+    """The user's template {'startMinute', 'endMinute', 'slotMinutes', 'breaks': [(start, end)]}, or None for the default"""
+    with getCursor() as cursor:
+        cursor.execute("SELECT startMinute, endMinute, slotMinutes, breaks FROM slotTemplates WHERE userID = ?", (userID,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {'startMinute': row[0], 'endMinute': row[1], 'slotMinutes': row[2], 'breaks': _parseBreaks(row[3])}
+
+
+def _templateSlotsOf(cursor, userID):
+    cursor.execute("SELECT startMinute, endMinute, slotMinutes, breaks FROM slotTemplates WHERE userID = ?", (userID,))
+    row = cursor.fetchone()
+    return templateSlots(row[0], row[1], row[2], _parseBreaks(row[3])) if row else DEFAULT_TIMESLOTS
+
+
+def setSlotTemplate(userID, template=None):
+    """
+    Store the user's slot template, or go back to DEFAULT_TIMESLOTS when template is None.
+    Days created from now on use it, and so do existing days from today on that were never
+    touched (no bookings, queues or closed slots); those are rebuilt in bulk.
+    Raises ValueError for a template yielding no slots or more than MAX_TEMPLATE_SLOTS.
+    Returns the dates that were rebuilt.
+    """
+    if template is None:
+        slots = DEFAULT_TIMESLOTS
+    else:
+        low, high = TEMPLATE_SLOT_MINUTES
+        if not low <= template['slotMinutes'] <= high:
+            raise ValueError(f"Slot length must be between {low} and {high} minutes")
+        if not 0 <= template['startMinute'] < template['endMinute'] <= 24 * 60:
+            raise ValueError("Working hours must start before they end, within one day")
+        breaks = sorted(template['breaks'])
+        slots = templateSlots(template['startMinute'], template['endMinute'], template['slotMinutes'], breaks)
+        if not 1 <= len(slots) <= MAX_TEMPLATE_SLOTS:
+            raise ValueError(f"A day must have between 1 and {MAX_TEMPLATE_SLOTS} slots")
+
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            cursor.execute("DELETE FROM slotTemplates WHERE userID = ?", (userID,))
+            if template is not None:
+                cursor.execute("""
+                    INSERT INTO slotTemplates(userID, startMinute, endMinute, slotMinutes, breaks)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (userID, template['startMinute'], template['endMinute'], template['slotMinutes'], _formatBreaks(breaks)))
+
+            # Locks the slots like bookSlots does, so no booking lands on a day being rebuilt
+            cursor.execute(f"""
+                SELECT us.scheduleID, us.scheduleDate,
+                    CASE WHEN ts.available = 0 OR ts.bookedByUserID IS NOT NULL
+                         OR EXISTS (SELECT 1 FROM priorityQueue pq WHERE pq.timeSlotID = ts.timeSlotID) THEN 1 ELSE 0 END
+                FROM timeslots ts {backend.updateLock}
+                JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+                WHERE us.userID = ? AND us.scheduleDate >= ?
+            """, (userID, date.today()))
+            touched = {}
+            for scheduleID, scheduleDate, used in cursor.fetchall():
+                touched[(scheduleID, scheduleDate)] = touched.get((scheduleID, scheduleDate), 0) or used
+            days = [day for day, used in touched.items() if not used]
+            if days:
+                placeholders = ', '.join('?' for _ in days)
+                scheduleIDs = [scheduleID for scheduleID, _ in days]
+                cursor.execute(f"DELETE FROM timeslots WHERE scheduleID IN ({placeholders})", scheduleIDs)
+                cursor.execute(f"""
+                    INSERT INTO timeslots(scheduleID, hour, minute, available)
+                    SELECT us.scheduleID, t.hour, t.minute, 1
+                    FROM userSchedule us
+                    CROSS JOIN ({_timeslotTemplate(slots)}) t
+                    WHERE us.scheduleID IN ({placeholders})
+                """, scheduleIDs)
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    for _, scheduleDate in days:
+        invalidateSchedule(userID, scheduleDate)
+    return sorted(str(scheduleDate) for _, scheduleDate in days)
 
 
 def createSchedule(userID, scheduleDate):
-    cursor.execute("""
-        INSERT INTO userSchedule(userID, scheduleDate)
-        OUTPUT INSERTED.scheduleID
-        VALUES (?, ?)
-    """, (userID, scheduleDate))
-    
-    scheduleID = cursor.fetchone()[0]
-    
-    timeslots = [
-        (8, 0), (8, 45), (9, 30), (10, 15), (11, 0), (11, 45),
-        (12, 30), (13, 15), (14, 0), (14, 45), (15, 30), (16, 15),
-        (17, 0), (17, 45)
-    ]
-    
-    # Make all timeslots available on default
-    for hour, minute in timeslots:
+    """Create the user's day with its timeslots and return its scheduleID; an existing day is returned as is"""
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            # Locked so two concurrent first reads of a day cannot both insert it (UX_userSchedule_user_date)
+            cursor.execute(f"SELECT scheduleID FROM userSchedule {backend.updateLock} WHERE userID = ? AND scheduleDate = ?",
+                           (userID, scheduleDate))
+            row = cursor.fetchone()
+            if row:
+                cursor.connection.rollback()
+                return row[0]
+            slots = _templateSlotsOf(cursor, userID)
+            scheduleID = backend.insertReturning(cursor, 'userSchedule', ('userID', 'scheduleDate'), (userID, scheduleDate), 'scheduleID')
+
+            # Make all timeslots available on default
+            cursor.execute(f"""
+                INSERT INTO timeslots(scheduleID, hour, minute, available)
+                SELECT ?, t.hour, t.minute, 1
+                FROM ({_timeslotTemplate(slots)}) t
+            """, (scheduleID,))
+
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+        return scheduleID
+
+
+def createSchedulesForDate(scheduleDate, chunkSize=500, progress=None):
+    """
+    Create the schedule day and its timeslots (see setSlotTemplate) for every user that lacks one.
+    Users are handled in chunks of chunkSize, each chunk in one transaction, and
+    progress(done, total) is called after every chunk. Safe to re-run: users who
+    already have the day are skipped. Returns how many users were missing the day.
+    """
+    with getCursor() as cursor:
         cursor.execute("""
-            INSERT INTO timeslots(scheduleID, hour, minute, available)
-            VALUES (?, ?, ?, 1)
-        """, (scheduleID, hour, minute))
-    
-    conn.commit()
-    return scheduleID
-
-def getSchedule(userID):
-    cursor.execute("""
-        SELECT scheduleID, scheduleDate FROM userSchedule
-        WHERE userID=?
-        ORDER BY scheduleDate DESC
-    """, (userID,))
-    row = cursor.fetchone()
-    
-    if not row:
-        return [] 
-    
-    scheduleID, scheduleDate = row
-    
-    cursor.execute("""
-        SELECT ts.hour, ts.minute, ts.available, ts.bookedByUserID, 
-        (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeslotID = ts.timeslotID),
-        u.username
-        FROM timeslots ts
-        LEFT JOIN users u ON ts.bookedByUserID = u.userID
-        WHERE scheduleID=? ORDER BY hour, minute
-    """, (scheduleID,))
-    timeSlots = cursor.fetchall()
-    
-    return [{
-        'date': str(scheduleDate),
-        'timeslots': [
-            {'hour': ts[0], 'minute': ts[1], 'available': int(ts[2]), 'bookedByUserID': ts[3], 'waitlist_count': ts[4], 'bookerUsername': ts[5]}
-            for ts in timeSlots
-        ]
-    }]
+            SELECT u.userID FROM users u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM userSchedule us
+                WHERE us.userID = u.userID AND us.scheduleDate = ?
+            )
+            ORDER BY u.userID
+        """, (scheduleDate,))
+        missing = [row[0] for row in cursor.fetchall()]
 
-def toggleSlotDB(userID, date, hour, minute):
-    cursor.execute("""
-        UPDATE timeslots
-        SET available = CASE WHEN available = 1 THEN 0 ELSE 1 END
-        WHERE hour = ?
-          AND minute = ?
-          AND scheduleID = (
-                SELECT scheduleID
-                FROM userSchedule
-                WHERE userID = ?
-                  AND scheduledate = ?
-          )
-    """, (hour, minute, userID, date))
-
-    conn.commit()
-    return cursor.rowcount
+        for start in range(0, len(missing), chunkSize):
+            chunk = missing[start:start + chunkSize]
 
+            # The guard keeps a concurrent or retried run from adding a second day
+            backend.executemany(cursor, """
+                INSERT INTO userSchedule(userID, scheduleDate)
+                SELECT ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM userSchedule WHERE userID = ? AND scheduleDate = ?
+                )
+            """, [(userID, scheduleDate, userID, scheduleDate) for userID in chunk])
 
-def getWaitList(timeslot_id):
-    cursor.execute("""
-        SELECT 
-            pq.priorityNo,
-            u.userID,
-            u.name,
-            u.email
-        FROM priorityQueue pq
-        JOIN users u ON pq.userID = u.userID
-        WHERE pq.timeSlotID = ?
-        ORDER BY pq.priorityNo ASC
-    """, (timeslot_id,))
-
-    results = []
-    for row in cursor.fetchall():
-        results.append({
-            "priority": row[0],
-            "user_id": row[1],
-            "name": row[2],
-            "email": row[3]
-        })
-    return results
+            # One INSERT ... SELECT for the users on the default slots and one per distinct template
+            cursor.execute(f"""
+                INSERT INTO timeslots(scheduleID, hour, minute, available)
+                SELECT us.scheduleID, t.hour, t.minute, 1
+                FROM userSchedule us
+                CROSS JOIN ({_timeslotTemplate()}) t
+                WHERE us.scheduleDate = ?
+                  AND us.userID BETWEEN ? AND ?
+                  AND NOT EXISTS (SELECT 1 FROM timeslots ts WHERE ts.scheduleID = us.scheduleID)
+                  AND NOT EXISTS (SELECT 1 FROM slotTemplates st WHERE st.userID = us.userID)
+            """, (scheduleDate, chunk[0], chunk[-1]))
+            cursor.execute("""
+                SELECT DISTINCT startMinute, endMinute, slotMinutes, breaks FROM slotTemplates
+                WHERE userID BETWEEN ? AND ?
+            """, (chunk[0], chunk[-1]))
+            for template in cursor.fetchall():
+                cursor.execute(f"""
+                    INSERT INTO timeslots(scheduleID, hour, minute, available)
+                    SELECT us.scheduleID, t.hour, t.minute, 1
+                    FROM userSchedule us
+                    JOIN slotTemplates st ON st.userID = us.userID
+                    CROSS JOIN ({_timeslotTemplate(templateSlots(*template[:3], _parseBreaks(template[3])))}) t
+                    WHERE us.scheduleDate = ?
+                      AND us.userID BETWEEN ? AND ?
+                      AND st.startMinute = ? AND st.endMinute = ? AND st.slotMinutes = ? AND st.breaks = ?
+                      AND NOT EXISTS (SELECT 1 FROM timeslots ts WHERE ts.scheduleID = us.scheduleID)
+                """, (scheduleDate, chunk[0], chunk[-1], *template))
 
-def addWaitList(timeslot_id, user_id):
-    cursor.execute("""
-        SELECT MAX(priorityNo) FROM priorityQueue WHERE timeSlotID = ?
-    """, (timeslot_id,))
-    row = cursor.fetchone()
-    current_max = row[0] if row[0] is not None else 0
-    new_priority = current_max + 1
+            cursor.connection.commit()
+            if progress:
+                progress(start + len(chunk), len(missing))
 
-    cursor.execute("""
-        INSERT INTO priorityQueue (timeSlotID, userID, priorityNo)
-        VALUES (?, ?, ?)
-    """, (timeslot_id, user_id, new_priority))
-    conn.commit()
-
-def freeSlotDB(timeSlotID):
-    cursor.execute("""
-        SELECT ts.hour, ts.minute, ts.bookedByUserID, us.scheduleDate
-        FROM timeslots ts
-        JOIN userSchedule us ON us.scheduleID = ts.scheduleID
-        WHERE timeSlotID = ?
-    """, (timeSlotID,))
+        return len(missing)
 
-    row = cursor.fetchone()
-    hour = row[0]
-    minute = row[1]
-    bookerID = row[2]
-    date = row[3]
-
-    cursor.execute("""
-        UPDATE timeslots
-        SET bookedByUserID = NULL
-        WHERE timeSlotID IN (
-            SELECT ts.timeSlotID
-            FROM timeslots ts
-            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-            WHERE us.scheduleDate = ?
-            AND us.userID = ?
-            AND ts.hour = ?
-            AND ts.minute = ?
+def createScheduleHorizon(startDate, days, chunkSize=500, progress=None):
+    """
+    Pre-generate schedule days startDate .. startDate + days - 1 for every user.
+    progress(scheduleDate, done, total) is called after every chunk.
+    Returns the total number of days created.
+    """
+    created = 0
+    for offset in range(days):
+        scheduleDate = startDate + timedelta(days=offset)
+        report = (lambda done, total, d=scheduleDate: progress(d, done, total)) if progress else None
+        created += createSchedulesForDate(scheduleDate, chunkSize=chunkSize, progress=report)
+    return created
+
+
+def getScheduleID(userID, scheduleDate):
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT scheduleID FROM userSchedule
+            WHERE userID=? AND scheduleDate=?
+        """, (userID, scheduleDate))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def getSchedule(userID, scheduleDate=None):
+    """Return the user's schedule for scheduleDate (default today) as a one-day list, read through scheduleCache"""
+    scheduleDate = scheduleDate or date.today()
+    day = _indexedDay(userID, scheduleDate)
+    if day is not None:
+        return day.render()
+    key = (userID, str(scheduleDate))
+    schedule = scheduleCache.get(key)
+    if schedule is None:
+        token = scheduleCache.loadToken(key)
+        try:
+            schedule = getScheduleRange(userID, scheduleDate, scheduleDate)
+        except Exception:
+            # A failed load must not leave its token behind
+            scheduleCache.setIfCurrent(key, token, None)
+            raise
+        # Missing days are not cached so a freshly created day shows up at once
+        scheduleCache.setIfCurrent(key, token, schedule or None)
+    return schedule
+
+def freeSlots(bitmap):
+    """(hour, minute) starts of the slots set in a getFreeBusy bitmap, earliest first"""
+    slots = []
+    while bitmap:
+        minute = (bitmap & -bitmap).bit_length() - 1
+        bitmap &= bitmap - 1
+        slots.append(divmod(minute, 60))
+    return slots
+
+def getFreeBusy(userIDs, startDate, days):
+    """
+    Availability of many users over days consecutive dates: {userID: [bitmap or None, ...]}.
+    Bit m of a day's bitmap is set when the user has an open, unbooked slot starting m minutes
+    after midnight, so users on different slot templates line up; None marks a day the user
+    has no schedule for. Cached days come from freeBusyCache, and every user with a miss is
+    read in one grouped query.
+    """
+    dates = [str(startDate + timedelta(days=offset)) for offset in range(days)]
+    position = {d: i for i, d in enumerate(dates)}
+    freeBusy = {userID: [freeBusyCache.get((userID, d)) for d in dates] for userID in userIDs}
+    missing = [userID for userID, bitmaps in freeBusy.items() if None in bitmaps]
+    if not missing:
+        return freeBusy
+
+    tokens = {(userID, d): freeBusyCache.loadToken((userID, d)) for userID in missing for d in dates}
+    try:
+        with getCursor() as cursor:
+            # A day without a free slot still yields one row, with a NULL hour
+            cursor.execute(f"""
+                SELECT us.userID, us.scheduleDate, ts.hour, ts.minute
+                FROM userSchedule us
+                LEFT JOIN timeslots ts ON ts.scheduleID = us.scheduleID AND ts.available = 1 AND ts.bookedByUserID IS NULL
+                WHERE us.userID IN ({', '.join('?' for _ in missing)}) AND us.scheduleDate BETWEEN ? AND ?
+            """, missing + [dates[0], dates[-1]])
+            rows = cursor.fetchall()
+    except Exception:
+        for key, token in tokens.items():
+            freeBusyCache.setIfCurrent(key, token, None)
+        raise
+    for userID, scheduleDate, hour, minute in rows:
+        i = position[str(scheduleDate)]
+        bitmap = freeBusy[userID][i] or 0
+        freeBusy[userID][i] = bitmap if hour is None else bitmap | 1 << (hour * 60 + minute)
+    # Missing days are not cached so a freshly created day shows up at once
+    for (userID, d), token in tokens.items():
+        freeBusyCache.setIfCurrent((userID, d), token, freeBusy[userID][position[d]])
+    return freeBusy
+
+def getScheduleRange(userID, startDate, endDate):
+    """Return every existing schedule day of the user between startDate and endDate in one query"""
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT us.scheduleDate, ts.hour, ts.minute, ts.available, ts.bookedByUserID, 
+            (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeslotID = ts.timeslotID),
+            u.username, ts.timeSlotID
+            FROM userSchedule us
+            JOIN timeslots ts ON ts.scheduleID = us.scheduleID
+            LEFT JOIN users u ON ts.bookedByUserID = u.userID
+            WHERE us.userID = ? AND us.scheduleDate BETWEEN ? AND ?
+            ORDER BY us.scheduleDate, ts.hour, ts.minute
+        """, (userID, startDate, endDate))
+        rows = cursor.fetchall()
+
+        days = []
+        for row in rows:
+            _slotKeys.set(row[7], (userID, str(row[0])))
+            if not days or days[-1]['date'] != str(row[0]):
+                days.append({'date': str(row[0]), 'timeslots': []})
+            days[-1]['timeslots'].append(
+                {'hour': row[1], 'minute': row[2], 'available': int(row[3]), 'bookedByUserID': row[4], 'waitlist_count': row[5], 'bookerUsername': row[6]}
+            )
+        return days
+
+def getScheduleVersion(userID, startDate, endDate):
+    """
+    Highest row version behind the user's days between startDate and endDate, None when there are none.
+    Any write to those days, their waitlists or their bookers' names raises it. One-day versions are
+    cached next to the schedule and dropped with it.
+    """
+    key = (userID, str(startDate), 'version') if startDate == endDate else None
+    version = scheduleCache.get(key) if key else None
+    if version is None:
+        token = scheduleCache.loadToken(key) if key else None
+        try:
+            with getCursor() as cursor:
+                cursor.execute(f"""
+                    SELECT MAX({backend.versionOf('us.version')}), MAX({backend.versionOf('ts.version')}), MAX({backend.versionOf('u.version')})
+                    FROM userSchedule us
+                    JOIN timeslots ts ON ts.scheduleID = us.scheduleID
+                    LEFT JOIN users u ON ts.bookedByUserID = u.userID
+                    WHERE us.userID = ? AND us.scheduleDate BETWEEN ? AND ?
+                """, (userID, startDate, endDate))
+                row = cursor.fetchone()
+        except Exception:
+            if key:
+                scheduleCache.setIfCurrent(key, token, None)
+            raise
+        version = max(int(v) for v in row if v is not None) if row[0] is not None else None
+        if key:
+            # A version read before a concurrent write must not outlive its invalidation: it would answer 304
+            scheduleCache.setIfCurrent(key, token, version)
+    return version
+
+def getScheduleChanges(userID, since=0, startDate=None):
+    """
+    The user's schedule days from startDate (default today) changed after the version token since,
+    as (days, token). A day marked 'replace' is new or had slots added or removed and comes in full;
+    other days list only their changed slots. A token ahead of the database, as after a reset,
+    resyncs everything.
+    """
+    startDate = startDate or date.today()
+    with getCursor() as cursor:
+        cursor.execute(backend.versionWatermark)
+        token = int(cursor.fetchone()[0])
+        if since > token:
+            since = 0
+        if since == token:
+            return [], token
+
+        dayVersion, slotVersion = backend.versionOf('us.version'), backend.versionOf('ts.version')
+        cursor.execute(f"""
+            SELECT us.scheduleDate, CASE WHEN {dayVersion} > ? THEN 1 ELSE 0 END,
+            ts.hour, ts.minute, ts.available, ts.bookedByUserID,
+            (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeSlotID = ts.timeSlotID),
+            u.username
+            FROM userSchedule us
+            JOIN timeslots ts ON ts.scheduleID = us.scheduleID
+            LEFT JOIN users u ON ts.bookedByUserID = u.userID
+            WHERE us.userID = ? AND us.scheduleDate >= ?
+            AND ({dayVersion} > ? AND {dayVersion} <= ? OR {slotVersion} > ? AND {slotVersion} <= ?)
+            ORDER BY us.scheduleDate, ts.hour, ts.minute
+        """, (since, userID, startDate, since, token, since, token))
+        rows = cursor.fetchall()
+
+    days = []
+    for row in rows:
+        if not days or days[-1]['date'] != str(row[0]):
+            days.append({'date': str(row[0]), 'replace': bool(row[1]), 'timeslots': []})
+        days[-1]['timeslots'].append(
+            {'hour': row[2], 'minute': row[3], 'available': int(row[4]), 'bookedByUserID': row[5], 'waitlist_count': row[6], 'bookerUsername': row[7]}
         )
-    """, (date,bookerID,hour,minute))
-    conn.commit()
+    return days, token
 
-    cursor.execute("""
-        UPDATE timeslots
-        SET bookedByUserID = NULL
-        WHERE timeSlotID = ?
-    """, (timeSlotID,))
-    conn.commit()
-    return cursor.rowcount
-
-def addAppointmentDB(timeslotID, appointedTimeslotID, userID):
-    # Get the owner's userID from the timeslot
-    cursor.execute("""
-        SELECT us.userID 
-        FROM timeslots ts
-        JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-        WHERE ts.timeSlotID = ?
-    """, (timeslotID,))
-    owner_result = cursor.fetchone()
-    ownerUserID = owner_result[0] if owner_result else None
-    
-    # Set bookedByUserID on the owner's timeslot (who is being booked)
-    cursor.execute("""
-        UPDATE timeslots 
-        SET bookedByUserID = ?
-        WHERE timeSlotID = ?
-    """, (userID, timeslotID))
-    conn.commit()
-    
-    # Set available=0 and bookedByUserID on the booker's timeslot
-    cursor.execute("""
-        UPDATE timeslots
-        SET available = 0, bookedByUserID = ?
-        WHERE timeSlotID = ?
-    """, (ownerUserID, appointedTimeslotID))
-    conn.commit()
+def toggleSlotDB(userID, date, hour, minute):
+    with getCursor() as cursor:
+        cursor.execute("""
+            UPDATE timeslots
+            SET available = CASE WHEN available = 1 THEN 0 ELSE 1 END
+            WHERE hour = ?
+              AND minute = ?
+              AND scheduleID = (
+                    SELECT scheduleID
+                    FROM userSchedule
+                    WHERE userID = ?
+                      AND scheduledate = ?
+              )
+        """, (hour, minute, userID, date))
+
+        cursor.connection.commit()
+        invalidateSchedule(userID, date)
+        return cursor.rowcount
+
+
+def getWaitList(timeslot_id):
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT 
+                pq.priorityNo,
+                u.userID,
+                u.name,
+                u.email
+            FROM priorityQueue pq
+            JOIN users u ON pq.userID = u.userID
+            WHERE pq.timeSlotID = ?
+            ORDER BY pq.priorityNo ASC
+        """, (timeslot_id,))
+
+        results = []
+        for row in cursor.fetchall():
+            results.append({
+                "priority": row[0],
+                "user_id": row[1],
+                "name": row[2],
+                "email": row[3]
+            })
+        return results
+
+def addWaitList(timeslot_id, user_id):
+    with getCursor() as cursor:
+        cursor.execute(*_waitlistStatement(timeslot_id, user_id))
+        cursor.connection.commit()
+        invalidateSlot(timeslot_id)
 
 def removeFromWaitlist(timeslot_id, user_id):
-    cursor.execute("""
-        DELETE FROM priorityQueue 
-        WHERE timeSlotID = ? AND userID = ?
-    """, (timeslot_id, user_id))
-    conn.commit()
+    with getCursor() as cursor:
+        cursor.execute("""
+            DELETE FROM priorityQueue 
+            WHERE timeSlotID = ? AND userID = ?
+        """, (timeslot_id, user_id))
+        cursor.connection.commit()
+        invalidateSlot(timeslot_id)
 
 def isBooked(timeslotID):
-    cursor.execute("""
-        SELECT bookedByUserID 
-        FROM timeslots 
-        WHERE timeSlotID = ?
-    """, (timeslotID,))
-    row = cursor.fetchone()
+    key = _slotKeys.get(timeslotID) if slotIndex is not None else None
+    day = _indexedDay(*key) if key else None
+    if day is not None and timeslotID in day.slotIDs:
+        return day.bookedBy[day.slotIDs.index(timeslotID)] or None
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT bookedByUserID 
+            FROM timeslots 
+            WHERE timeSlotID = ?
+        """, (timeslotID,))
+        row = cursor.fetchone()
 
-    if row is None:
-        return None
+        if row is None:
+            return None
 
-    return row[0]
+        return row[0]
 
 def getTimeslotID(user_id, date_str, hour, minute):
-    cursor.execute("""
-        SELECT ts.timeSlotID 
-        FROM timeslots ts
-        JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-        WHERE us.userID = ? 
-          AND us.scheduleDate = ? 
-          AND ts.hour = ? 
-          AND ts.minute = ?
-    """, (user_id, date_str, hour, minute))
-    row = cursor.fetchone()
-    return row[0]
+    day = _indexedDay(user_id, date_str)
+    if day is not None and day.position(hour, minute) >= 0:
+        return day.slotIDs[day.position(hour, minute)]
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT ts.timeSlotID 
+            FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+            WHERE us.userID = ? 
+              AND us.scheduleDate = ? 
+              AND ts.hour = ? 
+              AND ts.minute = ?
+        """, (user_id, date_str, hour, minute))
+        row = cursor.fetchone()
+        return row[0]
 
 def isInWaitlist(user_id,timeslotID):
-    cursor.execute("SELECT * FROM priorityQueue WHERE userID = ? AND timeslotID = ?", (user_id,timeslotID))
-    return cursor.fetchone()
+    with getCursor() as cursor:
+        cursor.execute("SELECT * FROM priorityQueue WHERE userID = ? AND timeslotID = ?", (user_id,timeslotID))
+        return cursor.fetchone()
 
 def schedulerAlgorithm(userID,dateStr,hour,minute,appointingUserID):
-    appointed_user_timeslotID =  getTimeslotID(appointingUserID, dateStr, hour, minute)
-    user_timeslotID =  getTimeslotID(userID, dateStr, hour, minute)
-    if isBooked(user_timeslotID):
-        addWaitList(user_timeslotID, appointingUserID)
-    else:
-        addAppointmentDB(user_timeslotID, appointed_user_timeslotID, appointingUserID)
-        updateAnalytics(userID, appointingUserID, hour, minute)
+    """Book one of the owner's (userID) slots for appointingUserID; see bookSlots for the statuses"""
+    return bookSlots(userID, appointingUserID, [(dateStr, hour, minute)])[0]
+
+# Statuses of bookSlots selections that lead to a write
+BOOKING_ACCEPTED = ('booked', 'waitlisted')
+
+def _lockSlots(cursor, userIDs, selections):
+    """
+    Read and lock the given users' slots for every (date, hour, minute) in selections.
+    Returns {(userID, 'YYYY-MM-DD', hour, minute): [timeSlotID, available, bookedByUserID, queued]}
+    where queued says whether userIDs[0] is in that slot's waitlist.
+    """
+    dates = sorted({str(d) for d, _, _ in selections})
+    times = sorted({hour * 60 + minute for _, hour, minute in selections})
+    cursor.execute(f"""
+        SELECT us.userID, us.scheduleDate, ts.hour, ts.minute, ts.timeSlotID, ts.available, ts.bookedByUserID,
+            (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeSlotID = ts.timeSlotID AND pq.userID = ?)
+        FROM timeslots ts {backend.updateLock}
+        JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+        WHERE us.userID IN ({', '.join('?' for _ in userIDs)})
+          AND us.scheduleDate IN ({', '.join('?' for _ in dates)})
+          AND ts.hour * 60 + ts.minute IN ({', '.join('?' for _ in times)})
+    """, (userIDs[0], *userIDs, *dates, *times))
+    return {(row[0], str(row[1]), row[2], row[3]): list(row[4:]) for row in cursor.fetchall()}
+
+def bookSlots(ownerID, bookerID, selections, waitlist=True):
+    """
+    Book the owner's slots [(date, hour, minute), ...] for bookerID as one unit.
+    All involved slots are read and locked in one round trip and all writes go out
+    as one batch, so two concurrent bookers can't both win a slot. Nothing is
+    written unless every selection is in BOOKING_ACCEPTED.
+    Returns the status of each selection, in order:
+      'booked'     - the appointment was made
+      'waitlisted' - the slot is taken; the booker joined its queue
+      'taken'      - the slot is taken and waitlist=False
+      'busy'       - the booker's own slot is unavailable or already booked
+      'closed'     - the owner made the slot unavailable
+      'queued'     - the booker is already waiting for this slot
+      'missing'    - one of the two schedules has no such slot
+      'skipped'    - acceptable, but not written because another selection failed
+    """
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            slots = _lockSlots(cursor, (bookerID, ownerID), selections)
+
+            statuses = []
+            writes = []
+            for d, hour, minute in selections:
+                owner = slots.get((ownerID, str(d), hour, minute))
+                booker = slots.get((bookerID, str(d), hour, minute))
+
+                if owner is None or booker is None:
+                    status = 'missing'
+                elif ownerID == bookerID or not booker[1] or booker[2] is not None:
+                    status = 'busy'
+                elif owner[3]:
+                    status = 'queued'
+                elif not owner[1]:
+                    status = 'closed'
+                elif owner[2] is not None and not waitlist:
+                    status = 'taken'
+                elif owner[2] is not None:
+                    status = 'waitlisted'
+                    writes += [_waitlistStatement(owner[0], bookerID),
+                               _eventStatement('waitlisted', ownerID, bookerID, d, hour, minute)]
+                    owner[3] = 1
+                else:
+                    status = 'booked'
+                    writes += [
+                        ("UPDATE timeslots SET bookedByUserID = ? WHERE timeSlotID = ?", (bookerID, owner[0])),
+                        ("UPDATE timeslots SET available = 0, bookedByUserID = ? WHERE timeSlotID = ?", (ownerID, booker[0])),
+                    ] + _analyticsStatements(ownerID, bookerID, hour, minute) + [
+                        _eventStatement('booked', ownerID, bookerID, d, hour, minute),
+                    ]
+                    # Later selections in the batch see this booking
+                    owner[2] = bookerID
+                    booker[1], booker[2] = 0, ownerID
+                statuses.append(status)
+
+            ok = all(status in BOOKING_ACCEPTED for status in statuses)
+            if ok:
+                backend.executeBatch(cursor, writes)
+                cursor.connection.commit()
+            else:
+                cursor.connection.rollback()
+                statuses = ['skipped' if status in BOOKING_ACCEPTED else status for status in statuses]
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    if ok:
+        for d in {str(d) for d, _, _ in selections}:
+            invalidateSchedule(ownerID, d)
+            invalidateSchedule(bookerID, d)
+    return statuses
+
+def cancelSlots(ownerID, bookerID, selections):
+    """
+    Cancel bookerID's appointments on the owner's slots [(date, hour, minute), ...] as
+    one unit and hand every freed slot to its waitlist (see _promotionStatements).
+    Uses three round trips whatever the batch size: locked slot read, waitlist read, write batch.
+    Returns one (status, promotedEmail) pair per selection, where status is
+    'canceled', 'notbooked' (bookerID doesn't hold the slot) or 'missing'.
+    Nothing is written unless every selection is 'canceled'; the ones that
+    could have been are then reported as 'skipped'.
+    """
+    dates = sorted({str(d) for d, _, _ in selections})
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            slots = _lockSlots(cursor, (bookerID, ownerID), selections)
+
+            statuses = []
+            writes = []
+            freed = []
+            for d, hour, minute in selections:
+                owner = slots.get((ownerID, str(d), hour, minute))
+                booker = slots.get((bookerID, str(d), hour, minute))
+                if owner is None or booker is None:
+                    statuses.append('missing')
+                    continue
+                if owner[2] != bookerID:
+                    statuses.append('notbooked')
+                    continue
+
+                writes += [
+                    ("UPDATE timeslots SET available = 1, bookedByUserID = NULL WHERE timeSlotID = ?", (booker[0],)),
+                    _eventStatement('canceled', ownerID, bookerID, d, hour, minute),
+                ]
+                owner[2] = None
+                freed.append((owner[0], d, hour, minute))
+                statuses.append('canceled')
+
+            ok = all(status == 'canceled' for status in statuses)
+            if ok:
+                promotionWrites, promoted, changed = _promotionStatements(cursor, ownerID, freed)
+                backend.executeBatch(cursor, writes + promotionWrites)
+                cursor.connection.commit()
+                results = [('canceled', promoted.get(slot[0], (None, None))[1]) for slot in freed]
+            else:
+                cursor.connection.rollback()
+                results = [('skipped' if status == 'canceled' else status, None) for status in statuses]
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    if ok:
+        for d in dates:
+            invalidateSchedule(ownerID, d)
+            invalidateSchedule(bookerID, d)
+        for userID, d in changed:
+            invalidateSchedule(userID, d)
+    return results
+
+def toggleOwnerSlot(ownerID, date, hour, minute):
+    """
+    Open or close one of the owner's slots in one transaction. Closing a booked slot cancels
+    the appointment: the booker's own slot reopens and the slot's waitlist is dropped, as nobody
+    can take a closed slot. Reopening a slot that is still booked hands it on like cancelSlots.
+    Returns None when the slot does not exist, else (bookerID or None, [(userID, email) dropped
+    from the waitlist], promoted user's email or None).
+    """
+    key = (ownerID, str(date), hour, minute)
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            owner = _lockSlots(cursor, (ownerID,), [(date, hour, minute)]).get(key)
+            if owner is None:
+                cursor.connection.rollback()
+                return None
+            slotID, available, bookerID = owner[0], owner[1], owner[2]
+            writes = [("UPDATE timeslots SET available = ? WHERE timeSlotID = ?", (0 if available else 1, slotID))]
+            dropped, promoted, changed = [], {}, set()
+            if bookerID is not None:
+                booker = _lockSlots(cursor, (bookerID,), [(date, hour, minute)]).get((bookerID, str(date), hour, minute))
+                if booker is not None and booker[2] == ownerID:
+                    writes.append(("UPDATE timeslots SET available = 1, bookedByUserID = NULL WHERE timeSlotID = ?", (booker[0],)))
+                writes.append(_eventStatement('ownerCanceled', ownerID, bookerID, date, hour, minute))
+                if available:
+                    cursor.execute("""
+                        SELECT pq.userID, u.email FROM priorityQueue pq
+                        JOIN users u ON u.userID = pq.userID
+                        WHERE pq.timeSlotID = ?
+                        ORDER BY pq.priorityNo
+                    """, (slotID,))
+                    dropped = [tuple(row) for row in cursor.fetchall()]
+                    writes += [("DELETE FROM priorityQueue WHERE timeSlotID = ?", (slotID,)),
+                               ("UPDATE timeslots SET bookedByUserID = NULL WHERE timeSlotID = ?", (slotID,))]
+                else:
+                    promotionWrites, promoted, changed = _promotionStatements(cursor, ownerID, [(slotID, date, hour, minute)])
+                    writes += promotionWrites
+            backend.executeBatch(cursor, writes)
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+
+    invalidateSchedule(ownerID, date)
+    if bookerID is not None:
+        invalidateSchedule(bookerID, date)
+    for changedUserID, d in changed:
+        invalidateSchedule(changedUserID, d)
+    head = promoted.get(slotID)
+    return bookerID, dropped, head[1] if head else None
+
+def _waitlistStatement(timeslotID, userID):
+    """
+    Append userID to the timeslot's queue. The position is computed inside the INSERT,
+    under a range lock on the queue, so concurrent joins get distinct positions.
+    """
+    return (f"""
+        INSERT INTO priorityQueue (timeSlotID, userID, priorityNo)
+        SELECT ?, ?, COALESCE(MAX(priorityNo), 0) + 1
+        FROM priorityQueue {backend.updateLock}
+        WHERE timeSlotID = ?
+    """, (timeslotID, userID, timeslotID))
+
+def _promotionStatements(cursor, ownerID, freed):
+    """
+    Hand each freed owner slot [(timeSlotID, date, hour, minute), ...] to its waitlist, reading
+    every queue involved in one locked query. The first waiting user whose own slot at that
+    time is still open takes the slot; entries skipped on the way are pruned. A promoted user
+    can no longer take any other slot at the same date and time, so their other queue entries
+    there are dropped in the same pass.
+    Returns (writes, {timeSlotID: (userID, email)}, {(userID, 'YYYY-MM-DD')} whose schedules changed).
+    """
+    if not freed:
+        return [], {}, set()
+    placeholders = ', '.join('?' for _ in freed)
+    slotIDs = [slot[0] for slot in freed]
+    # 'queue' rows: the freed slots' queues in order, with each waiting user's own slot and
+    # whether it is open. 'other' rows: where else those users wait at the same date and time.
+    cursor.execute(f"""
+        SELECT 'queue', pq.timeSlotID, pq.priorityNo, pq.userID, u.email, mine.timeSlotID,
+            CASE WHEN mine.available = 1 AND mine.bookedByUserID IS NULL THEN 1 ELSE 0 END, NULL
+        FROM priorityQueue pq
+        JOIN users u ON u.userID = pq.userID
+        JOIN timeslots ts ON ts.timeSlotID = pq.timeSlotID
+        JOIN userSchedule us ON us.scheduleID = ts.scheduleID
+        LEFT JOIN userSchedule mus ON mus.userID = pq.userID AND mus.scheduleDate = us.scheduleDate
+        LEFT JOIN timeslots mine {backend.updateLock} ON mine.scheduleID = mus.scheduleID AND mine.hour = ts.hour AND mine.minute = ts.minute
+        WHERE pq.timeSlotID IN ({placeholders})
+        UNION ALL
+        SELECT 'other', pq.timeSlotID, NULL, other.userID, NULL, other.timeSlotID, NULL, ous.userID
+        FROM priorityQueue pq
+        JOIN timeslots ts ON ts.timeSlotID = pq.timeSlotID
+        JOIN userSchedule us ON us.scheduleID = ts.scheduleID
+        JOIN priorityQueue other ON other.userID = pq.userID AND other.timeSlotID <> pq.timeSlotID
+        JOIN timeslots ots ON ots.timeSlotID = other.timeSlotID AND ots.hour = ts.hour AND ots.minute = ts.minute
+        JOIN userSchedule ous ON ous.scheduleID = ots.scheduleID AND ous.scheduleDate = us.scheduleDate
+        WHERE pq.timeSlotID IN ({placeholders})
+        ORDER BY 1 DESC, 2, 3
+    """, slotIDs + slotIDs)
+    queues = {}
+    elsewhere = {}
+    for kind, timeslotID, _, userID, email, slotID, free, otherOwnerID in cursor.fetchall():
+        if kind == 'queue':
+            queues.setdefault(timeslotID, []).append((userID, email, slotID, free))
+        else:
+            elsewhere.setdefault(userID, set()).add((slotID, otherOwnerID))
+
+    writes = []
+    promoted = {}
+    changed = set()
+    busy = set()  # (userID, date, hour, minute) taken earlier in this pass
+    for timeslotID, d, hour, minute in freed:
+        for userID, email, ownSlotID, free in queues.get(timeslotID, ()):
+            if free and (userID, str(d), hour, minute) not in busy:
+                writes += [
+                    ("UPDATE timeslots SET bookedByUserID = ? WHERE timeSlotID = ?", (userID, timeslotID)),
+                    ("UPDATE timeslots SET available = 0, bookedByUserID = ? WHERE timeSlotID = ?", (ownerID, ownSlotID)),
+                    ("DELETE FROM priorityQueue WHERE timeSlotID = ? AND userID = ?", (timeslotID, userID)),
+                ] + _analyticsStatements(ownerID, userID, hour, minute) + [
+                    _eventStatement('promoted', ownerID, userID, d, hour, minute),
+                ]
+                for otherSlotID, otherOwnerID in elsewhere.pop(userID, ()):
+                    writes.append(("DELETE FROM priorityQueue WHERE timeSlotID = ? AND userID = ?", (otherSlotID, userID)))
+                    changed.add((otherOwnerID, str(d)))
+                promoted[timeslotID] = (userID, email)
+                changed.add((userID, str(d)))
+                busy.add((userID, str(d), hour, minute))
+                break
+            # Not free at that time any more: drop the entry instead of skipping it again next time
+            writes.append(("DELETE FROM priorityQueue WHERE timeSlotID = ? AND userID = ?", (timeslotID, userID)))
+        else:
+            writes.append(("UPDATE timeslots SET bookedByUserID = NULL WHERE timeSlotID = ?", (timeslotID,)))
+    return writes, promoted, changed
 
 def reSchedulerAlgorithm(userID, date, hour, minute):
-    timeslotID = getTimeslotID(userID, date, hour, minute)
-    waitlist = getWaitList(timeslotID)
+    """
+    Give the owner's (userID) slot to the first eligible user in its waitlist, or free it
+    when nobody is; the previous booker's own slot is the caller's to release.
+    Returns the promoted user's email, or None.
+    """
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            owner = _lockSlots(cursor, (userID,), [(date, hour, minute)]).get((userID, str(date), hour, minute))
+            if owner is None:
+                cursor.connection.rollback()
+                return None
+            writes, promoted, changed = _promotionStatements(cursor, userID, [(owner[0], date, hour, minute)])
+            backend.executeBatch(cursor, writes)
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
 
-    if not waitlist:
-        freeSlotDB(timeslotID)
-        return None
-    else:
-        priorityUser = waitlist[0] # The one with lowest priorityNo
-        priorityUserID = priorityUser['user_id']
-        priorityUser_timeslotID =  getTimeslotID(priorityUserID, date, hour, minute)
-        addAppointmentDB(timeslotID, priorityUser_timeslotID, priorityUserID)
-        updateAnalytics(userID,priorityUserID, hour, minute)
-        removeFromWaitlist(timeslotID, priorityUserID)
-        return priorityUser['email']
+    invalidateSchedule(userID, date)
+    for changedUserID, d in changed:
+        invalidateSchedule(changedUserID, d)
+    head = promoted.get(owner[0])
+    return head[1] if head else None
 
 def reopenSlotForBooker(user_id, date, hour, minute):
-    timeslotID = getTimeslotID(user_id, date, hour, minute)
-    cursor.execute("""
-        UPDATE timeslots
-        SET available = 1, bookedByUserID = NULL
-        WHERE timeSlotID = ?
-    """, (timeslotID,))
-    conn.commit()
+    with getCursor() as cursor:
+        timeslotID = getTimeslotID(user_id, date, hour, minute)
+        cursor.execute("""
+            UPDATE timeslots
+            SET available = 1, bookedByUserID = NULL
+            WHERE timeSlotID = ?
+        """, (timeslotID,))
+        cursor.connection.commit()
+        invalidateSchedule(user_id, date)
 
 def getUsernameByID(user_id):
-    cursor.execute("""
-        SELECT username
-        FROM users
-        WHERE userID = ?
-    """, (user_id,))
-    row = cursor.fetchone()
-    return row[0]
-
-def getMostFrequentSlotOfUser(userID):
-    cursor.execute("""
-        SELECT TOP 1 hour, minute, SUM(bookingCount) as total
-        FROM appointmentStats
-        WHERE ownerUserID = ?
-        GROUP BY hour, minute
-        ORDER BY total DESC
-    """, (userID,))
-    
-    row = cursor.fetchone()
-    if row:
-        return row
-    return None
-
-def getTopBookers(userID):
-    cursor.execute("""
-        SELECT TOP 3 u.name, SUM(s.bookingCount) as total
-        FROM appointmentStats s
-        JOIN users u ON s.bookerUserID = u.userID
-        WHERE s.ownerUserID = ?
-        GROUP BY u.name
-        ORDER BY total DESC
-    """, (userID,))
-    rows = cursor.fetchall()
-    if rows:
-        return rows
-    return None
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT username
+            FROM users
+            WHERE userID = ?
+        """, (user_id,))
+        row = cursor.fetchone()
+        return row[0]
+
+def getSlotPreferences(ownerID, bookerIDs):
+    """
+    How often each slot of the owner was booked, overall and by the given bookers, in one query.
+    Returns {'owner': {(hour, minute): count}, 'bookers': {(hour, minute): count}}.
+    """
+    preferences = {'owner': {}, 'bookers': {}}
+    params = [ownerID]
+    query = "SELECT 'owner', hour, minute, bookingCount FROM ownerSlotStats WHERE ownerUserID = ?"
+    if bookerIDs:
+        query += f"""
+            UNION ALL
+            SELECT 'bookers', hour, minute, SUM(bookingCount) FROM appointmentStats
+            WHERE ownerUserID = ? AND bookerUserID IN ({', '.join('?' for _ in bookerIDs)})
+            GROUP BY hour, minute
+        """
+        params += [ownerID, *bookerIDs]
+    with getCursor() as cursor:
+        cursor.execute(query, params)
+        for kind, hour, minute, count in cursor.fetchall():
+            preferences[kind][(hour, minute)] = count
+    return preferences
+
+# Rollups of appointmentStats per owner, kept current by _analyticsStatements
+ANALYTICS_TABLES = ('ownerStats', 'ownerSlotStats', 'ownerBookerStats')
+
+
+def getAnalytics(userID, topBookers=3):
+    """
+    An owner's booking total, most booked slot and top bookers, read from the rollups
+    in one round trip. Returns {'total', 'slot': (hour, minute) or None, 'bookers': [(userID, name, count)]}.
+    """
+    topSlot = backend.limit("""
+        SELECT 'slot' AS kind, hour, minute, NULL AS bookerUserID, NULL AS name, bookingCount
+        FROM ownerSlotStats WHERE ownerUserID = ?
+        ORDER BY bookingCount DESC, hour, minute
+    """, 1)
+    bookers = backend.limit("""
+        SELECT 'booker' AS kind, NULL AS hour, NULL AS minute, b.bookerUserID, u.name, b.bookingCount
+        FROM ownerBookerStats b
+        JOIN users u ON u.userID = b.bookerUserID
+        WHERE b.ownerUserID = ?
+        ORDER BY b.bookingCount DESC, b.bookerUserID
+    """, topBookers)
+    with getCursor() as cursor:
+        cursor.execute(f"""
+            SELECT 'total', NULL, NULL, NULL, NULL, bookingCount FROM ownerStats WHERE ownerUserID = ?
+            UNION ALL SELECT * FROM ({topSlot}) s
+            UNION ALL SELECT * FROM ({bookers}) b
+        """, (userID, userID, userID))
+        result = {'total': 0, 'slot': None, 'bookers': []}
+        for kind, hour, minute, bookerID, name, count in cursor.fetchall():
+            if kind == 'total':
+                result['total'] = count
+            elif kind == 'slot':
+                result['slot'] = (hour, minute)
+            else:
+                result['bookers'].append((bookerID, name, count))
+        return result
 	
-def updateAnalytics(ownerID, bookerID, hour, minute):
+def getAnalyticsVersion(userID):
+    """Version of what getAnalytics returns: the owner's total and its bookers' names; None without bookings"""
+    with getCursor() as cursor:
+        cursor.execute(f"""
+            SELECT {backend.versionOf('s.version')},
+            (SELECT MAX({backend.versionOf('u.version')}) FROM ownerBookerStats b
+             JOIN users u ON u.userID = b.bookerUserID WHERE b.ownerUserID = s.ownerUserID)
+            FROM ownerStats s WHERE s.ownerUserID = ?
+        """, (userID,))
+        row = cursor.fetchone()
+        return f"{row[0]}.{row[1] or 0}" if row else None
+
+def _analyticsStatements(ownerID, bookerID, hour, minute):
+    """Statements that count one confirmed booking in the stats table and its rollups"""
+    return [
+        (backend.upsertIncrement('appointmentStats', ('ownerUserID', 'bookerUserID', 'hour', 'minute'), 'bookingCount'),
+         (ownerID, bookerID, hour, minute)),
+        (backend.upsertIncrement('ownerStats', ('ownerUserID',), 'bookingCount'), (ownerID,)),
+        (backend.upsertIncrement('ownerSlotStats', ('ownerUserID', 'hour', 'minute'), 'bookingCount'), (ownerID, hour, minute)),
+        (backend.upsertIncrement('ownerBookerStats', ('ownerUserID', 'bookerUserID'), 'bookingCount'), (ownerID, bookerID)),
+    ]
+
+def updateAnalytics(ownerID, bookerID, hour, minute, event=None):
     """
     Updates the unified stats table.
+    event: optional (kind, appointmentDate) logged to bookingEvents in the same batch.
     """
-    cursor.execute("""
-        UPDATE appointmentStats 
-        SET bookingCount = bookingCount + 1
-        WHERE ownerUserID = ? AND bookerUserID = ? AND hour = ? AND minute = ?
-    """, (ownerID, bookerID, hour, minute))
-    if cursor.rowcount == 0:
-        cursor.execute("""
-            INSERT INTO appointmentStats (ownerUserID, bookerUserID, hour, minute, bookingCount)
-            VALUES (?, ?, ?, ?, 1)
-        """, (ownerID, bookerID, hour, minute))
+    statements = _analyticsStatements(ownerID, bookerID, hour, minute)
+    if event:
+        statements.append(_eventStatement(event[0], ownerID, bookerID, event[1], hour, minute))
+    with getCursor() as cursor:
+        backend.executeBatch(cursor, statements)
+        cursor.connection.commit()
+
+def _rebuildAnalytics(cursor, ownerIDs=None):
+    """Recompute the rollups of the given owners (default: everyone) from appointmentStats"""
+    if ownerIDs is not None and not ownerIDs:
+        return
+    where = f"WHERE ownerUserID IN ({', '.join('?' for _ in ownerIDs)})" if ownerIDs is not None else ""
+    params = list(ownerIDs or ())
+    for table in ANALYTICS_TABLES:
+        cursor.execute(f"DELETE FROM {table} {where}", params)
+    for table, keys in (('ownerStats', 'ownerUserID'),
+                        ('ownerSlotStats', 'ownerUserID, hour, minute'),
+                        ('ownerBookerStats', 'ownerUserID, bookerUserID')):
+        cursor.execute(f"""
+            INSERT INTO {table} ({keys}, bookingCount)
+            SELECT {keys}, SUM(bookingCount) FROM appointmentStats {where} GROUP BY {keys}
+        """, params)
+
+def rebuildAnalytics():
+    """Recompute every rollup from appointmentStats in one transaction; returns how many owners have one"""
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            _rebuildAnalytics(cursor)
+            cursor.execute("SELECT COUNT(*) FROM ownerStats")
+            owners = cursor.fetchone()[0]
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+        return owners
 
-    conn.commit()
+# Kinds of bookingEvents rows; 'ownerCanceled' is the owner closing a booked slot
+BOOKING_EVENT_KINDS = ('booked', 'waitlisted', 'promoted', 'canceled', 'ownerCanceled')
+BUCKET_KEYS = ('ownerUserID', 'grain', 'bucketStart', 'kind', 'hour', 'minute')
+# Events younger than this are left for the next aggregation run, so a transaction
+# that commits a lower eventID after a higher one is still counted
+AGGREGATION_LAG = timedelta(seconds=int(os.getenv('ANALYTICS_AGGREGATION_LAG_SECONDS', 30)))
+
+def _eventStatement(kind, ownerID, bookerID, appointmentDate, hour, minute):
+    """Statement that appends one row to the booking event log"""
+    return ("""
+        INSERT INTO bookingEvents (occurredAt, kind, ownerUserID, bookerUserID, appointmentDate, hour, minute)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (datetime.utcnow(), kind, ownerID, bookerID, str(appointmentDate), hour, minute))
+
+def recordBookingEvents(events):
+    """Append [(kind, ownerID, bookerID, appointmentDate, hour, minute), ...] to the event log"""
+    if not events:
+        return
+    with getCursor() as cursor:
+        backend.executeBatch(cursor, [_eventStatement(*event) for event in events])
+        cursor.connection.commit()
+
+def aggregateBookingEvents(batchSize=5000):
+    """
+    Fold new bookingEvents into the per-owner day and week buckets, batch by batch.
+    Meant for a background job; the watermark row lock keeps concurrent runs from
+    counting an event twice. Returns how many events were aggregated.
+    """
+    total = 0
+    while True:
+        with getCursor() as cursor:
+            backend.begin(cursor)
+            try:
+                cursor.execute(f"SELECT lastEventID FROM aggregationWatermarks {backend.updateLock} WHERE name = 'bookingEvents'")
+                lastEventID = cursor.fetchone()[0]
+                cursor.execute(backend.limit("""
+                    SELECT eventID, occurredAt, kind, ownerUserID, hour, minute
+                    FROM bookingEvents
+                    WHERE eventID > ? AND occurredAt < ?
+                    ORDER BY eventID
+                """, batchSize), (lastEventID, datetime.utcnow() - AGGREGATION_LAG))
+                rows = cursor.fetchall()
+                if not rows:
+                    cursor.connection.rollback()
+                    return total
+
+                counts = Counter()
+                for _, occurredAt, kind, ownerID, hour, minute in rows:
+                    day = occurredAt.date()
+                    counts[(ownerID, 'day', day, kind, hour, minute)] += 1
+                    counts[(ownerID, 'week', day - timedelta(days=day.weekday()), kind, hour, minute)] += 1
+                backend.executemany(cursor, backend.upsertAdd('bookingEventBuckets', BUCKET_KEYS, 'eventCount'),
+                                    [key + (count,) for key, count in counts.items()])
+                cursor.execute("""
+                    UPDATE aggregationWatermarks SET lastEventID = ?, lastOccurredAt = ?, updatedAt = ?
+                    WHERE name = 'bookingEvents'
+                """, (rows[-1][0], rows[-1][1], datetime.utcnow()))
+                cursor.connection.commit()
+            except Exception:
+                cursor.connection.rollback()
+                raise
+        total += len(rows)
+        if len(rows) < batchSize:
+            return total
+
+def getBookingEventBuckets(userID, since, grain='day'):
+    """
+    An owner's buckets of the given grain starting on or after since, plus the time
+    of the newest aggregated event: ([(bucketStart, kind, hour, minute, count)], asOf).
+    """
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT b.bucketStart, b.kind, b.hour, b.minute, b.eventCount, w.lastOccurredAt
+            FROM aggregationWatermarks w
+            LEFT JOIN bookingEventBuckets b ON b.ownerUserID = ? AND b.grain = ? AND b.bucketStart >= ?
+            WHERE w.name = 'bookingEvents'
+            ORDER BY b.bucketStart
+        """, (userID, grain, since))
+        rows = cursor.fetchall()
+        asOf = rows[0][5] if rows else None
+        return [tuple(row[:5]) for row in rows if row[0] is not None], asOf
 
 def getAllUsersInfo():
-    cursor.execute("SELECT userID, name, username, email, password FROM users")
-    return cursor.fetchall()
+    with getCursor() as cursor:
+        cursor.execute("SELECT userID, name, username, email, password FROM users")
+        return cursor.fetchall()
+
+def getUserInfo(user_id):
+    with getCursor() as cursor:
+        cursor.execute("SELECT userID, name, username, email FROM users WHERE userID = ?", (user_id,))
+        return cursor.fetchone()
+
+def getUserVersion(user_id):
+    with getCursor() as cursor:
+        cursor.execute(f"SELECT {backend.versionOf('version')} FROM users WHERE userID = ?", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
 
 def getUserBookings(user_id):
-    #gets all the appointments booked by the user
-    cursor.execute("""
-        SELECT 
-            us.scheduleDate,
-            ts.hour,
-            ts.minute,
-            uOwner.name
-         FROM timeslots ts
-         JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-         JOIN users uOwner ON us.userID = uOwner.userID
-         WHERE ts.bookedByUserID = ?
-         ORDER BY us.scheduleDate DESC, ts.hour ASC
-    """, (user_id,))
-
-    return cursor.fetchall()
+    with getCursor() as cursor:
+        #gets all the appointments booked by the user
+        cursor.execute("""
+            SELECT 
+                us.scheduleDate,
+                ts.hour,
+                ts.minute,
+                uOwner.name
+             FROM timeslots ts
+             JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+             JOIN users uOwner ON us.userID = uOwner.userID
+             WHERE ts.bookedByUserID = ?
+             ORDER BY us.scheduleDate DESC, ts.hour ASC
+        """, (user_id,))
+
+        return cursor.fetchall()
 
 def checkOwnAvailability(user_id, hour, minute,date):
-    cursor.execute("""
-        SELECT ts.available
-        FROM timeslots ts
-        JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-        WHERE ts.hour = ?
-        AND ts.minute = ?
-        AND us.userID = ?
-        AND us.scheduleDate = ?
-    """, (hour,minute,user_id,date))
+    day = _indexedDay(user_id, date)
+    if day is not None and day.position(hour, minute) >= 0:
+        return day.isAvailable(day.position(hour, minute))
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT ts.available
+            FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+            WHERE ts.hour = ?
+            AND ts.minute = ?
+            AND us.userID = ?
+            AND us.scheduleDate = ?
+        """, (hour,minute,user_id,date))
 
-    row = cursor.fetchone()
-    print (row)
-    return row[0]
+        row = cursor.fetchone()
+        return row[0]
 
 def deleteUser(user_id):
     """Delete a user and all related data"""
-    try:
-        # Delete from priorityQueue first (foreign key constraints)
-        cursor.execute("DELETE FROM priorityQueue WHERE userID = ?", (user_id,))
-        # Delete appointments where user is booker
-        cursor.execute("DELETE FROM timeslots WHERE bookedByUserID = ?", (user_id,))
-        # Delete user's schedule and timeslots
-        cursor.execute("DELETE FROM timeslots WHERE scheduleID IN (SELECT scheduleID FROM userSchedule WHERE userID = ?)", (user_id,))
-        cursor.execute("DELETE FROM userSchedule WHERE userID = ?", (user_id,))
-        # Delete appointment stats
-        cursor.execute("DELETE FROM appointmentStats WHERE ownerUserID = ? OR bookerUserID = ?", (user_id, user_id))
-        # Delete user
-        cursor.execute("DELETE FROM users WHERE userID = ?", (user_id,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error deleting user: {e}")
-        conn.rollback()
-        return False
+    with getCursor() as cursor:
+        try:
+            # Delete from priorityQueue first (foreign key constraints)
+            cursor.execute("DELETE FROM priorityQueue WHERE userID = ?", (user_id,))
+            # Delete appointments where user is booker
+            cursor.execute("DELETE FROM timeslots WHERE bookedByUserID = ?", (user_id,))
+            # Delete user's schedule and timeslots
+            cursor.execute("DELETE FROM timeslots WHERE scheduleID IN (SELECT scheduleID FROM userSchedule WHERE userID = ?)", (user_id,))
+            cursor.execute("DELETE FROM userSchedule WHERE userID = ?", (user_id,))
+            cursor.execute("DELETE FROM slotTemplates WHERE userID = ?", (user_id,))
+            # Delete appointment stats and roll up the owners the user had booked with again
+            cursor.execute("SELECT DISTINCT ownerUserID FROM appointmentStats WHERE bookerUserID = ? AND ownerUserID <> ?", (user_id, user_id))
+            owners = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM appointmentStats WHERE ownerUserID = ? OR bookerUserID = ?", (user_id, user_id))
+            _rebuildAnalytics(cursor, owners + [user_id])
+            cursor.execute("DELETE FROM bookingEventBuckets WHERE ownerUserID = ?", (user_id,))
+            cursor.execute("DELETE FROM bookingEvents WHERE ownerUserID = ?", (user_id,))
+            # Delete user
+            cursor.execute("DELETE FROM users WHERE userID = ?", (user_id,))
+            cursor.connection.commit()
+            # The user's bookings vanish from many other schedules
+            clearScheduleCaches()
+            return True
+        except Exception as e:
+            print(f"Error deleting user: {e}")
+            cursor.connection.rollback()
+            return False
 
 
 def updateUser(user_id, name=None, username=None, email=None):
     """Update user information"""
-    try:
-        updates = []
-        params = []
+    with getCursor() as cursor:
+        try:
+            updates = []
+            params = []
         
-        if name:
-            updates.append("name = ?")
-            params.append(name)
-        if username:
-            updates.append("username = ?")
-            params.append(username)
-        if email:
-            updates.append("email = ?")
-            params.append(email)
+            if name:
+                updates.append("name = ?")
+                params.append(name)
+            if username:
+                updates.append("username = ?")
+                params.append(username)
+            if email:
+                updates.append("email = ?")
+                params.append(email)
         
-        if not updates:
-            return True
+            if not updates:
+                return True
             
-        params.append(user_id)
-        query = f"UPDATE users SET {', '.join(updates)} WHERE userID = ?"
-        cursor.execute(query, params)
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error updating user: {e}")
-        conn.rollback()
-        return False
+            params.append(user_id)
+            query = f"UPDATE users SET {', '.join(updates)} WHERE userID = ?"
+            cursor.execute(query, params)
+            cursor.connection.commit()
+            if username:
+                # Cached days show the username on every slot the user booked
+                clearScheduleCaches()
+            return True
+        except Exception as e:
+            print(f"Error updating user: {e}")
+            cursor.connection.rollback()
+            return False
 
 
-def backupDatabase():
-    """Get all database contents for backup"""
-    try:
-        backup_data = {}
-        
-        cursor.execute("SELECT userID, name, username, email, password FROM users")
-        backup_data['users'] = cursor.fetchall()
-        
-        cursor.execute("SELECT scheduleID, userID, scheduleDate FROM userSchedule")
-        backup_data['userSchedule'] = cursor.fetchall()
-        
-        cursor.execute("SELECT timeSlotID, scheduleID, hour, minute, available, bookedByUserID FROM timeslots")
-        backup_data['timeslots'] = cursor.fetchall()
-        
-        cursor.execute("SELECT timeSlotID, userID, priorityNo FROM priorityQueue")
-        backup_data['priorityQueue'] = cursor.fetchall()
-        
-        cursor.execute("SELECT ownerUserID, bookerUserID, hour, minute, bookingCount FROM appointmentStats")
-        backup_data['appointmentStats'] = cursor.fetchall()
-        
-        return backup_data
-    except Exception as e:
-        print(f"Error backing up database: {e}")
-        return None
+def _keysetAfter(columns, values):
+    """WHERE clause selecting rows ordered after `values` on `columns` (ascending keyset pagination)"""
+    column, rest = columns[0], columns[1:]
+    if not rest:
+        return f"{column} > ?", [values[0]]
+    inner, params = _keysetAfter(rest, values[1:])
+    return f"({column} > ? OR ({column} = ? AND {inner}))", [values[0], values[0]] + params
+
+
+def _page(cursor, select, keyColumns, filters, after, limit):
+    """
+    Run one keyset page of `select` (which must select keyColumns last).
+    filters: [(sql, params), ...] ANDed together. Returns (rows, nextKey or None).
+    """
+    filters = list(filters)
+    if after:
+        filters.append(_keysetAfter(keyColumns, after))
+    where = " AND ".join(sql for sql, _ in filters) or "1 = 1"
+    params = [param for _, filterParams in filters for param in filterParams]
+    cursor.execute(backend.limit(f"{select} WHERE {where} ORDER BY {', '.join(keyColumns)}", limit + 1), params)
+    rows = cursor.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][-len(keyColumns):])
+
+
+def getUsersPage(after=None, limit=100, userID=None, search=None):
+    """One page of users ordered by userID; search matches the start of username or email"""
+    filters = []
+    if userID is not None:
+        filters.append(("userID = ?", [userID]))
+    if search:
+        filters.append(("(username LIKE ? OR email LIKE ?)", [search + '%', search + '%']))
+    with getCursor() as cursor:
+        return _page(cursor, "SELECT name, username, email, password, userID FROM users",
+                     ('userID',), filters, after, limit)
+
+
+def getBookingsForUsers(userIDs):
+    """getUserBookings for many users in one query: {userID: [(date, hour, minute, ownerName), ...]}"""
+    bookings = {userID: [] for userID in userIDs}
+    if not userIDs:
+        return bookings
+    with getCursor() as cursor:
+        cursor.execute(f"""
+            SELECT ts.bookedByUserID, us.scheduleDate, ts.hour, ts.minute, uOwner.name
+            FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+            JOIN users uOwner ON us.userID = uOwner.userID
+            WHERE ts.bookedByUserID IN ({', '.join('?' for _ in userIDs)})
+            ORDER BY us.scheduleDate DESC, ts.hour ASC
+        """, list(userIDs))
+        for row in cursor.fetchall():
+            bookings[row[0]].append(tuple(row[1:]))
+    return bookings
+
+
+def getSchedulesPage(after=None, limit=100, userID=None, dateFrom=None, dateTo=None):
+    """One page of schedule days with the owner's username, ordered by scheduleID"""
+    filters = []
+    if userID is not None:
+        filters.append(("us.userID = ?", [userID]))
+    if dateFrom:
+        filters.append(("us.scheduleDate >= ?", [dateFrom]))
+    if dateTo:
+        filters.append(("us.scheduleDate <= ?", [dateTo]))
+    with getCursor() as cursor:
+        return _page(cursor, """
+            SELECT us.userID, u.username, us.scheduleDate, us.scheduleID
+            FROM userSchedule us
+            LEFT JOIN users u ON us.userID = u.userID
+        """, ('us.scheduleID',), filters, after, limit)
+
+
+def getTimeslotsPage(after=None, limit=100, userID=None, dateFrom=None, dateTo=None, bookedByUserID=None):
+    """One page of timeslots ordered by (scheduleID, hour, minute)"""
+    filters = []
+    if userID is not None:
+        filters.append(("us.userID = ?", [userID]))
+    if dateFrom:
+        filters.append(("us.scheduleDate >= ?", [dateFrom]))
+    if dateTo:
+        filters.append(("us.scheduleDate <= ?", [dateTo]))
+    if bookedByUserID is not None:
+        filters.append(("ts.bookedByUserID = ?", [bookedByUserID]))
+    with getCursor() as cursor:
+        return _page(cursor, """
+            SELECT ts.timeSlotID, ts.available, ts.bookedByUserID, ts.scheduleID, ts.hour, ts.minute
+            FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+        """, ('ts.scheduleID', 'ts.hour', 'ts.minute'), filters, after, limit)
+
+
+def getAppointmentStatsPage(after=None, limit=100, ownerUserID=None):
+    """One page of appointmentStats ordered by its primary key"""
+    filters = []
+    if ownerUserID is not None:
+        filters.append(("ownerUserID = ?", [ownerUserID]))
+    with getCursor() as cursor:
+        return _page(cursor, """
+            SELECT bookingCount, ownerUserID, bookerUserID, hour, minute
+            FROM appointmentStats
+        """, ('ownerUserID', 'bookerUserID', 'hour', 'minute'), filters, after, limit)
+
+
+# Notification outbox
+def enqueueNotifications(notifications):
+    """
+    Queue notifications for background delivery.
+    notifications: [(kind, targetEmail, subject, message), ...] where kind is
+    'publish' (email through the topic) or 'subscribe' (subscribe targetEmail).
+    """
+    if not notifications:
+        return
+    now = datetime.utcnow()
+    with getCursor() as cursor:
+        backend.executemany(cursor, """
+            INSERT INTO notificationOutbox (kind, targetEmail, subject, message, nextAttemptAt, createdAt)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(kind, email, subject, message, now, now) for kind, email, subject, message in notifications])
+        cursor.connection.commit()
+
+def enqueueNotification(targetEmail, subject, message):
+    enqueueNotifications([('publish', targetEmail, subject, message)])
+
+def claimNotifications(limit, leaseSeconds=120):
+    """Lease up to `limit` due notifications; other workers skip them until the lease runs out"""
+    now = datetime.utcnow()
+    with getCursor() as cursor:
+        backend.begin(cursor)
+        try:
+            cursor.execute(backend.limit(f"""
+                SELECT notificationID, kind, targetEmail, subject, message, attempts
+                FROM notificationOutbox {backend.skipLocked}
+                WHERE sentAt IS NULL AND failedAt IS NULL AND nextAttemptAt <= ?
+                ORDER BY notificationID
+            """, limit), (now,))
+            rows = cursor.fetchall()
+            if rows:
+                leaseUntil = now + timedelta(seconds=leaseSeconds)
+                backend.executemany(cursor, "UPDATE notificationOutbox SET nextAttemptAt = ? WHERE notificationID = ?",
+                                    [(leaseUntil, row[0]) for row in rows])
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+    return [
+        {'id': row[0], 'kind': row[1], 'email': row[2], 'subject': row[3], 'message': row[4], 'attempts': row[5]}
+        for row in rows
+    ]
+
+def markNotificationsSent(notificationIDs):
+    if not notificationIDs:
+        return
+    now = datetime.utcnow()
+    with getCursor() as cursor:
+        backend.executemany(cursor, "UPDATE notificationOutbox SET sentAt = ?, attempts = attempts + 1 WHERE notificationID = ?",
+                            [(now, notificationID) for notificationID in notificationIDs])
+        cursor.connection.commit()
+
+def markNotificationFailed(notificationID, error, retryAt):
+    """Record a failed attempt; retryAt=None gives up on the notification"""
+    with getCursor() as cursor:
+        if retryAt is None:
+            cursor.execute("""
+                UPDATE notificationOutbox SET attempts = attempts + 1, lastError = ?, failedAt = ?
+                WHERE notificationID = ?
+            """, (str(error)[:1000], datetime.utcnow(), notificationID))
+        else:
+            cursor.execute("""
+                UPDATE notificationOutbox SET attempts = attempts + 1, lastError = ?, nextAttemptAt = ?
+                WHERE notificationID = ?
+            """, (str(error)[:1000], retryAt, notificationID))
+        cursor.connection.commit()
 
 
 # Admin helpers
 def checkAdminLogin(username, password):
     """Validate admin credentials; allows fallback if admin table doesn't exist"""
-    try:
-        cursor.execute("SELECT adminID, username FROM admin WHERE username=? AND password=?", (username, password))
-        return cursor.fetchone()
-    except Exception as e:
-        # If admin table doesn't exist, use fallback authentication
-        if "Invalid object name 'admin'" in str(e):
-            # Allow default admin credentials as fallback
-            if username == 'admin' and password == 'admin123':
-                return (0, 'admin')  # Return dummy admin record
-        print(f"Admin login error: {e}")
+    with getCursor() as cursor:
+        try:
+            cursor.execute("SELECT adminID, username, password FROM admin WHERE username=?", (username,))
+            row = cursor.fetchone()
+        except Exception as e:
+            # If admin table doesn't exist, use fallback authentication
+            if backend.isMissingTable(e, 'admin'):
+                # Allow default admin credentials as fallback
+                if username == 'admin' and password == 'admin123':
+                    return (0, 'admin')  # Return dummy admin record
+            print(f"Admin login error: {e}")
+            return None
+    if row is None or not passwords.hasher.verify(password, row[2]):
         return None
+    if passwords.needsRehash(row[2]):
+        _rehash('admin', 'adminID', row[0], row[2], password)
+    return (row[0], row[1])
 
 def getEmailByUserID(user_id):
-    cursor.execute("SELECT email FROM users WHERE userID = ?", (user_id,))
-    return cursor.fetchone()[0]
+    with getCursor() as cursor:
+        cursor.execute("SELECT email FROM users WHERE userID = ?", (user_id,))
+        return cursor.fetchone()[0]
 
 def checkHasAppointment(user_id, date, hour, minute):
-    cursor.execute("""
-        SELECT *
-        FROM timeslots ts
-        JOIN userSchedule us ON ts.scheduleID = us.scheduleID
-        WHERE ts.bookedByUserID = ?
-        AND us.scheduleDate = ?
-        AND ts.hour = ?
-        AND ts.minute = ?
-    """, (user_id, date, hour, minute))
+    with getCursor() as cursor:
+        cursor.execute("""
+            SELECT *
+            FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+            WHERE ts.bookedByUserID = ?
+            AND us.scheduleDate = ?
+            AND ts.hour = ?
+            AND ts.minute = ?
+        """, (user_id, date, hour, minute))
 
-    return cursor.fetchone() is not None
\ No newline at end of file
+        return cursor.fetchone() is not None
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""
+Performance instrumentation for DynaZOR.
+Records per-endpoint request latency and, through InstrumentedCursor, the latency,
+row counts and round trips of every db.py function. Everything is exposed in the
+Prometheus text format (see render) and sampled requests are logged as JSON lines.
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from flask import g, request
+
+ENABLED = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+# Share of requests written to the structured log; slow requests are always logged
+LOG_SAMPLE_RATE = float(os.getenv('METRICS_LOG_SAMPLE_RATE', 0.01))
+SLOW_REQUEST_MS = float(os.getenv('METRICS_SLOW_REQUEST_MS', 1000))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+logger = logging.getLogger('dynazor.metrics')
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Family:
+    """Metrics of one name keyed by their label values, created on first use"""
+
+    def __init__(self, name, kind, help, labels, factory):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def get(self, *labelValues):
+        child = self._children.get(labelValues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelValues, self._factory())
+        return child
+
+    def items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+requestLatency = Family('dynazor_request_duration_seconds', 'histogram',
+                        'Request latency per endpoint', ('endpoint', 'method', 'status'),
+                        lambda: Histogram(LATENCY_BUCKETS))
+requestQueries = Family('dynazor_request_db_round_trips', 'histogram',
+                        'Database round trips per request', ('endpoint',),
+                        lambda: Histogram(COUNT_BUCKETS))
+queryLatency = Family('dynazor_db_query_duration_seconds', 'histogram',
+                      'Latency of statements issued by each db function', ('query',),
+                      lambda: Histogram(LATENCY_BUCKETS))
+queryRows = Family('dynazor_db_query_rows_total', 'counter',
+                   'Rows fetched or written by each db function', ('query',), Counter)
+
+FAMILIES = [requestLatency, requestQueries, queryLatency, queryRows]
+
+_current = threading.local()
+
+
+def _queryName():
+    """Name of the function that issued the statement, skipping the instrumentation and backend helpers"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__', '').rsplit('.', 1)[-1] in ('metrics', 'backends'):
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    module = frame.f_globals.get('__name__', '').rsplit('.', 1)[-1]
+    name = frame.f_code.co_name
+    return name if module == 'db' else f"{module}.{name}"
+
+
+def _record(name, seconds, rows):
+    queryLatency.get(name).observe(seconds)
+    if rows:
+        queryRows.get(name).inc(rows)
+    stats = getattr(_current, 'request', None)
+    while stats is not None:
+        stats['roundTrips'] += 1
+        stats['dbSeconds'] += seconds
+        entry = stats['queries'].setdefault(name, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += rows
+        stats = stats['parent']
+
+
+def _recordRows(name, rows):
+    if not rows:
+        return
+    queryRows.get(name).inc(rows)
+    stats = getattr(_current, 'request', None)
+    while stats is not None:
+        if name in stats['queries']:
+            stats['queries'][name][2] += rows
+        stats = stats['parent']
+
+
+def beginRecording():
+    """Start collecting the queries the current thread issues, e.g. for one request; recordings nest"""
+    _current.request = {'roundTrips': 0, 'dbSeconds': 0.0, 'queries': {}, 'parent': getattr(_current, 'request', None)}
+
+
+def endRecording():
+    """Stop the innermost recording and return {'roundTrips', 'dbSeconds', 'queries': {name: [calls, seconds, rows]}}"""
+    stats = getattr(_current, 'request', None)
+    _current.request = stats['parent'] if stats else None
+    return stats
+
+
+class InstrumentedCursor:
+    """DB-API cursor proxy that times every execute and counts the rows that come back"""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_name', 'unknown')
+
+    def _timed(self, method, *args):
+        name = _queryName()
+        object.__setattr__(self, '_name', name)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            cursor = self._cursor
+            written = cursor.rowcount if cursor.description is None and cursor.rowcount > 0 else 0
+            _record(name, time.perf_counter() - start, written)
+
+    def execute(self, *args):
+        self._timed(self._cursor.execute, *args)
+        return self
+
+    def executemany(self, *args):
+        self._timed(self._cursor.executemany, *args)
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        _recordRows(self._name, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        _recordRows(self._name, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        _recordRows(self._name, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._cursor, attr, value)
+
+
+def wrapCursor(cursor):
+    return InstrumentedCursor(cursor) if ENABLED else cursor
+
+
+def instrument(app):
+    """Register the request hooks that time every endpoint of `app`"""
+    if not ENABLED:
+        return
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        beginRecording()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        stats = endRecording()
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        requestLatency.get(endpoint, request.method, str(response.status_code)).observe(seconds)
+        requestQueries.get(endpoint).observe(stats['roundTrips'] if stats else 0)
+
+        if seconds * 1000 >= SLOW_REQUEST_MS or random.random() < LOG_SAMPLE_RATE:
+            logger.info(json.dumps({
+                'event': 'request',
+                'endpoint': endpoint,
+                'method': request.method,
+                'status': response.status_code,
+                'ms': round(seconds * 1000, 2),
+                'dbMs': round(stats['dbSeconds'] * 1000, 2) if stats else 0,
+                'roundTrips': stats['roundTrips'] if stats else 0,
+                'queries': {
+                    name: {'calls': calls, 'ms': round(total * 1000, 2), 'rows': rows}
+                    for name, (calls, total, rows) in (stats['queries'].items() if stats else ())
+                },
+            }))
+        return response
+
+    @app.teardown_request
+    def discard_request_recording(exc):
+        # after_request is skipped when the request failed before producing a response
+        if g.pop('metrics_start', None) is not None:
+            endRecording()
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render(gauges=()):
+    """
+    All metrics in the Prometheus text exposition format.
+    gauges: extra (name, help, value) samples, e.g. pool and cache sizes.
+    """
+    lines = []
+    for family in FAMILIES:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for labelValues, metric in sorted(family.items()):
+            if family.kind == 'counter':
+                lines.append(f"{family.name}{_labels(family.labels, labelValues)} {metric.value}")
+                continue
+            counts, total, count = metric.snapshot()
+            cumulative = 0
+            for bound, bucketCount in zip(list(metric.buckets) + ['+Inf'], counts):
+                cumulative += bucketCount
+                lines.append(f"{family.name}_bucket{_labels(family.labels, labelValues, ('le', bound))} {cumulative}")
+            lines.append(f"{family.name}_sum{_labels(family.labels, labelValues)} {total}")
+            lines.append(f"{family.name}_count{_labels(family.labels, labelValues)} {count}")
+    for name, help, value in gauges:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
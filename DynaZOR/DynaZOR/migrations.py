@@ -0,0 +1,288 @@
+"""
+Versioned schema migrations for DynaZOR.
+Each migration runs once, in its own transaction, and is recorded in the
+schemaVersion table; db.migrate() applies whatever is still pending.
+"""
+
+from datetime import datetime
+
+
+def baseline(cursor, backend):
+    """Tables as createTables used to build them; a no-op on databases that already have them"""
+    cursor.execute(backend.createTable('admin', f"""
+        adminID {backend.identity},
+        username NVARCHAR(255) UNIQUE,
+        password NVARCHAR(255)
+    """))
+
+    cursor.execute(backend.createTable('users', f"""
+        userID {backend.identity},
+        name NVARCHAR(255),
+        username NVARCHAR(255) UNIQUE,
+        email NVARCHAR(255) UNIQUE,
+        password NVARCHAR(255)
+    """))
+
+    cursor.execute(backend.createTable('userSchedule', f"""
+        scheduleID {backend.identity},
+        userID INT REFERENCES users(userID),
+        scheduleDate DATE
+    """))
+
+    cursor.execute(backend.createTable('timeslots', f"""
+        timeSlotID {backend.identity},
+        scheduleID INT NOT NULL REFERENCES userSchedule(scheduleID),
+        hour INT CHECK (hour BETWEEN 0 AND 23),
+        minute INT CHECK (minute BETWEEN 0 AND 59),
+        available BIT DEFAULT 1,
+        bookedByUserID INT REFERENCES users(userID)
+    """))
+
+    cursor.execute(backend.createTable('priorityQueue', """
+        timeSlotID INT NOT NULL,
+        userID INT NOT NULL,
+        priorityNo INT NOT NULL,
+        PRIMARY KEY (timeSlotID, userID),
+        FOREIGN KEY (timeSlotID) REFERENCES timeslots(timeSlotID),
+        FOREIGN KEY (userID) REFERENCES users(userID)
+    """))
+
+    cursor.execute(backend.createTable('appointmentStats', """
+        ownerUserID INT,
+        bookerUserID INT,
+        hour INT,
+        minute INT,
+        bookingCount INT DEFAULT 0,
+        PRIMARY KEY (ownerUserID, bookerUserID, hour, minute),
+        FOREIGN KEY (ownerUserID) REFERENCES users(userID),
+        FOREIGN KEY (bookerUserID) REFERENCES users(userID)
+    """))
+
+    cursor.execute(backend.createTable('notificationOutbox', f"""
+        notificationID {backend.identity},
+        kind NVARCHAR(20) NOT NULL,
+        targetEmail NVARCHAR(255) NOT NULL,
+        subject NVARCHAR(255),
+        message NVARCHAR(2000),
+        attempts INT NOT NULL DEFAULT 0,
+        nextAttemptAt DATETIME NOT NULL,
+        lastError NVARCHAR(1000),
+        createdAt DATETIME NOT NULL,
+        sentAt DATETIME,
+        failedAt DATETIME
+    """))
+
+    # Create default admin user
+    cursor.execute("""
+        INSERT INTO admin(username, password)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM admin WHERE username = ?)
+    """, ('admin', 'admin123', 'admin'))
+
+
+def _checkUnique(cursor, table, columns):
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM (
+            SELECT {', '.join(columns)} FROM {table}
+            GROUP BY {', '.join(columns)} HAVING COUNT(*) > 1
+        ) d
+    """)
+    duplicates = cursor.fetchone()[0]
+    if duplicates:
+        raise RuntimeError(
+            f"{table} has {duplicates} duplicate ({', '.join(columns)}) groups; "
+            "merge them before applying the unique index"
+        )
+
+
+def lookupIndexes(cursor, backend):
+    """Indexes behind getSchedule, getTimeslotID, getUserBookings and the waitlist reads"""
+    _checkUnique(cursor, 'userSchedule', ('userID', 'scheduleDate'))
+    _checkUnique(cursor, 'timeslots', ('scheduleID', 'hour', 'minute'))
+
+    # One schedule day per user and date; scheduleID comes along as the clustered key
+    cursor.execute(backend.createIndex(
+        'UX_userSchedule_user_date', 'userSchedule', ('userID', 'scheduleDate'), unique=True))
+    # One slot per day and time, covering the slot state read by every booking step
+    cursor.execute(backend.createIndex(
+        'UX_timeslots_schedule_time', 'timeslots', ('scheduleID', 'hour', 'minute'), unique=True,
+        include=('available', 'bookedByUserID')))
+    cursor.execute(backend.createIndex(
+        'IX_timeslots_bookedBy', 'timeslots', ('bookedByUserID',), where="bookedByUserID IS NOT NULL"))
+    # The primary key serves per-slot lookups; this one serves per-user lookups
+    cursor.execute(backend.createIndex(
+        'IX_priorityQueue_user', 'priorityQueue', ('userID', 'timeSlotID')))
+    cursor.execute(backend.createIndex(
+        'IX_notificationOutbox_due', 'notificationOutbox', ('nextAttemptAt',),
+        where="sentAt IS NULL AND failedAt IS NULL"))
+
+
+def backupSnapshots(cursor, backend):
+    """Completed backups; incremental backups start from the latest one"""
+    cursor.execute(backend.createTable('backupSnapshots', f"""
+        snapshotID {backend.identity},
+        kind NVARCHAR(20) NOT NULL,
+        takenOn DATE NOT NULL,
+        maxScheduleID INT NOT NULL,
+        rowCount INT NOT NULL,
+        createdAt DATETIME NOT NULL
+    """))
+
+
+def analyticsRollups(cursor, backend):
+    """Per-owner totals behind the Analytics endpoint, seeded from appointmentStats"""
+    cursor.execute(backend.createTable('ownerStats', """
+        ownerUserID INT PRIMARY KEY REFERENCES users(userID),
+        bookingCount INT NOT NULL DEFAULT 0
+    """))
+    cursor.execute(backend.createTable('ownerSlotStats', """
+        ownerUserID INT REFERENCES users(userID),
+        hour INT,
+        minute INT,
+        bookingCount INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (ownerUserID, hour, minute)
+    """))
+    cursor.execute(backend.createTable('ownerBookerStats', """
+        ownerUserID INT REFERENCES users(userID),
+        bookerUserID INT REFERENCES users(userID),
+        bookingCount INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (ownerUserID, bookerUserID)
+    """))
+    # An owner has a handful of slots but may have many bookers; rank those from an index
+    cursor.execute(backend.createIndex(
+        'IX_ownerBookerStats_rank', 'ownerBookerStats', ('ownerUserID', 'bookingCount DESC')))
+
+    cursor.execute("""
+        INSERT INTO ownerStats (ownerUserID, bookingCount)
+        SELECT ownerUserID, SUM(bookingCount) FROM appointmentStats GROUP BY ownerUserID
+    """)
+    cursor.execute("""
+        INSERT INTO ownerSlotStats (ownerUserID, hour, minute, bookingCount)
+        SELECT ownerUserID, hour, minute, SUM(bookingCount) FROM appointmentStats GROUP BY ownerUserID, hour, minute
+    """)
+    cursor.execute("""
+        INSERT INTO ownerBookerStats (ownerUserID, bookerUserID, bookingCount)
+        SELECT ownerUserID, bookerUserID, SUM(bookingCount) FROM appointmentStats GROUP BY ownerUserID, bookerUserID
+    """)
+
+
+def bookingEvents(cursor, backend):
+    """Append-only booking event log and the day/week buckets aggregated from it"""
+    # No foreign keys: the log outlives the users and slots it mentions
+    cursor.execute(backend.createTable('bookingEvents', f"""
+        eventID {backend.identity},
+        occurredAt DATETIME NOT NULL,
+        kind NVARCHAR(20) NOT NULL,
+        ownerUserID INT NOT NULL,
+        bookerUserID INT NOT NULL,
+        appointmentDate DATE NOT NULL,
+        hour INT NOT NULL,
+        minute INT NOT NULL
+    """))
+    cursor.execute(backend.createTable('bookingEventBuckets', """
+        ownerUserID INT NOT NULL,
+        grain NVARCHAR(4) NOT NULL,
+        bucketStart DATE NOT NULL,
+        kind NVARCHAR(20) NOT NULL,
+        hour INT NOT NULL,
+        minute INT NOT NULL,
+        eventCount INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (ownerUserID, grain, bucketStart, kind, hour, minute)
+    """))
+    # How far the aggregation job has read the event log
+    cursor.execute(backend.createTable('aggregationWatermarks', """
+        name NVARCHAR(50) PRIMARY KEY,
+        lastEventID INT NOT NULL,
+        lastOccurredAt DATETIME,
+        updatedAt DATETIME
+    """))
+    cursor.execute("""
+        INSERT INTO aggregationWatermarks(name, lastEventID)
+        SELECT 'bookingEvents', 0 WHERE NOT EXISTS (SELECT 1 FROM aggregationWatermarks WHERE name = 'bookingEvents')
+    """)
+
+
+def slotTemplates(cursor, backend):
+    """Working hours per user; users without a row get db.DEFAULT_TIMESLOTS"""
+    cursor.execute(backend.createTable('slotTemplates', """
+        userID INT PRIMARY KEY REFERENCES users(userID),
+        startMinute INT NOT NULL,
+        endMinute INT NOT NULL,
+        slotMinutes INT NOT NULL,
+        breaks NVARCHAR(400) NOT NULL DEFAULT ''
+    """))
+
+
+def rowVersions(cursor, backend):
+    """
+    Versions behind the changes-since sync. A slot's version also moves when its waitlist
+    changes, and a day's when slots are added or removed, since deleted rows leave no version.
+    """
+    backend.addRowVersion(cursor, 'userSchedule', 'scheduleID')
+    backend.addRowVersion(cursor, 'timeslots', 'timeSlotID')
+    backend.touchOnChange(cursor, 'TR_priorityQueue_touch_slot', 'priorityQueue', ('INSERT', 'DELETE'),
+                          'timeslots', 'timeSlotID', 'available')
+    backend.touchOnChange(cursor, 'TR_timeslots_touch_day', 'timeslots', ('INSERT', 'DELETE'),
+                          'userSchedule', 'scheduleID', 'userID')
+
+
+def etagVersions(cursor, backend):
+    """Versions behind the ETags of the profile and analytics endpoints"""
+    backend.addRowVersion(cursor, 'users', 'userID')
+    backend.addRowVersion(cursor, 'ownerStats', 'ownerUserID')
+
+
+# (version, name, apply(cursor, backend)); append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, 'baseline', baseline),
+    (2, 'lookup indexes', lookupIndexes),
+    (3, 'backup snapshots', backupSnapshots),
+    (4, 'analytics rollups', analyticsRollups),
+    (5, 'booking events', bookingEvents),
+    (6, 'slot templates', slotTemplates),
+    (7, 'row versions', rowVersions),
+    (8, 'etag versions', etagVersions),
+]
+
+
+def createVersionTable(cursor, backend):
+    cursor.execute(backend.createTable('schemaVersion', """
+        version INT PRIMARY KEY,
+        name NVARCHAR(255),
+        appliedAt DATETIME
+    """))
+    cursor.connection.commit()
+
+
+def appliedVersions(cursor):
+    cursor.execute("SELECT version FROM schemaVersion")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply(cursor, backend, target=None, log=print):
+    """Apply pending migrations up to target (default: all) and return the versions applied"""
+    createVersionTable(cursor, backend)
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in appliedVersions(cursor):
+            continue
+
+        backend.begin(cursor)
+        try:
+            # Re-check under the lock so concurrent workers apply each migration once
+            cursor.execute(f"SELECT version FROM schemaVersion {backend.updateLock} WHERE version = ?", (version,))
+            if cursor.fetchone():
+                cursor.connection.rollback()
+                continue
+            migration(cursor, backend)
+            cursor.execute("INSERT INTO schemaVersion(version, name, appliedAt) VALUES (?, ?, ?)",
+                           (version, name, datetime.utcnow()))
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
+        applied.append(version)
+        if log:
+            log(f"Applied migration {version}: {name}")
+    return applied
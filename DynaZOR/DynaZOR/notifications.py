@@ -0,0 +1,139 @@
+"""
+Notification delivery for DynaZOR.
+Requests only enqueue notifications in the outbox table (see db.enqueueNotifications);
+OutboxWorker delivers them in the background through a pluggable transport.
+"""
+
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from . import db
+
+
+class SNSTransport:
+    """Deliver through AWS SNS: email publishes filtered by target_email, and subscriptions"""
+    BATCH_LIMIT = 10  # entries SNS accepts per publish_batch call
+
+    def __init__(self, topicArn=None, region=None):
+        import boto3
+        self.topicArn = topicArn or os.getenv('SNS_TOPIC_ARN')
+        self.client = boto3.client("sns", region_name=region or os.getenv("AWS_REGION"))
+
+    def send(self, notifications):
+        """Deliver a batch; returns {notificationID: error} for the ones that failed"""
+        errors = {}
+        publishes = [n for n in notifications if n['kind'] == 'publish']
+        for start in range(0, len(publishes), self.BATCH_LIMIT):
+            chunk = publishes[start:start + self.BATCH_LIMIT]
+            try:
+                response = self.client.publish_batch(
+                    TopicArn=self.topicArn,
+                    PublishBatchRequestEntries=[{
+                        'Id': str(n['id']),
+                        'Message': n['message'],
+                        'Subject': n['subject'],
+                        'MessageAttributes': {
+                            'target_email': {
+                                'DataType': 'String',
+                                'StringValue': n['email']
+                            }
+                        }
+                    } for n in chunk]
+                )
+                for failed in response.get('Failed', []):
+                    errors[int(failed['Id'])] = failed.get('Message') or failed.get('Code')
+            except Exception as e:
+                for n in chunk:
+                    errors[n['id']] = str(e)
+
+        for n in notifications:
+            if n['kind'] != 'subscribe':
+                continue
+            try:
+                self.client.subscribe(TopicArn=self.topicArn, Protocol="email", Endpoint=n['email'], Attributes={'FilterPolicy': f'{{"target_email": ["{n["email"]}"]}}'})
+            except Exception as e:
+                errors[n['id']] = str(e)
+        return errors
+
+
+class LocalTransport:
+    """Keep delivered notifications in memory; stands in for SNS in tests and benchmarks"""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, notifications):
+        with self._lock:
+            self.sent.extend(notifications)
+        return {}
+
+
+TRANSPORTS = {
+    'sns': SNSTransport,
+    'local': LocalTransport,
+}
+
+
+def getTransport(name=None):
+    """Build the transport named by `name` or the NOTIFICATION_TRANSPORT environment variable"""
+    name = (name or os.getenv('NOTIFICATION_TRANSPORT', 'sns')).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown NOTIFICATION_TRANSPORT '{name}'. Use one of: {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[name]()
+
+
+class OutboxWorker:
+    """Claim due outbox rows, deliver them in parallel batches and retry failures with backoff"""
+
+    def __init__(self, transport, batchSize=10, workers=4, maxAttempts=8, baseDelay=5, maxDelay=3600, lease=120):
+        self.transport = transport
+        self.batchSize = batchSize
+        self.workers = workers
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay    # seconds before the first retry, doubled on every further attempt
+        self.maxDelay = maxDelay
+        self.lease = lease            # seconds a claimed row stays hidden from other workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbox")
+
+    def runOnce(self):
+        """Deliver everything that is due right now; returns (sent, failed) counts"""
+        sent = failed = 0
+        while True:
+            claimed = db.claimNotifications(self.batchSize * self.workers, self.lease)
+            if not claimed:
+                return sent, failed
+
+            batches = [claimed[i:i + self.batchSize] for i in range(0, len(claimed), self.batchSize)]
+            errors = {}
+            for batch, result in zip(batches, self._executor.map(self._send, batches)):
+                errors.update(result)
+
+            delivered = [n['id'] for n in claimed if n['id'] not in errors]
+            db.markNotificationsSent(delivered)
+            for n in claimed:
+                if n['id'] in errors:
+                    db.markNotificationFailed(n['id'], errors[n['id']], self._retryAt(n['attempts'] + 1))
+            sent += len(delivered)
+            failed += len(errors)
+
+            if len(claimed) < self.batchSize * self.workers:
+                return sent, failed
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _send(self, batch):
+        try:
+            return self.transport.send(batch)
+        except Exception as e:
+            return {n['id']: str(e) for n in batch}
+
+    def _retryAt(self, attempts):
+        """When to try again after `attempts` failures, or None to give up"""
+        if attempts >= self.maxAttempts:
+            return None
+        delay = min(self.baseDelay * 2 ** (attempts - 1), self.maxDelay)
+        return datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
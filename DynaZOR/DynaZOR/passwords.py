@@ -0,0 +1,111 @@
+"""
+Password hashing for DynaZOR.
+Hashes are stored as pbkdf2_sha256$<iterations>$<salt>$<hash>. Rows written
+before hashing was introduced still hold the plaintext; they verify as before
+and are rehashed by the login that proves them, as are hashes made with an
+older iteration count. Verification runs on a small bounded pool so a burst of
+logins queues there instead of tying up every request thread.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+ALGORITHM = 'pbkdf2_sha256'
+ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 260000))
+SALT_BYTES = 16
+# Hashing threads, logins allowed to wait for one, and how long they wait
+WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', WORKERS * 8))
+TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+
+class HasherBusy(Exception):
+    """Raised when too many password checks are already queued, or one waits too long"""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+def hashPassword(password, iterations=None):
+    iterations = iterations or ITERATIONS
+    salt = secrets.token_bytes(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(_derive(password, salt, iterations))}"
+
+
+def isHashed(stored):
+    return stored is not None and stored.startswith(ALGORITHM + '$')
+
+
+def verifyPassword(password, stored):
+    """Check a password against a stored hash, or against a legacy plaintext value"""
+    if stored is None or password is None:
+        return False
+    if not isHashed(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    try:
+        _, iterations, salt, expected = stored.split('$')
+        derived = _derive(password, _unb64(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(derived, _unb64(expected))
+
+
+def needsRehash(stored, iterations=None):
+    """Whether a stored value is plaintext or hashed with a different iteration count"""
+    if not isHashed(stored):
+        return True
+    parts = stored.split('$')
+    return len(parts) != 4 or parts[1] != str(iterations or ITERATIONS)
+
+
+class Hasher:
+    """Bounded thread pool for password work; pbkdf2_hmac releases the GIL while it runs"""
+
+    def __init__(self, workers=WORKERS, maxPending=MAX_PENDING, timeout=TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(maxPending)
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for it; HasherBusy if the queue is full or too slow"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy("Too many password checks in progress, try again shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued work is dropped; a hash already running finishes and frees its slot
+            future.cancel()
+            raise HasherBusy("Password check took too long, try again shortly")
+
+    def verify(self, password, stored):
+        return self.run(verifyPassword, password, stored)
+
+    def hash(self, password, iterations=None):
+        return self.run(hashPassword, password, iterations)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+hasher = Hasher()
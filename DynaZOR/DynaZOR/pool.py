@@ -0,0 +1,151 @@
+"""
+Thread-safe database connection pool for DynaZOR.
+Keeps a bounded set of open connections and hands them out per request.
+"""
+
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out in time"""
+
+
+class PoolClosed(Exception):
+    """Raised when a connection is requested from a pool after closeAll()"""
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections with health checks and reconnect-on-failure"""
+
+    def __init__(self, connect, minSize=1, maxSize=10, timeout=30, pingQuery="SELECT 1", pingAfter=30, maxIdle=300):
+        if minSize < 0 or maxSize < 1 or minSize > maxSize:
+            raise ValueError("Pool sizes must satisfy 0 <= minSize <= maxSize and maxSize >= 1")
+        self.connect = connect
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.timeout = timeout
+        self.pingQuery = pingQuery
+        self.pingAfter = pingAfter      # seconds idle before a connection is pinged on checkout
+        self.maxIdle = maxIdle          # seconds idle before a connection above minSize is closed
+        self._idle = []                 # (connection, lastUsed) pairs, most recently used last
+        self._size = 0                  # open connections, idle or checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def fill(self):
+        """Open connections until minSize are available"""
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolClosed("The connection pool has been closed")
+                if self._size >= self.minSize:
+                    return
+                self._size += 1
+            try:
+                conn = self.connect()
+            except Exception:
+                self._forget()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """Check out a healthy connection, opening a new one if below maxSize"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosed("The connection pool has been closed")
+                if self._idle:
+                    # LIFO keeps a small set of connections warm
+                    conn, lastUsed = self._idle.pop()
+                    break
+                if self._size < self.maxSize:
+                    self._size += 1
+                    conn, lastUsed = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+        if conn is not None and time.monotonic() - lastUsed > self.pingAfter and not self._ping(conn):
+            self._close(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self.connect()
+            except Exception:
+                self._forget()
+                raise
+        return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection; broken or unusable connections are closed and replaced later"""
+        if not broken:
+            try:
+                # Never hand uncommitted state to the next request
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            self._close(conn)
+            self._forget()
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            if self._closed:
+                # Closed while checked out: the connection goes away instead of back to _idle
+                self._size -= 1
+                expired.append(conn)
+            else:
+                self._idle.append((conn, now))
+            # Trim connections that sat idle too long, but keep minSize warm
+            while self._size > self.minSize and self._idle and now - self._idle[0][1] > self.maxIdle:
+                expired.append(self._idle.pop(0)[0])
+                self._size -= 1
+            self._cond.notify()
+        for old in expired:
+            self._close(old)
+
+    def closeAll(self):
+        """Close every idle connection and refuse further checkouts; checked-out ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'inUse': self._size - len(self._idle), 'closed': self._closed}
+
+    def _ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.pingQuery)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,91 @@
+"""
+HTTP response handling shared by every DynaZOR endpoint.
+GETs decorated with etag() carry a strong ETag built from a version of their data
+and answer If-None-Match with 304 before reading that data; instrument() adds the
+ETag to the response and compresses large JSON and text bodies with brotli (when
+the brotli package is installed) or gzip, whichever the client accepts.
+"""
+
+import gzip
+import os
+from functools import wraps
+from flask import Response, g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as they are; compression would barely pay for itself
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+# Quality 11 is meant for static assets; 5 compresses better than gzip at a similar cost
+BROTLI_QUALITY = 5
+
+
+def etag(version):
+    """
+    Resource method decorator for a GET whose body is determined by version(**kwargs), None when
+    unknown. List it first in method_decorators so it runs after the authentication checks.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            # Read before the body, so a write in between leaves the tag older than the body, never newer
+            current = version(**kwargs)
+            if current is None:
+                return method(*args, **kwargs)
+            g.etag = f"{request.endpoint}.{current}"
+            # A tag sent back with its compression suffix still names the same data
+            for candidate in request.if_none_match.as_set(include_weak=True):
+                if candidate.split('+', 1)[0] == g.etag:
+                    g.etag = candidate
+                    return Response(status=304)
+            return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _encoding():
+    """The best encoding the client accepts, or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0 and accepted.quality('br') >= accepted.quality('gzip'):
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def _compressible(response):
+    return (response.status_code == 200 and not response.direct_passthrough and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and (response.mimetype == 'application/json' or response.mimetype.startswith('text/')))
+
+
+def instrument(app):
+    """Register the hook that tags and compresses the responses of `app`"""
+
+    @app.after_request
+    def finish_response(response):
+        tag = g.pop('etag', None)
+        if tag is not None and response.status_code in (200, 304):
+            response.set_etag(tag)
+            # Authenticated data: browsers may keep it, but must revalidate every time
+            response.headers['Cache-Control'] = 'private, no-cache'
+
+        if not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = encoding
+        if tag is not None:
+            # Each encoding of the data is its own representation and gets its own strong tag
+            response.set_etag(f"{tag}+{encoding}")
+        return response
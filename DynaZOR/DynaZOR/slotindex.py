@@ -0,0 +1,101 @@
+"""
+In-process index of hot schedule days for DynaZOR.
+Each (userID, 'YYYY-MM-DD') day is held as packed arrays in slot order: timeslot
+IDs, an availability bitmask, the user every slot is booked by (0 for none) and
+waitlist counts. Days are loaded lazily through a loader and dropped by every
+write, so the database stays authoritative; a day that was invalidated while it
+was being loaded is served once but not kept.
+"""
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+class SlotDay:
+    """One user's schedule day as packed per-slot arrays"""
+    __slots__ = ('date', 'times', 'slotIDs', 'available', 'bookedBy', 'waitlist', 'bookerNames')
+
+    def __init__(self, scheduleDate, rows):
+        """rows: [(timeSlotID, hour, minute, available, bookedByUserID, waitlistCount, bookerUsername)] in slot order"""
+        self.date = scheduleDate
+        self.times = tuple((row[1], row[2]) for row in rows)
+        self.slotIDs = array('q', (row[0] for row in rows))
+        self.available = sum(1 << i for i, row in enumerate(rows) if row[3])
+        self.bookedBy = array('q', (row[4] or 0 for row in rows))
+        self.waitlist = array('l', (row[5] for row in rows))
+        self.bookerNames = tuple(row[6] for row in rows)
+
+    def position(self, hour, minute):
+        """Index of the (hour, minute) slot, or -1 when the day has no such slot"""
+        try:
+            return self.times.index((hour, minute))
+        except ValueError:
+            return -1
+
+    def isAvailable(self, i):
+        return (self.available >> i) & 1
+
+    def render(self):
+        """The day as getSchedule returns it"""
+        return [{'date': self.date, 'timeslots': [
+            {'hour': hour, 'minute': minute, 'available': self.isAvailable(i), 'bookedByUserID': self.bookedBy[i] or None,
+             'waitlist_count': self.waitlist[i], 'bookerUsername': self.bookerNames[i]}
+            for i, (hour, minute) in enumerate(self.times)
+        ]}]
+
+
+class SlotIndex:
+    """Thread-safe LRU of SlotDay entries that also expire after ttl seconds"""
+
+    def __init__(self, loader, maxDays=50000, ttl=30):
+        self.loader = loader  # loader(userID, 'YYYY-MM-DD') -> SlotDay rows, empty when the day does not exist
+        self.maxDays = maxDays
+        self.ttl = ttl
+        self._days = OrderedDict()  # key -> (expiresAt, SlotDay), least recently used first
+        self._loading = {}  # key -> token of the load in flight; invalidate() drops it
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def day(self, userID, scheduleDate):
+        """The SlotDay of a user's day, loading it on a miss; None when the day does not exist"""
+        key = (userID, str(scheduleDate))
+        with self._lock:
+            entry = self._days.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._days.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            token = object()
+            self._loading[key] = token
+
+        rows = self.loader(userID, key[1])
+        day = SlotDay(key[1], rows) if rows else None
+        with self._lock:
+            if self._loading.get(key) is token:
+                del self._loading[key]
+                # Missing days are not kept so a freshly created day shows up at once
+                if day is not None:
+                    self._days[key] = (time.monotonic() + self.ttl, day)
+                    self._days.move_to_end(key)
+                    while len(self._days) > self.maxDays:
+                        self._days.popitem(last=False)
+        return day
+
+    def invalidate(self, userID, scheduleDate):
+        key = (userID, str(scheduleDate))
+        with self._lock:
+            self._days.pop(key, None)
+            self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+            self._loading.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._days), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,80 @@
+"""
+Common-availability solver for meetings between an owner and several participants.
+Everyone's free/busy bitmaps (db.getFreeBusy) are ANDed day by day and narrowed by
+a mask built from the preferences; the slots left over are ranked by how often the
+owner, and above all these participants, booked them before (appointmentStats).
+The winner can then be booked through db.bookSlots, which re-checks it under lock.
+"""
+
+import heapq
+from datetime import timedelta
+from . import db
+
+# One past booking by a participant weighs as much as this many by anyone else
+PARTICIPANT_WEIGHT = 3
+# Candidates tried in turn when the best one is taken between solving and booking
+BOOK_ATTEMPTS = 3
+
+
+def slotMask(earliest=None, latest=None):
+    """Bitmap of the slot starts between earliest and latest, both (hour, minute), in db.getFreeBusy's layout"""
+    first = earliest[0] * 60 + earliest[1] if earliest else 0
+    last = latest[0] * 60 + latest[1] if latest else 24 * 60 - 1
+    return (1 << last + 1) - (1 << first) if first <= last else 0
+
+
+def commonAvailability(userIDs, startDate, days, mask, weekdays=None):
+    """
+    [(date, bitmap)] for the days on which every user is free in at least one slot of mask.
+    Bitmaps are keyed by start minute, so a common bit is a start time all their templates share.
+    """
+    freeBusy = db.getFreeBusy(userIDs, startDate, days)
+    common = []
+    for offset in range(days):
+        day = startDate + timedelta(days=offset)
+        if weekdays is not None and day.weekday() not in weekdays:
+            continue
+        bitmap = mask
+        for userID in userIDs:
+            # A day without a schedule has no free slots
+            bitmap &= freeBusy[userID][offset] or 0
+            if not bitmap:
+                break
+        if bitmap:
+            common.append((day, bitmap))
+    return common
+
+
+def solve(ownerID, participantIDs, startDate, days, earliest=None, latest=None, weekdays=None, limit=5):
+    """
+    The best slots on the owner's schedule that all participants are free for,
+    best first: [{'date', 'hour', 'minute', 'score'}]. Ties go to the earliest slot.
+    """
+    userIDs = list(dict.fromkeys([ownerID, *participantIDs]))
+    common = commonAvailability(userIDs, startDate, days, slotMask(earliest, latest), weekdays)
+    if not common:
+        return []
+
+    preferences = db.getSlotPreferences(ownerID, userIDs[1:])
+    candidates = []
+    for day, bitmap in common:
+        for slot in db.freeSlots(bitmap):
+            score = preferences['owner'].get(slot, 0) + PARTICIPANT_WEIGHT * preferences['bookers'].get(slot, 0)
+            candidates.append((-score, day, slot))
+
+    return [
+        {'date': str(day), 'hour': slot[0], 'minute': slot[1], 'score': -score}
+        for score, day, slot in heapq.nsmallest(limit, candidates)
+    ]
+
+
+def book(ownerID, bookerID, candidates):
+    """
+    Book the best candidate that is still free for bookerID; returns it, or None.
+    A candidate taken since solving is skipped rather than waitlisted.
+    """
+    for candidate in candidates[:BOOK_ATTEMPTS]:
+        selection = (candidate['date'], candidate['hour'], candidate['minute'])
+        if db.bookSlots(ownerID, bookerID, [selection], waitlist=False)[0] == 'booked':
+            return candidate
+    return None
@@ -6,28 +6,62 @@ import os
 from os import environ
 from DynaZOR import app
 from DynaZOR import db
+from DynaZOR.notifications import OutboxWorker, getTransport
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 import atexit
 
 def create_daily_schedules():
-    """Create a new schedule for all users for today"""
+    """Create schedules for all users from today up to the configured horizon"""
+    db.openRequestScope()
     try:
         today = datetime.now().date()
-        user_ids = db.getAllUsers()
-        for user_id in user_ids:
-            # Check if user already has a schedule for today
-            db.cursor.execute("""
-                SELECT scheduleID FROM userSchedule
-                WHERE userID=? AND scheduleDate=?
-            """, (user_id, today))
-            existing = db.cursor.fetchone()
-            
-            if not existing:
-                db.createSchedule(user_id, today)
-                print(f"Created schedule for user {user_id} on {today}")
+        created = db.createScheduleHorizon(
+            today,
+            int(os.environ.get("SCHEDULE_HORIZON_DAYS", 7)),
+            chunkSize=int(os.environ.get("SCHEDULE_BATCH_SIZE", 500)),
+            progress=lambda day, done, total: print(f"Creating schedules for {day}: {done}/{total} users"),
+        )
+        print(f"Created {created} schedule days starting {today}")
     except Exception as e:
         print(f"Error creating daily schedules: {e}")
+    finally:
+        db.closeRequestScope()
+
+outbox_worker = OutboxWorker(
+    getTransport(),
+    batchSize=int(os.environ.get("NOTIFICATION_BATCH_SIZE", 10)),
+    workers=int(os.environ.get("NOTIFICATION_WORKERS", 4)),
+    maxAttempts=int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 8)),
+)
+
+def send_notifications():
+    """Deliver queued notifications, retrying failed ones with backoff"""
+    db.openRequestScope()
+    try:
+        sent, failed = outbox_worker.runOnce()
+        if sent or failed:
+            print(f"Notifications sent: {sent}, failed: {failed}")
+    except Exception as e:
+        print(f"Error sending notifications: {e}")
+    finally:
+        db.closeRequestScope()
+
+def aggregate_booking_events():
+    """Fold newly logged booking events into the windowed analytics buckets"""
+    db.openRequestScope()
+    try:
+        aggregated = db.aggregateBookingEvents(batchSize=int(os.environ.get("ANALYTICS_AGGREGATE_BATCH_SIZE", 5000)))
+        if aggregated:
+            print(f"Booking events aggregated: {aggregated}")
+    except Exception as e:
+        print(f"Error aggregating booking events: {e}")
+    finally:
+        db.closeRequestScope()
+
+# Open the minimum number of pooled DB connections up front
+db.pool.fill()
+db.migrate()
 
 # Set up scheduler
 scheduler = BackgroundScheduler()
@@ -36,12 +70,27 @@ scheduler.add_job(
     trigger="cron",
     hour=0,
     minute=0,
-    id="create_daily_schedules"
+    id="create_daily_schedules",
+    next_run_time=datetime.now()  # also fill the horizon right after startup
+)
+scheduler.add_job(
+    func=send_notifications,
+    trigger="interval",
+    seconds=int(os.environ.get("NOTIFICATION_POLL_SECONDS", 5)),
+    id="send_notifications",
+    max_instances=1
+)
+scheduler.add_job(
+    func=aggregate_booking_events,
+    trigger="interval",
+    seconds=int(os.environ.get("ANALYTICS_AGGREGATE_SECONDS", 60)),
+    id="aggregate_booking_events",
+    max_instances=1
 )
 scheduler.start()
 
-# Shut down the scheduler when exiting the app
-atexit.register(lambda: scheduler.shutdown())
+# Shut down the scheduler and the notification senders when exiting the app
+atexit.register(lambda: (scheduler.shutdown(), outbox_worker.shutdown()))
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5555))
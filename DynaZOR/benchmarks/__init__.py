@@ -0,0 +1 @@
+"""Benchmarks for DynaZOR; run each module with `python -m benchmarks.<name>` from this directory."""
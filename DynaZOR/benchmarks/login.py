@@ -0,0 +1,85 @@
+"""
+Login throughput at each password hashing cost.
+For every iteration count, seeds users with legacy plaintext passwords into a
+throwaway SQLite database and logs each of them in twice through the HTTP
+endpoint: the first login verifies the plaintext and rehashes it, the second
+verifies the fresh hash, which is what steady-state logins cost.
+
+    python -m benchmarks.login --iterations 100000,260000,600000 --concurrency 8
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before DynaZOR.db picks its backend
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ.setdefault('SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='dynazor-bench-'), 'login.sqlite3'))
+os.environ.setdefault('NOTIFICATION_TRANSPORT', 'local')
+os.environ.setdefault('METRICS_LOG_SAMPLE_RATE', '0')
+os.environ.setdefault('METRICS_SLOW_REQUEST_MS', 'inf')
+
+from DynaZOR import app, db, passwords
+from benchmarks.scheduling import percentile
+
+
+def seed(users):
+    db.createTables()
+    with db.getCursor() as cursor:
+        db.backend.executemany(cursor, "INSERT INTO users(name, username, email, password) VALUES (?, ?, ?, ?)",
+                               [(f"User {i}", f"user{i}", f"user{i}@example.com", f"secret{i}") for i in range(users)])
+        cursor.connection.commit()
+
+
+def loginAll(users, concurrency):
+    """Log every seeded user in once; returns (logins/s, p50 ms, p99 ms, non-200 responses)"""
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def worker(index):
+        client = app.test_client()
+        mine, failed = [], 0
+        for i in range(index, users, concurrency):
+            start = time.perf_counter()
+            response = client.post('/api/auth/login', json={'email': f"user{i}@example.com", 'password': f"secret{i}"})
+            mine.append(time.perf_counter() - start)
+            failed += response.status_code != 200
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (round(len(latencies) / elapsed, 1), round(percentile(latencies, 0.50) * 1000, 2),
+            round(percentile(latencies, 0.99) * 1000, 2), sum(failures))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', default=f"10000,100000,{passwords.ITERATIONS},600000",
+                        help='comma-separated PBKDF2 iteration counts to compare')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help='request threads')
+    parser.add_argument('--workers', type=int, default=passwords.WORKERS, help='password hashing threads')
+    args = parser.parse_args()
+
+    passwords.hasher = passwords.Hasher(workers=args.workers)
+    print(f"{args.users} users, {args.concurrency} request threads, {args.workers} hashing threads ({db.backend.path})")
+    print(f"\n{'iterations':>10}  {'phase':<18}{'logins/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for iterations in sorted(int(value) for value in args.iterations.split(',')):
+        passwords.ITERATIONS = iterations
+        seed(args.users)
+        for phase in ('rehash plaintext', 'verify hash'):
+            rate, p50, p99, failed = loginAll(args.users, args.concurrency)
+            print(f"{iterations:>10}  {phase:<18}{rate:>10}{p50:>10}{p99:>10}{failed:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Query plans and timings of the hot lookup paths before and after the index migration.
+Seeds a throwaway SQLite database with the baseline schema only, measures, applies the
+remaining migrations and measures again.
+
+    python -m benchmarks.query_plans --users 2000 --days 30
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Must be set before DynaZOR.db picks its backend
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ.setdefault('SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='dynazor-bench-'), 'plans.sqlite3'))
+
+from datetime import date, timedelta
+from DynaZOR import db
+
+
+def hotQueries(userID, day, timeslotID):
+    """(name, sql, params) for the lookups every schedule read and booking step runs"""
+    return [
+        ('getScheduleID', "SELECT scheduleID FROM userSchedule WHERE userID=? AND scheduleDate=?", (userID, day)),
+        ('getTimeslotID', """
+            SELECT ts.timeSlotID FROM timeslots ts
+            JOIN userSchedule us ON ts.scheduleID = us.scheduleID
+            WHERE us.userID = ? AND us.scheduleDate = ? AND ts.hour = ? AND ts.minute = ?
+        """, (userID, day, 11, 0)),
+        ('getScheduleRange', """
+            SELECT us.scheduleDate, ts.hour, ts.minute, ts.available, ts.bookedByUserID,
+            (SELECT COUNT(*) FROM priorityQueue pq WHERE pq.timeslotID = ts.timeslotID),
+            u.username, ts.timeSlotID
+            FROM userSchedule us
+            JOIN timeslots ts ON ts.scheduleID = us.scheduleID
+            LEFT JOIN users u ON ts.bookedByUserID = u.userID
+            WHERE us.userID = ? AND us.scheduleDate BETWEEN ? AND ?
+            ORDER BY us.scheduleDate, ts.hour, ts.minute
+        """, (userID, day, day + timedelta(days=6))),
+        ('getUserBookings', """
+            SELECT ts.timeSlotID FROM timeslots ts WHERE ts.bookedByUserID = ?
+        """, (userID,)),
+        ('waitlistByUser', "SELECT timeSlotID FROM priorityQueue WHERE userID = ?", (userID,)),
+        ('waitlistCount', "SELECT COUNT(*) FROM priorityQueue WHERE timeSlotID = ?", (timeslotID,)),
+    ]
+
+
+def seed(users, days, bookRate, seed_):
+    random.seed(seed_)
+    with db.getCursor() as cursor:
+        backend = db.backend
+        backend.executemany(cursor, "INSERT INTO users(name, username, email, password) VALUES (?, ?, ?, ?)",
+                            [(f"User {i}", f"user{i}", f"user{i}@example.com", "x") for i in range(users)])
+        cursor.connection.commit()
+    with db.getCursor() as cursor:
+        # Bulk insert directly: createSchedulesForDate's existence checks are what the indexes speed up
+        backend.executemany(cursor, "INSERT INTO userSchedule(userID, scheduleDate) VALUES (?, ?)",
+                            [(userID, date.today() + timedelta(days=d)) for d in range(days) for userID in range(1, users + 1)])
+        cursor.execute(f"""
+            INSERT INTO timeslots(scheduleID, hour, minute, available)
+            SELECT us.scheduleID, t.hour, t.minute, 1
+            FROM userSchedule us CROSS JOIN ({db._timeslotTemplate()}) t
+        """)
+        cursor.execute("SELECT MIN(timeSlotID), MAX(timeSlotID) FROM timeslots")
+        low, high = cursor.fetchone()
+        booked = random.sample(range(low, high + 1), int((high - low + 1) * bookRate))
+        backend.executemany(cursor, "UPDATE timeslots SET available = 0, bookedByUserID = ? WHERE timeSlotID = ?",
+                            [(random.randint(1, users), tsid) for tsid in booked])
+        backend.executemany(cursor, "INSERT OR IGNORE INTO priorityQueue(timeSlotID, userID, priorityNo) VALUES (?, ?, 1)",
+                            [(tsid, random.randint(1, users)) for tsid in booked[:len(booked) // 4]])
+        cursor.connection.commit()
+        return low, high
+
+
+def measure(queries, repeat):
+    results = {}
+    with db.getCursor() as cursor:
+        cursor.execute("ANALYZE")
+        for name, sql, params in queries:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            start = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            results[name] = ((time.perf_counter() - start) / repeat * 1e6, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--book-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    db.createTables()
+    # Start from the schema as it was before the index migration
+    with db.getCursor() as cursor:
+        for table in ('priorityQueue', 'timeslots', 'userSchedule', 'appointmentStats', 'notificationOutbox', 'users', 'admin', 'schemaVersion'):
+            cursor.execute(db.backend.dropTable(table))
+        cursor.connection.commit()
+    db.migrate(target=1)
+
+    low, high = seed(args.users, args.days, args.book_rate, args.seed)
+    print(f"Seeded {args.users} users x {args.days} days ({high - low + 1} timeslots) in {db.backend.path}")
+
+    queries = hotQueries(args.users // 2, date.today() + timedelta(days=args.days // 2), (low + high) // 2)
+    before = measure(queries, args.repeat)
+    db.migrate()
+    after = measure(queries, args.repeat)
+
+    print(f"\n{'query':<18}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, _, _ in queries:
+        print(f"{name:<18}{before[name][0]:>14.1f}{after[name][0]:>14.1f}{before[name][0] / after[name][0]:>9.1f}x")
+    for name, _, _ in queries:
+        print(f"\n{name}\n  before: " + "\n          ".join(before[name][1]) +
+              "\n  after:  " + "\n          ".join(after[name][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Throughput and latency of the scheduling core: booking, cancellation, waitlist
+promotion, schedule reads and the HTTP endpoints on top of them.
+Seeds a synthetic population into a throwaway SQLite database, runs every scenario
+at the requested concurrency and compares ops/s, p99 latency and queries per
+operation against a stored baseline; regressions make the run exit with status 1.
+
+    python -m benchmarks.scheduling --users 500 --days 7 --concurrency 4
+    python -m benchmarks.scheduling --save-baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before DynaZOR.db picks its backend
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ.setdefault('SQLITE_PATH', os.path.join(tempfile.mkdtemp(prefix='dynazor-bench-'), 'scheduling.sqlite3'))
+os.environ.setdefault('NOTIFICATION_TRANSPORT', 'local')
+os.environ.setdefault('METRICS_LOG_SAMPLE_RATE', '0')
+os.environ.setdefault('METRICS_SLOW_REQUEST_MS', 'inf')
+
+from datetime import date, timedelta
+from DynaZOR import app, auth, db, metrics
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+class Population:
+    """What seed() created, for the scenarios to pick their targets from"""
+
+    def __init__(self, users, days, waitlisted):
+        self.users = users
+        self.days = days
+        self.waitlisted = waitlisted  # [[(ownerID, date, hour, minute), queued]] booked slots with a waitlist
+        self._lock = threading.Lock()
+
+    def day(self, rng):
+        return str(self.days[rng.randrange(len(self.days))])
+
+    def user(self, rng):
+        return rng.randint(1, self.users)
+
+    def slot(self, rng):
+        return db.DEFAULT_TIMESLOTS[rng.randrange(len(db.DEFAULT_TIMESLOTS))]
+
+    def takeWaitlisted(self):
+        """A booked slot with someone still queued; every queued user can be promoted once"""
+        with self._lock:
+            if not self.waitlisted:
+                return None
+            entry = self.waitlisted.pop()
+            entry[1] -= 1
+            if entry[1]:
+                self.waitlisted.insert(0, entry)
+            return entry[0]
+
+    def promotions(self):
+        return sum(queued for _, queued in self.waitlisted)
+
+
+def seed(users, days, bookRate, waitlistDepth, rng):
+    db.createTables()
+    with db.getCursor() as cursor:
+        db.backend.executemany(cursor, "INSERT INTO users(name, username, email, password) VALUES (?, ?, ?, ?)",
+                               [(f"User {i}", f"user{i}", f"user{i}@example.com", "x") for i in range(users)])
+        cursor.connection.commit()
+    today = date.today()
+    db.createScheduleHorizon(today, days, chunkSize=1000)
+    dayList = [today + timedelta(days=d) for d in range(days)]
+
+    waitlisted = []
+    bookings = int(users * days * len(db.DEFAULT_TIMESLOTS) * bookRate)
+    for _ in range(bookings):
+        owner, booker = rng.sample(range(1, users + 1), 2)
+        day = str(dayList[rng.randrange(days)])
+        hour, minute = db.DEFAULT_TIMESLOTS[rng.randrange(len(db.DEFAULT_TIMESLOTS))]
+        if db.bookSlots(owner, booker, [(day, hour, minute)])[0] != 'booked':
+            continue
+        queued = 0
+        for waiter in rng.sample(range(1, users + 1), min(users, waitlistDepth * 3)):
+            if queued == waitlistDepth:
+                break
+            if waiter not in (owner, booker) and db.bookSlots(owner, waiter, [(day, hour, minute)])[0] == 'waitlisted':
+                queued += 1
+        if queued:
+            waitlisted.append([(owner, day, hour, minute), queued])
+    rng.shuffle(waitlisted)
+    return Population(users, dayList, waitlisted)
+
+
+def scenarios(population, client):
+    """name -> op(rng); each op is one unit of work as a request would do it"""
+
+    def book(rng):
+        owner, booker = rng.sample(range(1, population.users + 1), 2)
+        hour, minute = population.slot(rng)
+        db.schedulerAlgorithm(owner, population.day(rng), hour, minute, booker)
+
+    def promote(rng):
+        target = population.takeWaitlisted()
+        if target is None:
+            raise LookupError("out of waitlisted slots; seed more with --book-rate/--waitlist-depth")
+        db.reSchedulerAlgorithm(*target)
+
+    def cancel(rng):
+        owner, booker = rng.sample(range(1, population.users + 1), 2)
+        hour, minute = population.slot(rng)
+        db.cancelSlots(owner, booker, [(population.day(rng), hour, minute)])
+
+    def read(rng):
+        db.getSchedule(population.user(rng), population.day(rng))
+
+    def toggle(rng):
+        hour, minute = population.slot(rng)
+        db.toggleSlotDB(population.user(rng), population.day(rng), hour, minute)
+
+    tokens = {}
+
+    def headers(userID):
+        # Signed once per user, like a client holding its login token
+        if userID not in tokens:
+            with app.app_context():
+                tokens[userID] = auth.userToken(userID, f"user{userID - 1}")
+        return {'Authorization': f"Bearer {tokens[userID]}"}
+
+    def httpSchedule(rng):
+        viewer, owner = population.user(rng), population.user(rng)
+        response = client().get(f"/api/user/schedule/{owner}?start={population.day(rng)}&days=1", headers=headers(viewer))
+        assert response.status_code == 200, response.status_code
+
+    def httpAnalytics(rng):
+        owner = population.user(rng)
+        response = client().get(f"/api/analytics/{owner}", headers=headers(owner))
+        assert response.status_code == 200, response.status_code
+
+    def httpFreeBusy(rng):
+        viewer = population.user(rng)
+        users = ','.join(str(population.user(rng)) for _ in range(8))
+        response = client().get(f"/api/user/freebusy?users={users}&start={population.days[0]}&days={len(population.days)}",
+                                headers=headers(viewer))
+        assert response.status_code == 200, response.status_code
+
+    def httpSolve(rng):
+        owner, *participants = rng.sample(range(1, population.users + 1), 25)
+        response = client().post(f"/api/user/solve/{owner}", headers=headers(participants[0]), json={
+            'participants': participants, 'start': str(population.days[0]), 'days': len(population.days)
+        })
+        assert response.status_code == 200, response.status_code
+
+    syncTokens = {}
+
+    def httpChanges(rng):
+        # An integration polling one owner's schedule with the token of its previous sync
+        owner = population.user(rng)
+        response = client().get(f"/api/user/schedule/{owner}/changes?since={syncTokens.get(owner, 0)}&start={population.days[0]}",
+                                headers=headers(owner))
+        assert response.status_code == 200, response.status_code
+        syncTokens[owner] = response.get_json()['token']
+
+    def httpBook(rng):
+        owner, booker = rng.sample(range(1, population.users + 1), 2)
+        hour, minute = population.slot(rng)
+        client().post(f"/api/user/appointment/{owner}", headers=headers(booker), json={
+            'bookerID': booker, 'selections': [{'date': population.day(rng), 'hour': hour, 'minute': minute}]
+        })
+
+    return {
+        'schedulerAlgorithm': book,
+        'reSchedulerAlgorithm': promote,
+        'cancelSlots': cancel,
+        'getSchedule': read,
+        'toggleSlotDB': toggle,
+        'http GET schedule': httpSchedule,
+        'http POST appointment': httpBook,
+        'http GET analytics': httpAnalytics,
+        'http GET freebusy': httpFreeBusy,
+        'http POST solve': httpSolve,
+        'http GET changes': httpChanges,
+    }
+
+
+def percentile(sortedValues, fraction):
+    if not sortedValues:
+        return 0.0
+    index = min(len(sortedValues) - 1, int(round(fraction * (len(sortedValues) - 1))))
+    return sortedValues[index]
+
+
+def run(op, ops, concurrency, seed_):
+    """Run `ops` calls of op over `concurrency` threads; returns the scenario's result dict"""
+    latencies = []
+    queries = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed_ * 1000 + index)
+        mine, myQueries = [], []
+        for _ in range(ops // concurrency + (1 if index < ops % concurrency else 0)):
+            db.openRequestScope()
+            metrics.beginRecording()
+            start = time.perf_counter()
+            try:
+                op(rng)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                mine.append(time.perf_counter() - start)
+                stats = metrics.endRecording()
+                myQueries.append(stats['roundTrips'] if stats else 0)
+                db.closeRequestScope()
+        with lock:
+            latencies.extend(mine)
+            queries.extend(myQueries)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'ops': len(latencies),
+        'errors': len(errors),
+        'firstError': repr(errors[0]) if errors else None,
+        'opsPerSec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50Ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99Ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queriesPerOp': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance, latencyTolerance):
+    """Regression messages for every scenario that got slower than the baseline allows"""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['opsPerSec'] < base['opsPerSec'] * (1 - tolerance):
+            problems.append(f"{name}: {result['opsPerSec']} ops/s vs baseline {base['opsPerSec']}")
+        if result['p99Ms'] > base['p99Ms'] * (1 + latencyTolerance):
+            problems.append(f"{name}: p99 {result['p99Ms']} ms vs baseline {base['p99Ms']}")
+        # Concurrent interleavings move this a little; a real N+1 moves it a lot
+        if result['queriesPerOp'] > base['queriesPerOp'] * 1.05 + 0.05:
+            problems.append(f"{name}: {result['queriesPerOp']} queries/op vs baseline {base['queriesPerOp']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--book-rate', type=float, default=0.03, help='share of slots booked while seeding')
+    parser.add_argument('--waitlist-depth', type=int, default=3, help='users queued behind each seeded booking')
+    parser.add_argument('--ops', type=int, default=500, help='operations per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=3, help='runs per scenario; the best ops/s and p99 are reported')
+    parser.add_argument('--scenarios', help='comma-separated subset of scenario names')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed ops/s drop before flagging, 0.5 = 50%%')
+    parser.add_argument('--latency-tolerance', type=float, default=2.0, help='allowed p99 growth; tail latency is noisier')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    population = seed(args.users, args.days, args.book_rate, args.waitlist_depth, rng)
+    print(f"Seeded {args.users} users x {args.days} days, {population.promotions()} queued promotions "
+          f"in {time.perf_counter() - start:.1f}s ({db.backend.path})")
+
+    # Flask test clients are not thread-safe, so every worker thread gets its own
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client
+
+    available = scenarios(population, client)
+    selected = args.scenarios.split(',') if args.scenarios else list(available)
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {list(available)}")
+
+    results = {}
+    print(f"\n{'scenario':<24}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries/op':>12}{'errors':>8}")
+    for name in selected:
+        # Best of several rounds, so one noisy neighbour does not decide the verdict
+        rounds = [run(available[name], args.ops, args.concurrency, args.seed + r) for r in range(args.rounds)]
+        result = max(rounds, key=lambda r: r['opsPerSec'])
+        result['p99Ms'] = min(r['p99Ms'] for r in rounds)
+        result['queriesPerOp'] = round(sum(r['queriesPerOp'] for r in rounds) / len(rounds), 2)
+        result['errors'] = sum(r['errors'] for r in rounds)
+        result['firstError'] = next((r['firstError'] for r in rounds if r['firstError']), None)
+        results[name] = result
+        print(f"{name:<24}{result['opsPerSec']:>10}{result['p50Ms']:>10}{result['p99Ms']:>10}"
+              f"{result['queriesPerOp']:>12}{result['errors']:>8}")
+        if result['firstError']:
+            print(f"  first error: {result['firstError']}")
+
+    config = {key: getattr(args, key) for key in ('users', 'days', 'book_rate', 'waitlist_depth', 'ops', 'concurrency', 'rounds', 'seed')}
+    if args.save_baseline:
+        with open(args.baseline, 'w') as out:
+            json.dump({'config': config, 'results': results}, out, indent=2, sort_keys=True)
+            out.write('\n')
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as stored:
+        baseline = json.load(stored)
+    if baseline.get('config') != config:
+        print(f"\nNote: baseline was recorded with {baseline.get('config')}")
+    problems = compare(results, baseline.get('results', {}), args.tolerance, args.latency_tolerance)
+    if problems:
+        print("\nRegressions:\n  " + "\n  ".join(problems))
+        return 1
+    print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
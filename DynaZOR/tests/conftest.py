@@ -0,0 +1,71 @@
+"""
+Shared fixtures. Every database test runs once per backend against a freshly migrated schema:
+SQLite in memory always, SQL Server when SQLSERVER_HOST names a scratch database (its tables are
+dropped and rebuilt) and pyodbc is installed.
+"""
+
+import os
+
+# Must be set before DynaZOR.db picks its backend
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('NOTIFICATION_TRANSPORT', 'local')
+os.environ.setdefault('METRICS_LOG_SAMPLE_RATE', '0')
+os.environ.setdefault('PASSWORD_HASH_ITERATIONS', '1000')
+
+from datetime import date
+
+import pytest
+
+from DynaZOR import app, auth, db
+from DynaZOR.backends import getBackend
+from DynaZOR.pool import ConnectionPool
+
+USERS = 4
+PASSWORD = 'secret-pw'
+
+
+@pytest.fixture(params=['sqlite', 'sqlserver'])
+def database(request, monkeypatch):
+    """db bound to a fresh schema on the parametrized backend, with USERS users and today's schedules"""
+    if request.param == 'sqlserver':
+        if not os.getenv('SQLSERVER_HOST'):
+            pytest.skip("SQLSERVER_HOST is not set")
+        pytest.importorskip('pyodbc')
+    backend = getBackend(request.param)
+    pool = ConnectionPool(backend.connect, minSize=0, maxSize=4, pingQuery=backend.pingQuery)
+    monkeypatch.setattr(db, 'backend', backend)
+    monkeypatch.setattr(db, 'pool', pool)
+
+    db.createTables()
+    for i in range(1, USERS + 1):
+        db.createUser(f'User {i}', f'user{i}', f'user{i}@example.com', PASSWORD)
+    db.createScheduleHorizon(date.today(), 2)
+    yield db
+    pool.closeAll()
+
+
+@pytest.fixture
+def today():
+    return str(date.today())
+
+
+@pytest.fixture
+def client(database):
+    return app.test_client()
+
+
+@pytest.fixture
+def headers():
+    """headers(userID) -> the Authorization header of that user's token"""
+    def build(userID):
+        with app.app_context():
+            return {'Authorization': 'Bearer ' + auth.userToken(userID, f'user{userID}')}
+    return build
+
+
+@pytest.fixture
+def adminHeaders():
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + auth.adminToken()}
@@ -0,0 +1,63 @@
+"""AdminView keyset pages, filters and NDJSON streaming, on every backend"""
+
+import json
+
+from .conftest import USERS
+
+
+def view(client, adminHeaders, **body):
+    response = client.post('/api/admin/view', json=body, headers=adminHeaders)
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+def test_view_requires_the_admin(client, headers):
+    assert client.post('/api/admin/view', json={}).status_code == 401
+    assert client.post('/api/admin/view', json={}, headers=headers(1)).status_code == 401
+
+
+def test_pages_walk_a_section_without_gaps_or_repeats(database, client, adminHeaders):
+    seen, after = [], None
+    while True:
+        page = view(client, adminHeaders, section='timeslots', limit=5, after=after).get_json()
+        assert len(page['timeslots']) <= 5
+        seen += [(slot['scheduleID'], slot['hour'], slot['minute']) for slot in page['timeslots']]
+        after = page['next']['timeslots']
+        if not after:
+            break
+
+    assert len(seen) == len(set(seen)) == USERS * 2 * len(database.DEFAULT_TIMESLOTS)
+
+
+def test_first_page_of_every_section_with_bookings(database, client, adminHeaders, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    page = view(client, adminHeaders, limit=2).get_json()
+    assert page['user_count'] == 2
+    assert page['next']['users'] is not None
+    booker = next(user for user in page['users'] if user['userID'] == 2)
+    assert [(b['date'], b['hour'], b['minute']) for b in booker['bookings']] == [(today, 8, 0)]
+
+
+def test_filters_narrow_a_section(client, adminHeaders, today):
+    page = view(client, adminHeaders, section='schedules', userID=3, dateFrom=today, dateTo=today).get_json()
+
+    assert [(day['userID'], day['date']) for day in page['schedules']] == [(3, today)]
+    assert page['next']['schedules'] is None
+
+
+def test_cursors_are_checked(client, adminHeaders):
+    response = client.post('/api/admin/view', json={'section': 'timeslots', 'after': '1:2'}, headers=adminHeaders)
+    assert response.status_code == 400
+    assert client.post('/api/admin/view', json={'after': '1'}, headers=adminHeaders).status_code == 400
+
+
+def test_ndjson_streams_every_row(database, client, adminHeaders):
+    response = view(client, adminHeaders, format='ndjson', limit=3)
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    sections = [line['section'] for line in lines]
+    assert sections.count('users') == USERS
+    assert sections.count('schedules') == USERS * 2
+    assert sections.count('timeslots') == USERS * 2 * len(database.DEFAULT_TIMESLOTS)
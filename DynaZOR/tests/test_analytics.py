@@ -0,0 +1,54 @@
+"""Analytics rollups kept current by every booking, on every backend"""
+
+
+def book(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0), (today, 8, 45)])
+    database.bookSlots(1, 3, [(today, 9, 30)])
+    database.bookSlots(1, 4, [(today, 8, 0)])
+    database.cancelSlots(1, 2, [(today, 8, 0)])  # promotes 4
+
+
+def test_rollups_count_bookings_and_promotions(database, today):
+    book(database, today)
+
+    assert database.getAnalytics(1) == {'total': 4, 'slot': (8, 0),
+                                        'bookers': [(2, 'User 2', 2), (3, 'User 3', 1), (4, 'User 4', 1)]}
+    assert database.getAnalytics(1, topBookers=1)['bookers'] == [(2, 'User 2', 2)]
+    assert database.getAnalytics(2) == {'total': 0, 'slot': None, 'bookers': []}
+
+
+def test_rebuild_restores_damaged_rollups(database, today):
+    book(database, today)
+    expected = database.getAnalytics(1)
+    with database.getCursor() as cursor:
+        cursor.execute("DELETE FROM ownerSlotStats")
+        cursor.execute("UPDATE ownerStats SET bookingCount = 99")
+        cursor.connection.commit()
+
+    database.rebuildAnalytics()
+    assert database.getAnalytics(1) == expected
+
+
+def test_deleting_a_booker_drops_their_share(database, today):
+    book(database, today)
+
+    assert database.deleteUser(2)
+    analytics = database.getAnalytics(1)
+    assert analytics['total'] == 2
+    assert [booker[0] for booker in analytics['bookers']] == [3, 4]
+
+
+def test_analytics_endpoint_is_owner_only_and_revalidates(database, client, headers, today):
+    book(database, today)
+
+    response = client.get('/api/analytics/1', headers=headers(1))
+    assert response.get_json() == {
+        'frequent_hour': '08:00', 'total_bookings': 4,
+        'top_bookers': [{'userID': 2, 'name': 'User 2', 'count': 2}, {'userID': 3, 'name': 'User 3', 'count': 1},
+                        {'userID': 4, 'name': 'User 4', 'count': 1}],
+    }
+    assert client.get('/api/analytics/1', headers=headers(2)).status_code == 403
+    etag = response.headers['ETag']
+    assert client.get('/api/analytics/1', headers={**headers(1), 'If-None-Match': etag}).status_code == 304
+    database.bookSlots(1, 2, [(today, 10, 15)])
+    assert client.get('/api/analytics/1', headers={**headers(1), 'If-None-Match': etag}).status_code == 200
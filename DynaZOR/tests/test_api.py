@@ -0,0 +1,55 @@
+"""HTTP behaviour: access tokens, ETag revalidation and the owner toggle, on every backend"""
+
+from DynaZOR import app, auth
+
+from .conftest import PASSWORD
+
+
+def test_login_issues_a_token_the_api_accepts(client):
+    response = client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': PASSWORD})
+    assert response.status_code == 200
+    token = response.json['token']
+
+    assert client.get('/api/user/schedule/1', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+    assert client.post('/api/auth/login', json={'email': 'user1@example.com', 'password': 'wrong'}).status_code == 401
+
+
+def test_endpoints_reject_missing_forged_and_foreign_tokens(client, headers, today):
+    assert client.get('/api/user/schedule/1').status_code == 401
+    assert client.get('/api/user/schedule/1', headers={'Authorization': 'Bearer forged'}).status_code == 401
+    toggle = {'date': today, 'hour': 8, 'minute': 0}
+    assert client.post('/api/user/timeslot/1', json=toggle, headers=headers(2)).status_code == 403
+    assert client.post('/api/user/timeslot/1', json=toggle, headers=headers(1)).status_code == 200
+
+
+def test_verify_token_round_trip():
+    with app.app_context():
+        claims = auth.verifyToken(auth.userToken(3, 'user3'))
+        assert (claims['role'], claims['userID'], claims['username']) == ('user', 3, 'user3')
+        assert auth.verifyToken(auth.adminToken())['role'] == 'admin'
+        assert auth.verifyToken('not-a-token') is None
+
+
+def test_schedule_etag_revalidates_until_a_write(client, headers, today):
+    response = client.get('/api/user/schedule/1', headers=headers(1))
+    etag = response.headers['ETag']
+
+    cached = client.get('/api/user/schedule/1', headers={**headers(1), 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+
+    client.post('/api/user/appointment/1', json={'selections': [{'date': today, 'hour': 8, 'minute': 0}]}, headers=headers(2))
+    fresh = client.get('/api/user/schedule/1', headers={**headers(1), 'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+
+
+def test_owner_toggle_of_a_booked_slot_notifies_the_booker(database, client, headers, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    response = client.post('/api/user/timeslot/1', json={'date': today, 'hour': 8, 'minute': 0}, headers=headers(1))
+    assert response.status_code == 200
+    with database.getCursor() as cursor:
+        cursor.execute("SELECT targetEmail, subject FROM notificationOutbox")
+        assert [tuple(row) for row in cursor.fetchall()] == [('user2@example.com', 'Appointment Cancelled')]
+    assert client.post('/api/user/timeslot/1', json={'date': today, 'hour': 8, 'minute': 1}, headers=headers(1)).status_code == 404
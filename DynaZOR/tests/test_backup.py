@@ -0,0 +1,85 @@
+"""Streaming backup and restore, full and incremental, on every backend"""
+
+import gzip
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from DynaZOR import backup
+
+
+def snapshot(database):
+    with database.getCursor() as cursor:
+        tables = {}
+        for table, columns, _ in backup.TABLES:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {', '.join(columns)}")
+            tables[table] = [tuple(row) for row in cursor.fetchall()]
+        return tables
+
+
+def takeBackup(incremental=False):
+    return b''.join(backup.iterBackup(incremental=incremental, chunkSize=7))
+
+
+def test_backup_is_gzipped_ndjson_with_header_and_totals(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    lines = [json.loads(line) for line in gzip.decompress(takeBackup()).decode().splitlines()]
+    assert (lines[0]['format'], lines[0]['kind']) == (backup.FORMAT, 'full')
+    assert lines[-1]['end'] is True
+    assert lines[-1]['rows']['users'] == 4
+    assert lines[-1]['rows']['timeslots'] == 4 * 2 * len(database.DEFAULT_TIMESLOTS)
+
+
+def test_full_backup_restores_every_row(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+    before = snapshot(database)
+    data = takeBackup()
+
+    database.createTables()
+    counts = backup.restoreFile(io.BytesIO(data), batchSize=5)
+    assert counts['users'] == 4
+    assert snapshot(database) == before
+    assert database.getSchedule(1)[0]['timeslots'][0]['waitlist_count'] == 1
+
+
+def test_incremental_backup_carries_the_changes_since_the_last_one(database, today):
+    with pytest.raises(ValueError):
+        takeBackup(incremental=True)
+    full = takeBackup()
+
+    database.createScheduleHorizon(date.today(), 4)
+    database.toggleSlotDB(3, str(date.today() + timedelta(days=3)), 8, 0)
+    database.createUser('User 5', 'user5', 'user5@example.com', 'pw')
+    database.updateUser(4, name='Renamed')
+    after = snapshot(database)
+    incremental = takeBackup(incremental=True)
+    header = json.loads(gzip.decompress(incremental).decode().splitlines()[0])
+    assert header['kind'] == 'incremental'
+
+    database.createTables()
+    backup.restoreFile(io.BytesIO(full))
+    backup.restoreFile(io.BytesIO(incremental))
+    assert snapshot(database) == after
+
+
+def test_restore_rejects_garbage(database):
+    with pytest.raises((ValueError, OSError)):
+        backup.restoreFile(io.BytesIO(b'not a backup'))
+
+
+def test_backup_and_restore_endpoints(client, adminHeaders):
+    response = client.post('/api/admin/backup', json={}, headers=adminHeaders)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+
+    restored = client.post('/api/admin/restore', headers=adminHeaders, content_type='multipart/form-data',
+                           data={'backup': (io.BytesIO(response.data), 'backup.ndjson.gz')})
+    assert restored.status_code == 200
+    assert restored.get_json()['restored']['users'] == 4
+    garbage = client.post('/api/admin/restore', headers=adminHeaders, content_type='multipart/form-data',
+                          data={'backup': (io.BytesIO(b'junk'), 'backup.ndjson.gz')})
+    assert garbage.status_code == 400
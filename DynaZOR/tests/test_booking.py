@@ -0,0 +1,131 @@
+"""Booking, cancellation, waitlist promotion and slot toggling, on every backend"""
+
+from datetime import date
+
+import pytest
+
+
+def slotOf(db, userID, hour, minute, scheduleDate=None):
+    return next(slot for slot in db.getSchedule(userID, scheduleDate)[0]['timeslots']
+                if (slot['hour'], slot['minute']) == (hour, minute))
+
+
+def waitlistOf(db, ownerID, day, hour, minute):
+    return [entry['user_id'] for entry in db.getWaitList(db.getTimeslotID(ownerID, day, hour, minute))]
+
+
+def test_book_slots_books_both_sides(database, today):
+    assert database.bookSlots(1, 2, [(today, 8, 0), (today, 8, 45)]) == ['booked', 'booked']
+
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] == 2
+    assert slotOf(database, 1, 8, 0)['available'] == 1
+    booker = slotOf(database, 2, 8, 45)
+    assert (booker['available'], booker['bookedByUserID']) == (0, 1)
+
+
+def test_book_slots_waitlists_taken_slot(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    assert database.bookSlots(1, 3, [(today, 8, 0)]) == ['waitlisted']
+    assert database.bookSlots(1, 3, [(today, 8, 0)]) == ['queued']
+    assert database.bookSlots(1, 4, [(today, 8, 0)], waitlist=False) == ['taken']
+    assert waitlistOf(database, 1, today, 8, 0) == [3]
+    assert slotOf(database, 1, 8, 0)['waitlist_count'] == 1
+
+
+def test_book_slots_writes_nothing_unless_every_selection_is_accepted(database, today):
+    database.toggleSlotDB(1, today, 8, 45)
+
+    assert database.bookSlots(1, 2, [(today, 8, 0), (today, 8, 45)]) == ['skipped', 'closed']
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] is None
+    assert slotOf(database, 2, 8, 0)['available'] == 1
+
+
+def test_book_slots_reports_missing_and_busy(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    tomorrow = date.fromordinal(date.today().toordinal() + 5)
+
+    assert database.bookSlots(3, 2, [(today, 8, 0)]) == ['busy']
+    assert database.bookSlots(3, 4, [(str(tomorrow), 8, 0)]) == ['missing']
+    assert database.bookSlots(1, 1, [(today, 8, 45)]) == ['busy']
+
+
+def test_cancel_slots_promotes_the_waitlist(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+
+    assert database.cancelSlots(1, 2, [(today, 8, 0)]) == [('canceled', 'user3@example.com')]
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] == 3
+    assert slotOf(database, 2, 8, 0)['available'] == 1
+    assert slotOf(database, 3, 8, 0)['bookedByUserID'] == 1
+    assert waitlistOf(database, 1, today, 8, 0) == []
+
+
+def test_cancel_slots_is_all_or_nothing(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    assert database.cancelSlots(1, 2, [(today, 8, 0), (today, 8, 45)]) == [('skipped', None), ('notbooked', None)]
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] == 2
+
+
+def test_cancel_slots_skips_waiting_users_who_are_busy(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+    database.bookSlots(1, 4, [(today, 8, 0)])
+    database.bookSlots(2, 3, [(today, 8, 45)])
+    database.toggleSlotDB(3, today, 8, 0)
+
+    assert database.cancelSlots(1, 2, [(today, 8, 0)]) == [('canceled', 'user4@example.com')]
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] == 4
+    assert waitlistOf(database, 1, today, 8, 0) == []
+
+
+def test_rescheduler_algorithm_hands_the_slot_on(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+
+    assert database.reSchedulerAlgorithm(1, today, 8, 0) == 'user3@example.com'
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] == 3
+    assert database.reSchedulerAlgorithm(1, today, 8, 0) is None
+    assert slotOf(database, 1, 8, 0)['bookedByUserID'] is None
+    assert database.reSchedulerAlgorithm(1, '1999-01-01', 8, 0) is None
+
+
+def test_toggle_slot_db_flips_availability(database, today):
+    assert database.toggleSlotDB(1, today, 8, 0) == 1
+    assert slotOf(database, 1, 8, 0)['available'] == 0
+    database.toggleSlotDB(1, today, 8, 0)
+    assert slotOf(database, 1, 8, 0)['available'] == 1
+    assert database.toggleSlotDB(1, today, 8, 1) == 0
+
+
+def test_toggle_owner_slot_cancels_and_drops_the_waitlist(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+
+    assert database.toggleOwnerSlot(1, today, 8, 0) == (2, [(3, 'user3@example.com')], None)
+    owner = slotOf(database, 1, 8, 0)
+    assert (owner['available'], owner['bookedByUserID'], owner['waitlist_count']) == (0, None, 0)
+    booker = slotOf(database, 2, 8, 0)
+    assert (booker['available'], booker['bookedByUserID']) == (1, None)
+    assert database.toggleOwnerSlot(1, today, 8, 1) is None
+
+
+def test_create_schedule_is_idempotent(database, today):
+    scheduleID = database.getScheduleID(1, today)
+
+    assert database.createSchedule(1, today) == scheduleID
+    assert len(database.getSchedule(1)[0]['timeslots']) == len(database.DEFAULT_TIMESLOTS)
+
+
+def test_create_schedule_rolls_back_a_failed_insert(database, monkeypatch):
+    day = str(date.fromordinal(date.today().toordinal() + 10))
+    monkeypatch.setattr(database, '_timeslotTemplate', lambda slots: "SELECT no_such_column")
+    database.openRequestScope()
+    try:
+        with pytest.raises(Exception):
+            database.createSchedule(1, day)
+        # The connection stays bound to the scope; the half-made day must be gone from it
+        assert database.getScheduleID(1, day) is None
+    finally:
+        database.closeRequestScope()
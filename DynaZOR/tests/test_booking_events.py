@@ -0,0 +1,74 @@
+"""The booking event log and its day/week buckets, on every backend"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def noLag(database, monkeypatch):
+    monkeypatch.setattr(database, 'AGGREGATION_LAG', timedelta(0))
+
+
+def events(database):
+    with database.getCursor() as cursor:
+        cursor.execute("SELECT kind, ownerUserID, bookerUserID, hour, minute FROM bookingEvents ORDER BY eventID")
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def test_every_write_path_logs_its_event(database, client, headers, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+    database.cancelSlots(1, 2, [(today, 8, 0)])
+    client.post('/api/user/timeslot/1', json={'date': today, 'hour': 8, 'minute': 0}, headers=headers(1))
+
+    assert events(database) == [('booked', 1, 2, 8, 0), ('waitlisted', 1, 3, 8, 0), ('canceled', 1, 2, 8, 0),
+                                ('promoted', 1, 3, 8, 0), ('ownerCanceled', 1, 3, 8, 0)]
+
+
+def test_young_events_wait_for_the_next_run(database, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    assert database.aggregateBookingEvents() == 0
+
+
+def test_aggregation_folds_events_into_day_and_week_buckets_once(database, noLag, today):
+    lastWeek = datetime.utcnow() - timedelta(days=7)
+    with database.getCursor() as cursor:
+        cursor.execute("""
+            INSERT INTO bookingEvents (occurredAt, kind, ownerUserID, bookerUserID, appointmentDate, hour, minute)
+            VALUES (?, 'booked', 1, 3, ?, 9, 30)
+        """, (lastWeek, str(lastWeek.date())))
+        cursor.connection.commit()
+    database.bookSlots(1, 2, [(today, 8, 0), (today, 8, 45)])
+    database.bookSlots(1, 4, [(today, 8, 0)])
+
+    assert database.aggregateBookingEvents(batchSize=2) == 4
+    assert database.aggregateBookingEvents() == 0
+
+    now = datetime.utcnow().date()
+    weekStart = now - timedelta(days=now.weekday())
+    days, asOf = database.getBookingEventBuckets(1, now - timedelta(days=30), 'day')
+    assert asOf is not None
+    assert Counter({(start, kind): count for start, kind, _, _, count in days}) == Counter({
+        (lastWeek.date(), 'booked'): 1, (now, 'booked'): 1, (now, 'waitlisted'): 1})
+    assert sum(count for _, _, hour, minute, count in days if (hour, minute) == (8, 45)) == 1
+    weeks, _ = database.getBookingEventBuckets(1, weekStart, 'week')
+    assert {(start, kind) for start, kind, _, _, _ in weeks} == {(weekStart, 'booked'), (weekStart, 'waitlisted')}
+
+
+def test_window_endpoint_summarizes_the_buckets(database, noLag, client, headers, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.bookSlots(1, 3, [(today, 8, 0)])
+    database.cancelSlots(1, 2, [(today, 8, 0)])
+    database.aggregateBookingEvents()
+
+    for grain in ('day', 'week'):
+        window = client.get(f'/api/analytics/1/window?grain={grain}&days=7', headers=headers(1)).get_json()
+        assert window['totals'] == {'booked': 1, 'waitlisted': 1, 'promoted': 1, 'canceled': 1, 'ownerCanceled': 0}
+        assert window['top_slots'] == [{'time': '08:00', 'count': 2}]
+        assert (window['cancellation_rate'], window['waitlist_conversion']) == (0.5, 1.0)
+        assert len(window['trend']) == 1
+    assert client.get('/api/analytics/1/window?days=0', headers=headers(1)).status_code == 400
+    assert client.get('/api/analytics/1/window', headers=headers(2)).status_code == 403
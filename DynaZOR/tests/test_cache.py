@@ -0,0 +1,51 @@
+"""Read-through caches and their load tokens"""
+
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+from DynaZOR.cache import TTLCache
+
+
+def test_set_if_current_drops_a_load_that_raced_a_delete():
+    cache = TTLCache()
+    token = cache.loadToken('day')
+    cache.delete('day')
+
+    cache.setIfCurrent('day', token, 'stale')
+    assert cache.get('day') is None
+    token = cache.loadToken('day')
+    cache.setIfCurrent('day', token, 'fresh')
+    assert cache.get('day') == 'fresh'
+
+
+def test_entries_expire_and_evict():
+    cache = TTLCache(maxSize=2, ttl=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+    cache = TTLCache(maxSize=2, ttl=None)
+    for key in 'abc':
+        cache.set(key, key)
+    assert (cache.get('a'), cache.get('c')) == (None, 'c')
+    assert cache.stats()['evictions'] == 1
+
+
+@contextmanager
+def brokenCursor():
+    raise RuntimeError("database unavailable")
+    yield
+
+
+def test_failed_loads_release_their_tokens(database, monkeypatch):
+    monkeypatch.setattr(database, 'getCursor', brokenCursor)
+
+    with pytest.raises(RuntimeError):
+        database.getSchedule(1)
+    with pytest.raises(RuntimeError):
+        database.getScheduleVersion(1, date.today(), date.today())
+    with pytest.raises(RuntimeError):
+        database.getFreeBusy([1, 2], date.today(), 2)
+    assert database.scheduleCache._loading == {}
+    assert database.freeBusyCache._loading == {}
@@ -0,0 +1,104 @@
+"""Schedule change notifications and the live schedule streams they drive"""
+
+import importlib
+import json
+import threading
+from datetime import date
+
+from DynaZOR import app, auth
+from DynaZOR.changefeed import LocalBroker
+
+# The package's own `api` is the flask_restful Api, not the module
+api = importlib.import_module('DynaZOR.api')
+
+
+class LateEvent(threading.Event):
+    """An Event whose wait times out just before a publish lands"""
+
+    def wait(self, timeout=None):
+        changed = super().wait(timeout)
+        self.set()
+        return changed
+
+
+def test_publish_wakes_only_subscribers_of_that_day():
+    broker = LocalBroker()
+    mine, other = broker.subscribe(1, '2030-01-01'), broker.subscribe(2, '2030-01-01')
+
+    broker.publish(1, '2030-01-01')
+    assert mine.wait(0) is True
+    assert mine.wait(0) is False
+    assert other.wait(0) is False
+
+
+def test_publish_all_wakes_everyone():
+    broker = LocalBroker()
+    subscriptions = [broker.subscribe(user, '2030-01-01') for user in (1, 2)]
+
+    broker.publishAll()
+    assert [subscription.wait(0) for subscription in subscriptions] == [True, True]
+
+
+def test_publish_between_timeout_and_clear_is_kept():
+    subscription = LocalBroker().subscribe(1, '2030-01-01')
+    subscription._changed = LateEvent()
+
+    assert subscription.wait(0) is False
+    assert subscription.wait(0) is True
+
+
+def test_closed_subscriptions_are_dropped():
+    broker = LocalBroker()
+    broker.subscribe(1, '2030-01-01').close()
+
+    assert broker.stats()['subscribers'] == 0
+    broker.publish(1, '2030-01-01')
+    assert broker.stats()['published'] == 1
+
+
+def events(chunks):
+    """(event, data) of every SSE message in chunks, keepalive comments left out"""
+    parsed = []
+    for message in ''.join(chunks).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if line.startswith(('event', 'data')))
+        if 'event' in fields:
+            parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_stream_sends_a_snapshot_then_only_changed_slots(database, today):
+    stream = api.ScheduleEvents.stream(database.changes.subscribe(1, date.today()), 1, date.today())
+
+    [(event, data)] = events([next(stream)])
+    assert (event, data['schedule']) == ('snapshot', database.getSchedule(1))
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    [(event, data)] = events([next(stream)])
+    assert event == 'slots'
+    assert [(slot['hour'], slot['minute'], slot['bookedByUserID']) for slot in data['timeslots']] == [(8, 0, 2)]
+    stream.close()
+    assert database.changes.stats()['subscribers'] == 0
+
+
+def test_stream_sends_a_snapshot_when_the_day_is_rebuilt(database):
+    tomorrow = date.fromordinal(date.today().toordinal() + 1)
+    stream = api.ScheduleEvents.stream(database.changes.subscribe(1, tomorrow), 1, tomorrow)
+    next(stream)
+
+    database.setSlotTemplate(1, {'startMinute': 9 * 60, 'endMinute': 10 * 60, 'slotMinutes': 30, 'breaks': []})
+    [(event, data)] = events([next(stream)])
+    assert event == 'snapshot'
+    assert [(slot['hour'], slot['minute']) for slot in data['schedule'][0]['timeslots']] == [(9, 0), (9, 30)]
+    stream.close()
+
+
+def test_events_endpoint_takes_a_query_token(client, monkeypatch, today):
+    monkeypatch.setattr(api, 'STREAM_MAX_SECONDS', 0)
+    with app.app_context():
+        token = auth.userToken(1, 'user1')
+
+    assert client.get(f'/api/user/schedule/1/events?date={today}').status_code == 401
+    assert client.get(f'/api/user/schedule/1/events?date=tomorrow&access_token={token}').status_code == 400
+    response = client.get(f'/api/user/schedule/1/events?date={today}&access_token={token}')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert [event for event, _ in events([response.get_data(as_text=True)])] == ['snapshot']
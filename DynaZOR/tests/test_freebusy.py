@@ -0,0 +1,56 @@
+"""Free/busy bitmaps across many users, on every backend"""
+
+from datetime import date, timedelta
+
+import pytest
+
+
+def minuteBits(*slots):
+    return sum(1 << (hour * 60 + minute) for hour, minute in slots)
+
+
+@pytest.fixture
+def allFree(database):
+    return minuteBits(*database.DEFAULT_TIMESLOTS)
+
+
+def test_bitmaps_mark_open_unbooked_slots(database, allFree, today):
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    database.toggleSlotDB(3, today, 17, 45)
+
+    freeBusy = database.getFreeBusy([1, 2, 3], date.today(), 3)
+    assert freeBusy[1] == [allFree - minuteBits((8, 0)), allFree, None]
+    assert freeBusy[2][0] == allFree - minuteBits((8, 0))
+    assert freeBusy[3][0] == allFree - minuteBits((17, 45))
+    assert database.freeSlots(freeBusy[3][0])[-1] == (17, 0)
+
+
+def test_cached_bitmaps_follow_writes(database, allFree, today):
+    assert database.getFreeBusy([1], date.today(), 1)[1] == [allFree]
+
+    database.toggleSlotDB(1, today, 8, 0)
+    assert database.getFreeBusy([1], date.today(), 1)[1] == [allFree - minuteBits((8, 0))]
+    database.createSchedule(1, date.today() + timedelta(days=5))
+    assert database.getFreeBusy([1], date.today() + timedelta(days=5), 1)[1] == [allFree]
+
+
+def test_free_slots_reads_a_bitmap_back(database):
+    assert database.freeSlots(minuteBits((9, 30), (8, 0))) == [(8, 0), (9, 30)]
+    assert database.freeSlots(0) == []
+
+
+def test_endpoint_numbers_bits_over_the_slots_in_use(database, client, headers, today):
+    database.toggleSlotDB(2, today, 8, 0)
+    slots = [f"{h:02d}:{m:02d}" for h, m in database.DEFAULT_TIMESLOTS]
+
+    body = client.get(f'/api/user/freebusy?users=1,2,1&start={today}&days=3', headers=headers(1)).get_json()
+    assert body['slots'] == slots
+    full = (1 << len(slots)) - 1
+    assert body['users'] == {'1': [full, full, None], '2': [full - 1, full, None]}
+
+
+def test_endpoint_validates_its_arguments(client, headers):
+    assert client.get('/api/user/freebusy?users=1').status_code == 401
+    assert client.get('/api/user/freebusy?users=a', headers=headers(1)).status_code == 400
+    assert client.get('/api/user/freebusy?users=1&days=99', headers=headers(1)).status_code == 400
+    assert client.get('/api/user/freebusy?users=1&start=tomorrow', headers=headers(1)).status_code == 400
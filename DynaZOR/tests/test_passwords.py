@@ -0,0 +1,42 @@
+"""Password hashing and the bounded hashing pool"""
+
+import threading
+
+import pytest
+
+from DynaZOR import passwords
+from DynaZOR.passwords import Hasher, HasherBusy
+
+
+def test_hashes_verify_and_legacy_plaintext_is_flagged():
+    stored = passwords.hashPassword('pw', iterations=1000)
+
+    assert passwords.verifyPassword('pw', stored)
+    assert not passwords.verifyPassword('other', stored)
+    assert not passwords.needsRehash(stored, iterations=1000)
+    assert passwords.needsRehash(stored, iterations=2000)
+    assert passwords.verifyPassword('pw', 'pw') and passwords.needsRehash('pw')
+
+
+def test_run_gives_up_on_a_slow_hash():
+    release = threading.Event()
+    hasher = Hasher(workers=1, maxPending=2, timeout=0.05)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.run(release.wait)
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+def test_run_refuses_work_when_the_queue_is_full():
+    release = threading.Event()
+    hasher = Hasher(workers=1, maxPending=1, timeout=0.05)
+    try:
+        hasher._executor.submit(release.wait)
+        hasher._slots.acquire()
+        with pytest.raises(HasherBusy):
+            hasher.run(lambda: None)
+    finally:
+        release.set()
+        hasher.shutdown()
@@ -0,0 +1,81 @@
+"""ConnectionPool against plain SQLite connections"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from DynaZOR.pool import ConnectionPool, PoolClosed, PoolTimeout
+
+
+def newPool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        opened.append(conn)
+        return conn
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_fill_opens_min_size_and_reuses_connections():
+    pool, opened = newPool(minSize=2, maxSize=3)
+    pool.fill()
+    assert pool.stats() == {'size': 2, 'idle': 2, 'inUse': 0, 'closed': False}
+
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(opened) == 2
+
+
+def test_acquire_times_out_at_max_size():
+    pool, _ = newPool(minSize=0, maxSize=1, timeout=0.05)
+    held = pool.acquire()
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_acquire_waits_for_a_release():
+    pool, _ = newPool(minSize=0, maxSize=1, timeout=5)
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, (held,)).start()
+
+    assert pool.acquire() is held
+
+
+def test_broken_connections_are_replaced():
+    pool, opened = newPool(minSize=0, maxSize=1)
+    conn = pool.acquire()
+    pool.release(conn, broken=True)
+    assert pool.stats()['size'] == 0
+
+    assert pool.acquire() is not conn
+    assert len(opened) == 2
+
+
+def test_failed_ping_reconnects():
+    pool, opened = newPool(minSize=0, maxSize=1, pingAfter=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()
+
+    assert pool.acquire() is opened[1]
+    assert pool.stats()['size'] == 1
+
+
+def test_close_all_refuses_checkouts_and_closes_late_releases():
+    pool, _ = newPool(minSize=1, maxSize=2)
+    pool.fill()
+    held = pool.acquire()
+    pool.closeAll()
+
+    with pytest.raises(PoolClosed):
+        pool.acquire()
+    pool.release(held)
+    assert pool.stats() == {'size': 0, 'idle': 0, 'inUse': 0, 'closed': True}
+    with pytest.raises(sqlite3.ProgrammingError):
+        held.execute("SELECT 1")
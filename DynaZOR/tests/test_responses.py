@@ -0,0 +1,54 @@
+"""Compression negotiation and ETags of compressed bodies, on every backend"""
+
+import gzip
+import json
+
+import pytest
+
+from DynaZOR import responses
+
+
+@pytest.fixture
+def compressAll(monkeypatch):
+    monkeypatch.setattr(responses, 'COMPRESS_MIN_BYTES', 1)
+
+
+def test_gzip_when_accepted(client, headers, compressAll):
+    plain = client.get('/api/user/schedule/1', headers=headers(1))
+    response = client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data)) == plain.json
+    assert response.headers['ETag'] == plain.headers['ETag'][:-1] + '+gzip"'
+
+
+def test_plain_when_not_accepted_or_small(client, headers, monkeypatch):
+    monkeypatch.setattr(responses, 'brotli', None)
+    assert 'Content-Encoding' not in client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'br'}).headers
+    assert 'Content-Encoding' not in client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'gzip;q=0'}).headers
+
+    monkeypatch.setattr(responses, 'COMPRESS_MIN_BYTES', 10 ** 6)
+    small = client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert small.json == client.get('/api/user/schedule/1', headers=headers(1)).json
+
+
+def test_brotli_preferred_when_installed(client, headers, compressAll):
+    brotli = pytest.importorskip('brotli')
+
+    response = client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data)) == client.get('/api/user/schedule/1', headers=headers(1)).json
+    gzipped = client.get('/api/user/schedule/1', headers={**headers(1), 'Accept-Encoding': 'gzip, br;q=0.5'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+
+
+def test_compressed_etag_revalidates(client, headers, compressAll, today):
+    gzipHeaders = {**headers(1), 'Accept-Encoding': 'gzip'}
+    etag = client.get('/api/user/schedule/1', headers=gzipHeaders).headers['ETag']
+
+    cached = client.get('/api/user/schedule/1', headers={**gzipHeaders, 'If-None-Match': etag})
+    assert (cached.status_code, cached.headers['ETag']) == (304, etag)
+    client.post('/api/user/appointment/1', json={'selections': [{'date': today, 'hour': 8, 'minute': 0}]}, headers=headers(2))
+    assert client.get('/api/user/schedule/1', headers={**gzipHeaders, 'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,51 @@
+"""Schedule reads, their caches, incremental changes and migrations, on every backend"""
+
+from DynaZOR import migrations
+
+
+def test_get_schedule_sees_writes_through_the_cache(database, today):
+    before = database.getSchedule(1)
+    assert before[0]['date'] == today
+    assert database.getSchedule(1) == before
+
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    slot = database.getSchedule(1)[0]['timeslots'][0]
+    assert (slot['bookedByUserID'], slot['bookerUsername']) == (2, 'user2')
+
+
+def test_get_schedule_of_a_missing_day_is_empty(database):
+    assert database.getSchedule(1, '1999-01-01') == []
+
+
+def test_schedule_version_moves_on_writes(database, today):
+    version = database.getScheduleVersion(1, today, today)
+    assert version is not None
+
+    database.toggleSlotDB(1, today, 8, 0)
+    assert database.getScheduleVersion(1, today, today) > version
+    assert database.getScheduleVersion(1, '1999-01-01', '1999-01-01') is None
+
+
+def test_get_schedule_changes_returns_only_what_changed(database, today):
+    days, token = database.getScheduleChanges(1)
+    assert days[0]['date'] == today and days[0]['replace']
+    assert database.getScheduleChanges(1, token) == ([], token)
+
+    database.bookSlots(1, 2, [(today, 8, 0)])
+    days, newToken = database.getScheduleChanges(1, token)
+    assert newToken > token
+    assert [(day['date'], day['replace']) for day in days] == [(today, False)]
+    assert [(slot['hour'], slot['minute'], slot['bookedByUserID']) for slot in days[0]['timeslots']] == [(8, 0, 2)]
+
+
+def test_get_schedule_changes_resyncs_a_token_from_the_future(database):
+    days, token = database.getScheduleChanges(1)
+
+    resynced, _ = database.getScheduleChanges(1, token + 1000)
+    assert resynced == days
+
+
+def test_migrate_is_idempotent(database):
+    assert database.migrate() == []
+    with database.getCursor() as cursor:
+        assert migrations.appliedVersions(cursor) == {version for version, _, _ in migrations.MIGRATIONS}
@@ -0,0 +1,95 @@
+"""The in-process slot index: its LRU and load tokens, and that indexed reads agree with SQL on every backend"""
+
+import pytest
+
+from DynaZOR.slotindex import SlotDay, SlotIndex
+
+ROWS = [(11, 8, 0, 1, None, 0, None), (12, 8, 45, 0, 3, 2, 'user3')]
+
+
+def test_slot_day_renders_like_get_schedule():
+    day = SlotDay('2030-01-01', ROWS)
+
+    assert (day.position(8, 45), day.position(9, 0)) == (1, -1)
+    assert (day.isAvailable(0), day.isAvailable(1)) == (1, 0)
+    assert day.render() == [{'date': '2030-01-01', 'timeslots': [
+        {'hour': 8, 'minute': 0, 'available': 1, 'bookedByUserID': None, 'waitlist_count': 0, 'bookerUsername': None},
+        {'hour': 8, 'minute': 45, 'available': 0, 'bookedByUserID': 3, 'waitlist_count': 2, 'bookerUsername': 'user3'},
+    ]}]
+
+
+def test_index_loads_once_and_evicts_least_recently_used():
+    loads = []
+    index = SlotIndex(lambda userID, day: loads.append((userID, day)) or ROWS, maxDays=2)
+
+    first = index.day(1, '2030-01-01')
+    assert index.day(1, '2030-01-01') is first
+    index.day(2, '2030-01-01')
+    index.day(1, '2030-01-01')
+    index.day(3, '2030-01-01')
+
+    assert index.stats() == {'size': 2, 'hits': 2, 'misses': 3}
+    index.day(2, '2030-01-01')
+    assert loads[-1] == (2, '2030-01-01') and len(loads) == 4
+
+
+def test_missing_and_expired_days_are_reloaded():
+    loads = []
+    index = SlotIndex(lambda userID, day: loads.append(day) or [], ttl=0)
+
+    assert index.day(1, '2030-01-01') is None
+    assert index.stats()['size'] == 0
+    index.loader = lambda userID, day: loads.append(day) or ROWS
+    index.day(1, '2030-01-01')
+    index.day(1, '2030-01-01')
+    assert len(loads) == 3
+
+
+def test_day_invalidated_during_its_load_is_not_kept():
+    index = SlotIndex(lambda userID, day: index.invalidate(userID, day) or ROWS)
+
+    assert index.day(1, '2030-01-01').slotIDs.tolist() == [11, 12]
+    assert index.stats()['size'] == 0
+    index.loader = lambda userID, day: ROWS
+    index.day(1, '2030-01-01')
+    index.clear()
+    assert index.stats()['size'] == 0
+
+
+@pytest.fixture
+def indexed(database, monkeypatch):
+    """database with the slot index switched on"""
+    monkeypatch.setattr(database, 'slotIndex', SlotIndex(database._loadSlotDay))
+    return database
+
+
+def assertMatchesSQL(db, userID, day):
+    assert db.getSchedule(userID, day) == db.getScheduleRange(userID, day, day)
+    for slot in db.getScheduleRange(userID, day, day)[0]['timeslots']:
+        assert db.checkOwnAvailability(userID, slot['hour'], slot['minute'], day) == slot['available']
+
+
+def test_indexed_reads_follow_bookings_toggles_and_cancels(indexed, today):
+    for userID in (1, 2, 3):
+        assertMatchesSQL(indexed, userID, today)
+    assert indexed.slotIndex.stats()['size'] == 3
+
+    indexed.bookSlots(1, 2, [(today, 8, 0)])
+    indexed.bookSlots(1, 3, [(today, 8, 0)])
+    indexed.toggleSlotDB(1, today, 8, 45)
+    for userID in (1, 2, 3):
+        assertMatchesSQL(indexed, userID, today)
+    assert indexed.isBooked(indexed.getTimeslotID(1, today, 8, 0)) == 2
+
+    indexed.cancelSlots(1, 2, [(today, 8, 0)])
+    indexed.toggleOwnerSlot(1, today, 8, 0)
+    for userID in (1, 2, 3):
+        assertMatchesSQL(indexed, userID, today)
+    assert indexed.isBooked(indexed.getTimeslotID(1, today, 8, 0)) is None
+
+
+def test_days_beyond_the_hot_window_read_through_sql(indexed, monkeypatch, today):
+    monkeypatch.setattr(indexed, 'SLOT_INDEX_DAYS', 0)
+
+    assertMatchesSQL(indexed, 1, today)
+    assert indexed.slotIndex.stats() == {'size': 0, 'hits': 0, 'misses': 0}
@@ -0,0 +1,60 @@
+"""The common-availability meeting solver, on every backend"""
+
+from datetime import date, timedelta
+
+from DynaZOR import solver
+
+
+def test_slot_mask_covers_starts_between_the_bounds():
+    assert solver.slotMask((9, 0), (9, 1)) == 0b11 << 540
+    assert solver.slotMask((10, 0), (9, 0)) == 0
+    assert solver.slotMask() == (1 << 24 * 60) - 1
+
+
+def test_solve_only_offers_slots_everyone_is_free_for(database, today):
+    database.bookSlots(3, 2, [(today, 8, 0)])
+    database.toggleSlotDB(1, today, 8, 45)
+
+    candidates = solver.solve(1, [2], date.today(), 1, earliest=(8, 0), latest=(10, 15), limit=10)
+    assert [(c['hour'], c['minute']) for c in candidates] == [(9, 30), (10, 15)]
+
+
+def test_solve_ranks_by_booking_history(database, today):
+    tomorrow = str(date.today() + timedelta(days=1))
+    database.bookSlots(1, 2, [(today, 14, 0)])
+    database.bookSlots(1, 3, [(today, 9, 30)])
+    database.bookSlots(1, 4, [(today, 11, 0)])
+
+    best = solver.solve(1, [2], date.today() + timedelta(days=1), 1, limit=3)
+    # A participant's own booking outweighs anyone else's
+    assert [(c['date'], c['hour'], c['minute'], c['score']) for c in best] == [
+        (tomorrow, 14, 0, 1 + solver.PARTICIPANT_WEIGHT), (tomorrow, 9, 30, 1), (tomorrow, 11, 0, 1)]
+
+
+def test_weekdays_filter_days(database):
+    start = date.today()
+    allowed = {(start + timedelta(days=1)).weekday()}
+
+    common = solver.commonAvailability([1, 2], start, 2, solver.slotMask(), weekdays=allowed)
+    assert [day for day, _ in common] == [start + timedelta(days=1)]
+
+
+def test_book_skips_candidates_taken_since_solving(database, today):
+    candidates = solver.solve(1, [2], date.today(), 1, limit=2)
+    database.bookSlots(1, 3, [(today, 8, 0)])
+
+    assert solver.book(1, 2, candidates) == candidates[1]
+    assert database.getSchedule(1)[0]['timeslots'][1]['bookedByUserID'] == 2
+    assert solver.book(1, 4, candidates[:1]) is None
+
+
+def test_solve_endpoint_books_for_the_caller(database, client, headers, today):
+    body = {'participants': [3], 'start': today, 'days': 1, 'earliest': '09:00', 'book': True}
+    response = client.post('/api/user/solve/1', json=body, headers=headers(2))
+
+    assert response.status_code == 200
+    booked = response.get_json()['booked']
+    assert (booked['hour'], booked['minute']) == (9, 30)
+    assert client.post('/api/user/solve/1', json={'participants': 'x'}, headers=headers(2)).status_code == 400
+    assert client.post('/api/user/solve/1', json={'earliest': '9'}, headers=headers(2)).status_code == 400
+    assert client.post('/api/user/solve/1', json={'book': True, 'bookerID': 3}, headers=headers(2)).status_code == 403
@@ -0,0 +1,95 @@
+"""Per-user slot templates and their materialization into schedule days, on every backend"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from DynaZOR import db, solver
+
+from .conftest import USERS
+
+# 09:00-12:00 in 60 minute slots with a 10:00-10:30 break
+TEMPLATE = {'startMinute': 9 * 60, 'endMinute': 12 * 60, 'slotMinutes': 60, 'breaks': [(600, 630)]}
+TEMPLATE_SLOTS = [(9, 0), (10, 30)]
+
+
+def slotsOf(db, userID, scheduleDate):
+    return [(slot['hour'], slot['minute']) for slot in db.getSchedule(userID, scheduleDate)[0]['timeslots']]
+
+
+def test_template_slots_start_after_breaks():
+    assert db.templateSlots(540, 720, 60, [(600, 630)]) == TEMPLATE_SLOTS
+    assert db.templateSlots(540, 600, 30) == [(9, 0), (9, 30)]
+    assert db.templateSlots(540, 560, 30) == []
+
+
+def test_set_template_rebuilds_untouched_days_and_keeps_touched_ones(database, today):
+    tomorrow = str(date.today() + timedelta(days=1))
+    database.bookSlots(1, 2, [(today, 8, 0)])
+
+    assert database.setSlotTemplate(1, TEMPLATE) == [tomorrow]
+    assert slotsOf(database, 1, today) == database.DEFAULT_TIMESLOTS
+    assert slotsOf(database, 1, tomorrow) == TEMPLATE_SLOTS
+    assert database.getSlotTemplate(1) == TEMPLATE
+    assert slotsOf(database, 2, tomorrow) == database.DEFAULT_TIMESLOTS
+
+
+def test_new_days_use_the_template(database):
+    database.setSlotTemplate(1, TEMPLATE)
+    later = date.today() + timedelta(days=5)
+
+    database.createSchedule(1, later)
+    assert slotsOf(database, 1, later) == TEMPLATE_SLOTS
+    assert database.createScheduleHorizon(later, 2) == USERS - 1 + USERS
+    assert slotsOf(database, 1, later + timedelta(days=1)) == TEMPLATE_SLOTS
+    assert slotsOf(database, 2, later) == database.DEFAULT_TIMESLOTS
+
+
+def test_reset_goes_back_to_the_default_slots(database, today):
+    database.setSlotTemplate(1, TEMPLATE)
+
+    assert database.setSlotTemplate(1, None) == [today, str(date.today() + timedelta(days=1))]
+    assert database.getSlotTemplate(1) is None
+    assert slotsOf(database, 1, today) == database.DEFAULT_TIMESLOTS
+
+
+@pytest.mark.parametrize('change', [
+    {'slotMinutes': 1},
+    {'startMinute': 12 * 60, 'endMinute': 9 * 60},
+    {'endMinute': 9 * 60 + 30},
+    {'startMinute': 0, 'endMinute': 24 * 60, 'slotMinutes': 5, 'breaks': []},
+])
+def test_bad_templates_are_refused(database, today, change):
+    with pytest.raises(ValueError):
+        database.setSlotTemplate(1, {**TEMPLATE, **change})
+    assert database.getSlotTemplate(1) is None
+    assert slotsOf(database, 1, today) == database.DEFAULT_TIMESLOTS
+
+
+def test_free_busy_and_solve_line_up_mixed_templates(database):
+    database.setSlotTemplate(1, TEMPLATE)
+
+    freeBusy = database.getFreeBusy([1, 2, 3], date.today(), 1)
+    assert database.freeSlots(freeBusy[1][0]) == TEMPLATE_SLOTS
+    assert database.freeSlots(freeBusy[1][0] & freeBusy[3][0]) == []
+    database.setSlotTemplate(2, {**TEMPLATE, 'slotMinutes': 30, 'breaks': []})
+
+    candidates = solver.solve(1, [2], date.today(), 1, limit=10)
+    assert [(c['hour'], c['minute']) for c in candidates] == TEMPLATE_SLOTS
+
+
+def test_template_endpoint_round_trip(client, headers, today):
+    body = {'start': '09:00', 'end': '12:00', 'duration': 60, 'breaks': [{'start': '10:00', 'end': '10:30'}]}
+
+    assert client.put('/api/user/template/1', json=body, headers=headers(2)).status_code == 403
+    response = client.put('/api/user/template/1', json=body, headers=headers(1))
+    assert response.status_code == 200
+    assert response.json['slots'] == ['09:00', '10:30']
+    assert today in response.json['rebuiltDays']
+    assert client.get('/api/user/template/1', headers=headers(1)).json['breaks'] == body['breaks']
+
+    assert client.put('/api/user/template/1', json={**body, 'duration': 1}, headers=headers(1)).status_code == 400
+    assert client.put('/api/user/template/1', json={**body, 'end': None}, headers=headers(1)).status_code == 400
+    reset = client.delete('/api/user/template/1', headers=headers(1))
+    assert reset.json['default'] is True
+    assert reset.json['slots'][0] == '08:00'
@@ -13,6 +13,14 @@ export const getAxiosInstance = () => {
     axiosInstance = axios.create({
       baseURL,
     });
+    // Signed-in users send the token Login/Register issued
+    axiosInstance.interceptors.request.use((config) => {
+      const token = localStorage.getItem("token");
+      if (token && !config.headers.Authorization) {
+        config.headers.Authorization = `Bearer ${token}`;
+      }
+      return config;
+    });
   }
 
   return axiosInstance;
@@ -3,37 +3,55 @@ import { ENDPOINTS } from "./enpointConstants";
 
 const axios = getAxiosInstance();
 
+// Admin calls send the token AdminAuth issued instead of the password
+const adminHeaders = () => ({ Authorization: `Bearer ${sessionStorage.getItem("adminToken")}` });
+
 export const adminApi = () => {
 
   const authenticate = async (password) => {
       const response = await axios.post(ENDPOINTS.ADMIN_AUTH, { password });
+      sessionStorage.setItem("adminToken", response.data.token);
+      return response.data;
+    };
+
+  const initDB = async () => {
+      const response = await axios.post(ENDPOINTS.ADMIN_INIT, {}, { headers: adminHeaders() });
+      return response.data;
+    };
+
+  const resetDB = async () => {
+      const response = await axios.post(ENDPOINTS.ADMIN_RESET, {}, { headers: adminHeaders() });
       return response.data;
     };
 
-  const initDB = async (password) => {
-      const response = await axios.post(ENDPOINTS.ADMIN_INIT, { password });
+  // options: { section, after, limit, userID, search, dateFrom, dateTo, bookedByUserID }
+  const viewDB = async (options = {}) => {
+      const response = await axios.post(ENDPOINTS.ADMIN_VIEW, options, { headers: adminHeaders() });
       return response.data;
     };
 
-  const resetDB = async (password) => {
-      const response = await axios.post(ENDPOINTS.ADMIN_RESET, { password });
+  // Resolves to a Blob holding the gzip-compressed NDJSON backup
+  const backupDB = async (incremental = false) => {
+      const response = await axios.post(ENDPOINTS.ADMIN_BACKUP, { incremental }, { headers: adminHeaders(), responseType: 'blob' });
       return response.data;
     };
 
-  const viewDB = async (password) => {
-      const response = await axios.post(ENDPOINTS.ADMIN_VIEW, { password });
+  const restoreDB = async (file) => {
+      const form = new FormData();
+      form.append('backup', file);
+      const response = await axios.post(ENDPOINTS.ADMIN_RESTORE, form, { headers: adminHeaders() });
       return response.data;
     };
 
-  const backupDB = async (password) => {
-      const response = await axios.post(ENDPOINTS.ADMIN_BACKUP, { password });
+  const modifyDB = async (action, userID, name, username, email) => {
+      const response = await axios.post(ENDPOINTS.ADMIN_MODIFY, { action, userID, name, username, email }, { headers: adminHeaders() });
       return response.data;
     };
 
-  const modifyDB = async (password, action, userID, name, username, email) => {
-      const response = await axios.post(ENDPOINTS.ADMIN_MODIFY, { password, action, userID, name, username, email });
+  const rebuildAnalytics = async () => {
+      const response = await axios.post(ENDPOINTS.ADMIN_ANALYTICS_REBUILD, {}, { headers: adminHeaders() });
       return response.data;
     };
 
-  return { authenticate, initDB, resetDB, viewDB, backupDB, modifyDB };
+  return { authenticate, initDB, resetDB, viewDB, backupDB, restoreDB, modifyDB, rebuildAnalytics };
 };
\ No newline at end of file
@@ -8,18 +8,25 @@ const BASE_ENDPOINT = {
 export const ENDPOINTS = {
   SCHEDULE_GET: `${BASE_ENDPOINT.USERS}/schedule`,
   SCHEDULE_CREATE: `${BASE_ENDPOINT.USERS}/schedule`,
+  SCHEDULE_EVENTS: `${BASE_ENDPOINT.USERS}/schedule`,
+  SCHEDULE_CHANGES: `${BASE_ENDPOINT.USERS}/schedule`,
   AUTH_LOGIN: `${BASE_ENDPOINT.AUTH}/login`,
   AUTH_REGISTER: `${BASE_ENDPOINT.AUTH}/register`,
   USER_ID_BY_USERNAME_GET: `${BASE_ENDPOINT.USERS}/search`,
   USER_GET: `${BASE_ENDPOINT.USERS}/id`,
+  USER_FREEBUSY: `${BASE_ENDPOINT.USERS}/freebusy`,
   USER_PROFILE: `${BASE_ENDPOINT.USERS}/profile`,
+  SLOT_TEMPLATE: `${BASE_ENDPOINT.USERS}/template`,
   TIMESLOT_TOGGLE: `${BASE_ENDPOINT.USERS}/timeslot`,
   APPOINTMENT_SUBMIT: `${BASE_ENDPOINT.USERS}/appointment`,
+  MEETING_SOLVE: `${BASE_ENDPOINT.USERS}/solve`,
   ADMIN_AUTH: `${BASE_ENDPOINT.ADMIN}/auth`,
   ADMIN_INIT: `${BASE_ENDPOINT.ADMIN}/init`,
   ADMIN_RESET: `${BASE_ENDPOINT.ADMIN}/reset`,
   ADMIN_VIEW: `${BASE_ENDPOINT.ADMIN}/view`,
   ADMIN_BACKUP: `${BASE_ENDPOINT.ADMIN}/backup`,
+  ADMIN_RESTORE: `${BASE_ENDPOINT.ADMIN}/restore`,
   ADMIN_MODIFY: `${BASE_ENDPOINT.ADMIN}/modify`,
+  ADMIN_ANALYTICS_REBUILD: `${BASE_ENDPOINT.ADMIN}/analytics/rebuild`,
   ANALYTICS: `${BASE_ENDPOINT.ANALYTICS}`
 };
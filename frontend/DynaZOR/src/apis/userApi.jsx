@@ -31,20 +31,57 @@ export const userApi = () => {
       return response.data;
     };
   
+  const solveMeeting = async (ownerID, payload) => {
+      const response = await axios.post(`${ENDPOINTS.MEETING_SOLVE}/${ownerID}`, payload);
+      return response.data;
+    };
+  
   const getUser = async (userID) => {
       const response = await axios.get(`${ENDPOINTS.USER_GET}/${userID}`);
       return response.data;
   }
   
+  const getFreeBusy = async (userIDs, start, days) => {
+      const response = await axios.get(ENDPOINTS.USER_FREEBUSY, { params: { users: userIDs.join(','), start, days } });
+      return response.data;
+  }
+  
   const updateProfile = async (userID, payload) => {
     const response = await axios.put(`${ENDPOINTS.USER_PROFILE}/${userID}`, payload);
     return response.data;
   }
   
+  const getSlotTemplate = async (userID) => {
+    const response = await axios.get(`${ENDPOINTS.SLOT_TEMPLATE}/${userID}`);
+    return response.data;
+  }
+
+  const updateSlotTemplate = async (userID, template) => {
+    const response = template
+      ? await axios.put(`${ENDPOINTS.SLOT_TEMPLATE}/${userID}`, template)
+      : await axios.delete(`${ENDPOINTS.SLOT_TEMPLATE}/${userID}`);
+    return response.data;
+  }
+  
+  // Pass the token of the previous call to receive only what changed since
+  const getScheduleChanges = async (userID, since, start) => {
+      const response = await axios.get(`${ENDPOINTS.SCHEDULE_CHANGES}/${userID}/changes`, { params: { since, start } });
+      return response.data;
+  }
+  
+  // EventSource cannot send headers, so the token goes in the query string
+  const subscribeSchedule = (userID, date, { onSnapshot, onSlots }) => {
+      const params = new URLSearchParams({ date, access_token: localStorage.getItem("token") || "" });
+      const source = new EventSource(`${axios.defaults.baseURL}${ENDPOINTS.SCHEDULE_EVENTS}/${userID}/events?${params}`);
+      source.addEventListener("snapshot", (e) => onSnapshot(JSON.parse(e.data).schedule));
+      source.addEventListener("slots", (e) => onSlots(JSON.parse(e.data)));
+      return () => source.close();
+  }
+  
   const cancelAppointment = async(userID, payload) => {
 	  const response = await axios.delete(`${ENDPOINTS.APPOINTMENT_SUBMIT}/${userID}`, {data: payload});
 	  return response.data
   }
 
-    return { getSchedule, createSchedule, getUserByUsername, toggleTimeslot, submitAppointment, getUser, cancelAppointment, updateProfile };
+    return { getSchedule, createSchedule, getUserByUsername, toggleTimeslot, submitAppointment, solveMeeting, getUser, getFreeBusy, cancelAppointment, updateProfile, getSlotTemplate, updateSlotTemplate, subscribeSchedule, getScheduleChanges };
 };
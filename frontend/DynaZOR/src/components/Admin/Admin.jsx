@@ -11,7 +11,7 @@ export default function Admin() {
   const [expandedTimeslotId, setExpandedTimeslotId] = useState(null);
   const [expandedOwnerId, setExpandedOwnerId] = useState(null);
 
-  const { authenticate, initDB, resetDB, viewDB, backupDB, modifyDB } = adminApi();
+  const { authenticate, initDB, resetDB, viewDB, backupDB, restoreDB, modifyDB, rebuildAnalytics } = adminApi();
 
   const handleAuth = async () => {
     try {
@@ -30,7 +30,7 @@ export default function Admin() {
     if (!window.confirm('Initialize database? This will create new tables.')) return;
     try {
       setLoading(true);
-      await initDB(adminPassword);
+      await initDB();
       setMessage(['Database initialized successfully', 'success']);
     } catch (err) {
       setMessage(['Failed to initialize database', 'error']);
@@ -43,7 +43,7 @@ export default function Admin() {
     if (!window.confirm('WARNING: This will delete ALL data! Are you sure?')) return;
     try {
       setLoading(true);
-      await resetDB(adminPassword);
+      await resetDB();
       setMessage(['Database reset - all data deleted', 'success']);
       setDatabaseData(null);
     } catch (err) {
@@ -56,7 +56,7 @@ export default function Admin() {
   const handleViewDB = async () => {
     try {
       setLoading(true);
-      const data = await viewDB(adminPassword);
+      const data = await viewDB();
       setDatabaseData(data);
       setMessage(['Database data loaded', 'success']);
     } catch (err) {
@@ -66,18 +66,54 @@ export default function Admin() {
     }
   };
 
+  // Fetch the next page of one section and append it to what is already shown
+  const handleLoadMore = async (section) => {
+    try {
+      setLoading(true);
+      const page = await viewDB({ section, after: databaseData.next[section] });
+      setDatabaseData((current) => ({
+        ...current,
+        [section]: [...(current[section] || []), ...page[section]],
+        next: { ...current.next, [section]: page.next[section] },
+      }));
+    } catch (err) {
+      setMessage(['Failed to load more rows', 'error']);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const loadMoreButton = (section) => databaseData?.next?.[section] && (
+    <button onClick={() => handleLoadMore(section)} disabled={loading} style={{ marginTop: '0.75rem', padding: '0.5rem 1rem', background: '#e5e7eb', color: '#374151', fontWeight: 600, borderRadius: 6, border: 'none', cursor: 'pointer', fontSize: '0.875rem' }}>
+      {loading ? 'Loading...' : 'Load more'}
+    </button>
+  );
+
+  const handleRebuildAnalytics = async () => {
+    try {
+      setLoading(true);
+      const res = await rebuildAnalytics();
+      setMessage([`Analytics rebuilt for ${res.owners} users`, 'success']);
+    } catch (err) {
+      setMessage(['Failed to rebuild analytics', 'error']);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleBackupDB = async () => {
     try {
       setLoading(true);
-      const data = await backupDB(adminPassword);
-      const jsonStr = JSON.stringify(data, null, 2);
+      const blob = await backupDB();
+      const url = URL.createObjectURL(blob);
       const element = document.createElement('a');
-      element.setAttribute('href', 'data:text/plain;charset=utf-8,' + encodeURIComponent(jsonStr));
-      element.setAttribute('download', `dynazor_backup_${new Date().toISOString().split('T')[0]}.json`);
+      element.setAttribute('href', url);
+      element.setAttribute('download', `dynazor_backup_${new Date().toISOString().split('T')[0]}.ndjson.gz`);
       element.style.display = 'none';
       document.body.appendChild(element);
       element.click();
       document.body.removeChild(element);
+      URL.revokeObjectURL(url);
       setMessage(['Backup downloaded successfully', 'success']);
     } catch (err) {
       setMessage(['Failed to backup database', 'error']);
@@ -86,6 +122,22 @@ export default function Admin() {
     }
   };
 
+  const handleRestoreDB = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file || !window.confirm('WARNING: Restoring replaces the current data with the backup. Continue?')) return;
+    try {
+      setLoading(true);
+      await restoreDB(file);
+      setMessage(['Database restored successfully', 'success']);
+      setDatabaseData(null);
+    } catch (err) {
+      setMessage(['Failed to restore database', 'error']);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleModifyUser = async () => {
     if (!modifyUser.userID) {
       setMessage(['Please enter a User ID', 'error']);
@@ -93,10 +145,10 @@ export default function Admin() {
     }
     try {
       setLoading(true);
-      await modifyDB(adminPassword, 'update', parseInt(modifyUser.userID), modifyUser.name, modifyUser.username, modifyUser.email);
+      await modifyDB('update', parseInt(modifyUser.userID), modifyUser.name, modifyUser.username, modifyUser.email);
       setMessage(['User updated successfully', 'success']);
       setModifyUser({ userID: '', name: '', username: '', email: '' });
-      const data = await viewDB(adminPassword);
+      const data = await viewDB();
       setDatabaseData(data);
     } catch (err) {
       setMessage(['Failed to update user', 'error']);
@@ -109,9 +161,9 @@ export default function Admin() {
     if (!window.confirm(`Delete user ${userID} and all their data? This cannot be undone.`)) return;
     try {
       setLoading(true);
-      await modifyDB(adminPassword, 'delete', userID, null, null, null);
+      await modifyDB('delete', userID, null, null, null);
       setMessage(['User deleted successfully', 'success']);
-      const data = await viewDB(adminPassword);
+      const data = await viewDB();
       setDatabaseData(data);
     } catch (err) {
       setMessage(['Failed to delete user', 'error']);
@@ -171,9 +223,16 @@ export default function Admin() {
           <button onClick={handleViewDB} disabled={loading} style={{ padding: '1rem', background: '#10b981', color: 'white', fontWeight: 700, borderRadius: 8, border: 'none', cursor: 'pointer' }}>
             View DB
           </button>
+          <button onClick={handleRebuildAnalytics} disabled={loading} style={{ padding: '1rem', background: '#6366f1', color: 'white', fontWeight: 700, borderRadius: 8, border: 'none', cursor: 'pointer' }}>
+            Rebuild Analytics
+          </button>
           <button onClick={handleBackupDB} disabled={loading} style={{ padding: '1rem', background: '#f59e0b', color: 'white', fontWeight: 700, borderRadius: 8, border: 'none', cursor: 'pointer' }}>
             Backup DB
           </button>
+          <label style={{ padding: '1rem', background: '#6b7280', color: 'white', fontWeight: 700, borderRadius: 8, cursor: 'pointer', textAlign: 'center' }}>
+            Restore DB
+            <input type="file" accept=".gz" onChange={handleRestoreDB} disabled={loading} style={{ display: 'none' }} />
+          </label>
         </div>
 
         {/* Modify User Section */}
@@ -252,6 +311,7 @@ export default function Admin() {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('users')}
             </div>
 
             {/* Schedules */}
@@ -280,6 +340,7 @@ export default function Admin() {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('schedules')}
             </div>
 
             {/* Timeslots */}
@@ -344,6 +405,7 @@ export default function Admin() {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('timeslots')}
             </div>
 
             {/* Appointment Stats */}
@@ -404,6 +466,7 @@ export default function Admin() {
                   </tbody>
                 </table>
               </div>
+              {loadMoreButton('appointment_stats')}
             </div>
           </div>
         )}
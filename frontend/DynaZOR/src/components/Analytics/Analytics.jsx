@@ -102,7 +102,7 @@ export default function Analytics({ userID }) {
 
           <div className="divide-y divide-gray-200">
             {topBookers.map((booker, idx) => (
-              <div key={idx} className="px-8 py-6 hover:bg-gray-50 transition-colors">
+              <div key={booker.userID ?? idx} className="px-8 py-6 hover:bg-gray-50 transition-colors">
                 <div className="flex items-center justify-between">
                   <div className="flex items-center gap-4">
                     <div className="bg-indigo-100 rounded-full w-12 h-12 flex items-center justify-center font-bold text-indigo-600">
@@ -25,6 +25,7 @@ export default function Login() {
         localStorage.clear();
         // Set new user session
         localStorage.setItem("userID", String(userID));
+        localStorage.setItem("token", res.token);
         localStorage.setItem("loggedInAt", String(Date.now()));
       }
 
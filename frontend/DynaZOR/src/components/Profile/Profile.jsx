@@ -43,7 +43,9 @@ export default function Profile() {
     }
     try {
       setSaving(true);
-      await updateProfile(userID, form);
+      const res = await updateProfile(userID, form);
+      // A username change comes with a token naming the new username
+      if (res?.token) localStorage.setItem("token", res.token);
       setMessage(["Profile updated", "success"]);
     } catch (err) {
       const backendMessage = err.response?.data?.message;
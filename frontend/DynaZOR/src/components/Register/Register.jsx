@@ -30,15 +30,16 @@ export default function Register() {
 
       setMessage([res.message, "success"]);
 
-      const today = new Date().toISOString().split("T")[0];
-      await createSchedule({ userID, scheduleDate: today });
-
       // Clear all previous session data to prevent multi-user conflicts
       localStorage.clear();
-      // Set new user session
+      // Set new user session; createSchedule below already needs the token
       localStorage.setItem("userID", String(userID));
+      localStorage.setItem("token", res.token);
       localStorage.setItem("loggedInAt", String(Date.now()));
 
+      const today = new Date().toISOString().split("T")[0];
+      await createSchedule({ userID, scheduleDate: today });
+
       setTimeout(() => {
         navigate("/dashboard", { state: { userID } });
       }, 1000);
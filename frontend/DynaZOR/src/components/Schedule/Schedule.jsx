@@ -8,7 +8,7 @@ export default function Schedule({ userID }) {
   const [loading, setLoading] = useState(true);
   const [message, setMessage] = useState(null);
   const [selectedSlots, setSelectedSlots] = useState([]); 
-  const { getSchedule, getUserByUsername, toggleTimeslot, getUser, cancelAppointment } = userApi();
+  const { getSchedule, getUserByUsername, toggleTimeslot, getUser, cancelAppointment, subscribeSchedule } = userApi();
 
   // Determine if viewer or visitor.
   const isOwner = useMemo(() => {
@@ -37,6 +37,23 @@ export default function Schedule({ userID }) {
     if (userID) loadSchedule();
   }, [userID]);
 
+  // Live updates for the day on screen: a snapshot replaces it, slot events patch single slots
+  const liveDate = schedule[0]?.date;
+  useEffect(() => {
+    if (!userID || !liveDate) return;
+    return subscribeSchedule(userID, liveDate, {
+      onSnapshot: (days) => {
+        if (days.length) setSchedule((current) => current.map((d) => (d.date === liveDate ? days[0] : d)));
+      },
+      onSlots: ({ date, timeslots }) => {
+        setSchedule((current) => current.map((d) => d.date !== date ? d : {
+          ...d,
+          timeslots: d.timeslots.map((t) => timeslots.find((u) => u.hour === t.hour && u.minute === t.minute) || t),
+        }));
+      },
+    });
+  }, [userID, liveDate]);
+
   const handleCellClick = async ({ time, day, isBookedByCurrentUser, hasBooking, bookedByUserID}) => {
     const [hour, minute] = time.split(':').map(Number);
     const currentUserID = parseInt(localStorage.getItem("userID"));
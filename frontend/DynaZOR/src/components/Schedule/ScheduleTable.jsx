@@ -1,7 +1,7 @@
 import ScheduleCell from "./ScheduleCell";
 import { useMemo } from "react";
 
-const times = [
+const defaultTimes = [
   "08:00", "08:45", "09:30", "10:15", "11:00", "11:45",
   "12:30", "13:15", "14:00", "14:45", "15:30", "16:15",
   "17:00", "17:45"
@@ -10,19 +10,22 @@ const times = [
 const timeLabel = (h, m) => `${h.toString().padStart(2, "0")}:${m.toString().padStart(2, "0")}`;
 
 export default function ScheduleTable({ schedule_data = [], onCellClick, isOwner, selectedSlots = []}) {
-  const { days, grid } = useMemo(() => {
+  const { days, grid, times } = useMemo(() => {
     const dayList = schedule_data.map((d) => d.date);
     const map = {};
+    const timeSet = new Set();
 
     for (const day of schedule_data) {
       map[day.date] = {};
       for (const slot of day.timeslots || []) {
         const t = timeLabel(slot.hour, slot.minute);
         map[day.date][t] = slot;
+        timeSet.add(t);
       }
     }
 
-    return { days: dayList, grid: map };
+    // Rows follow the owner's slot template; "HH:MM" labels sort chronologically
+    return { days: dayList, grid: map, times: timeSet.size ? [...timeSet].sort() : defaultTimes };
   }, [schedule_data]);
 
   if (!days.length) {